@@ -0,0 +1,85 @@
+"""Compare fixed and adaptive research depth on a mix of easy and hard questions.
+
+Runs the compiled graph against the fake Gemini stand-in with and without
+`adaptive_depth`. Easy questions are short and answered after the first
+research loop; hard ones ask about several things and need a few summaries
+before reflection is satisfied. Reports the mean searches, research loops
+and latency per run, and the share of runs that ended sufficient as a proxy
+for answer quality.
+
+    python benchmarks/adaptive_depth.py --runs 60 --hard-rate 0.3
+"""
+
+import argparse
+import importlib
+import random
+import statistics
+import time
+
+import fake_gemini
+from langchain_core.messages import HumanMessage
+
+# `agent` re-exports the compiled graph under the same name as the module.
+graph_module = importlib.import_module("agent.graph")
+
+EASY = "What is the population of city number {i}?"
+HARD = (
+    "Compare the revenue growth, the market share and the hiring plans of company "
+    "number {i} and its main competitors over the last three years, and explain "
+    "which regulatory changes affected each of them"
+)
+# Summaries a hard question needs before reflection judges them sufficient
+HARD_SUMMARIES = 6
+
+
+def sufficient(prompt: str) -> bool:
+    if "Compare the revenue growth" not in prompt:
+        return True
+    return prompt.count("\n---\n") + 1 >= HARD_SUMMARIES
+
+
+def measure(questions, adaptive: bool) -> None:
+    config = {
+        "configurable": {"adaptive_depth": adaptive, "web_research_cache": False}
+    }
+    searches, loops, latencies, answered = [], [], [], 0
+    for question in questions:
+        state = {
+            "messages": [HumanMessage(content=question)],
+            "initial_search_query_count": 3,
+            "max_research_loops": 3,
+        }
+        start = time.perf_counter()
+        result = graph_module.graph.invoke(state, config)
+        latencies.append(time.perf_counter() - start)
+        searches.append(len(result["search_query"]))
+        loops.append(result["research_loop_count"])
+        answered += bool(result["is_sufficient"])
+    print(
+        f"{'adaptive' if adaptive else 'fixed':<10}{statistics.mean(searches):>10.2f}"
+        f"{statistics.mean(loops):>8.2f}{statistics.mean(latencies):>10.3f}"
+        f"{answered / len(questions):>12.2f}"
+    )
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=60)
+    parser.add_argument("--hard-rate", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake call latency (s)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    questions = [
+        (HARD if rng.random() < args.hard_rate else EASY).format(i=i % 5)
+        for i in range(args.runs)
+    ]
+    fake_gemini.install(graph_module, latency=args.latency, sufficient=sufficient)
+    print(f"{'depth':<10}{'searches':>10}{'loops':>8}{'mean s':>10}{'sufficient':>12}")
+    for adaptive in (False, True):
+        measure(questions, adaptive)
+
+
+if __name__ == "__main__":
+    main()
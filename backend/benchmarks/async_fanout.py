@@ -0,0 +1,104 @@
+"""Compare thread-based and async execution of concurrent research runs.
+
+Runs the compiled graph against the fake Gemini stand-in, once with every run on
+its own thread through `graph.invoke` and once with all runs on a single event
+loop through `graph.ainvoke`, and reports wall time, latency and peak threads.
+
+    python benchmarks/async_fanout.py --runs 10 100 500
+"""
+
+import argparse
+import asyncio
+import importlib
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import fake_gemini
+from langchain_core.messages import HumanMessage
+
+# `agent` re-exports the compiled graph under the same name as the module.
+graph_module = importlib.import_module("agent.graph")
+
+
+class ThreadSampler:
+    """Record the peak number of live threads while active."""
+
+    def __init__(self) -> None:
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self) -> "ThreadSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _state(i: int) -> dict:
+    return {
+        "messages": [HumanMessage(content=f"Research question number {i}")],
+        "initial_search_query_count": 3,
+        "max_research_loops": 2,
+    }
+
+
+def run_threads(runs: int) -> List[float]:
+    def one(i: int) -> float:
+        start = time.perf_counter()
+        graph_module.graph.invoke(_state(i))
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=runs) as pool:
+        return list(pool.map(one, range(runs)))
+
+
+def run_async(runs: int) -> List[float]:
+    async def one(i: int) -> float:
+        start = time.perf_counter()
+        await graph_module.graph.ainvoke(_state(i))
+        return time.perf_counter() - start
+
+    async def main() -> List[float]:
+        return list(await asyncio.gather(*(one(i) for i in range(runs))))
+
+    return asyncio.run(main())
+
+
+def measure(mode: str, runner: Callable[[int], List[float]], runs: int) -> None:
+    with ThreadSampler() as sampler:
+        start = time.perf_counter()
+        latencies = sorted(runner(runs))
+        wall = time.perf_counter() - start
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{mode:<8}{runs:>6}{wall:>10.2f}{runs / wall:>10.1f}"
+        f"{statistics.median(latencies):>10.3f}{p95:>10.3f}{sampler.peak:>8}"
+    )
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake call latency (s)")
+    args = parser.parse_args()
+
+    fake_gemini.install(graph_module, latency=args.latency)
+    print(f"{'mode':<8}{'runs':>6}{'wall s':>10}{'runs/s':>10}{'p50 s':>10}{'p95 s':>10}{'threads':>8}")
+    for runs in args.runs:
+        measure("threads", run_threads, runs)
+        measure("async", run_async, runs)
+
+
+if __name__ == "__main__":
+    main()
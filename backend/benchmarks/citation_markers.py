@@ -0,0 +1,81 @@
+"""Compare the chunked insert_citation_markers with the previous slicing version.
+
+Builds a synthetic grounded answer and random citations, checks both
+implementations agree, and reports the time per call.
+
+    python benchmarks/citation_markers.py --size 100000 --citations 500
+"""
+
+import argparse
+import random
+import timeit
+
+from agent.utils import insert_citation_markers
+
+
+def insert_citation_markers_slicing(text, citations_list):
+    """Previous implementation, rebuilding the string once per citation."""
+    sorted_citations = sorted(
+        citations_list, key=lambda c: (c["end_index"], c["start_index"]), reverse=True
+    )
+    modified_text = text
+    for citation_info in sorted_citations:
+        end_idx = citation_info["end_index"]
+        marker_to_insert = ""
+        for segment in citation_info["segments"]:
+            marker_to_insert += f" [{segment['label']}]({segment['short_url']})"
+        modified_text = (
+            modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
+        )
+    return modified_text
+
+
+def synthetic_answer(size: int, citations: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = ["research", "market", "growth", "revenue", "analysis", "data", "report"]
+    text = ""
+    while len(text) < size:
+        text += " ".join(rng.choice(words) for _ in range(12)) + ". "
+    text = text[:size]
+    citations_list = []
+    for i in range(citations):
+        end = rng.randrange(1, size)
+        citations_list.append(
+            {
+                "start_index": rng.randrange(0, end),
+                "end_index": end,
+                "segments": [
+                    {
+                        "label": f"site{j}",
+                        "short_url": f"https://vertexaisearch.cloud.google.com/id/{i}-{j}",
+                    }
+                    for j in range(rng.randint(1, 3))
+                ],
+            }
+        )
+    return text, citations_list
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000, help="Answer length in characters")
+    parser.add_argument("--citations", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    text, citations_list = synthetic_answer(args.size, args.citations)
+    assert insert_citation_markers(text, citations_list) == (
+        insert_citation_markers_slicing(text, citations_list)
+    )
+
+    for name, func in (
+        ("slicing", insert_citation_markers_slicing),
+        ("chunked", insert_citation_markers),
+    ):
+        seconds = timeit.timeit(lambda: func(text, citations_list), number=args.repeat)
+        print(f"{name:<10}{seconds / args.repeat * 1000:>10.2f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
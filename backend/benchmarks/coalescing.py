@@ -0,0 +1,66 @@
+"""Measure the load removed by coalescing identical concurrent research runs.
+
+Submits the same question from many concurrent callers against the fake Gemini
+stand-in, once straight to the compiled graph and once through
+`coalesced_graph`, and reports the Gemini calls made and the wall time.
+
+    python benchmarks/coalescing.py --callers 100
+"""
+
+import argparse
+import asyncio
+import importlib
+import time
+
+import fake_gemini
+from langchain_core.messages import HumanMessage
+
+from agent.coalesce import CoalescingGraph
+from agent.metrics import metrics
+
+# `agent` re-exports the compiled graph under the same name as the module.
+graph_module = importlib.import_module("agent.graph")
+
+
+def _gemini_calls() -> int:
+    summaries = metrics.snapshot("llm_limiter.wait_seconds.")["summaries"]
+    return sum(summary["count"] for summary in summaries.values())
+
+
+async def run(runner, callers: int) -> None:
+    config = {"configurable": {"web_research_cache": False}}
+    questions = [
+        # Callers type the viral question slightly differently
+        "What happened at the match today?" if i % 2 else "what happened at the match today"
+        for i in range(callers)
+    ]
+    await asyncio.gather(
+        *(
+            runner.ainvoke({"messages": [HumanMessage(content=q)]}, config)
+            for q in questions
+        )
+    )
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake call latency (s)")
+    args = parser.parse_args()
+
+    fake_gemini.install(graph_module, latency=args.latency)
+    print(f"{'mode':<12}{'callers':>8}{'gemini calls':>14}{'wall s':>10}")
+    for name, runner in (
+        ("direct", graph_module.graph),
+        ("coalesced", CoalescingGraph(graph_module.graph)),
+    ):
+        metrics.reset()
+        start = time.perf_counter()
+        asyncio.run(run(runner, args.callers))
+        wall = time.perf_counter() - start
+        print(f"{name:<12}{args.callers:>8}{_gemini_calls():>14}{wall:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare atomic message appends with whole-document rewrites.
+
+Seeds conversations of 10, 100 and 1,000 messages in the MongoDB at
+MONGO_URL and times appending one message through `append_messages` and
+through the previous path, which loaded the conversation and rewrote every
+message with `update_conversation`. The benchmark conversations are deleted
+afterwards.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/conversation_append.py --appends 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from agent import database
+from agent.database import ConversationInDB, ConversationMessage
+
+BENCHMARK_USER = "benchmark-append"
+
+
+def _message(i: int) -> ConversationMessage:
+    role = "human" if i % 2 == 0 else "ai"
+    return ConversationMessage(id=str(i + 1), role=role, content=f"message {i} " * 80)
+
+
+async def append_rewriting(conversation_id: str, message: ConversationMessage) -> None:
+    """Previous implementation, rewriting the whole message list."""
+    conversation = await database.get_conversation_by_id(conversation_id)
+    message = message.copy(update={"id": str(len(conversation.messages) + 1)})
+    conversation.messages.append(message)
+    await database.update_conversation(
+        conversation_id, {"messages": [m.dict() for m in conversation.messages]}
+    )
+
+
+async def append_pushing(conversation_id: str, message: ConversationMessage) -> None:
+    await database.append_messages(conversation_id, BENCHMARK_USER, [message])
+
+
+async def measure(size: int, appends: int, append) -> List[float]:
+    conversation = ConversationInDB(
+        user_id=BENCHMARK_USER,
+        title=f"benchmark {size}",
+        messages=[_message(i) for i in range(size)],
+    )
+    conversation_id = await database.save_conversation(conversation)
+    timings = []
+    for i in range(appends):
+        start = time.perf_counter()
+        await append(conversation_id, _message(size + i))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main_async(appends: int) -> None:
+    print(f"{'messages':>9}{'rewrite ms':>12}{'push ms':>10}")
+    try:
+        for size in (10, 100, 1_000):
+            rewrite = await measure(size, appends, append_rewriting)
+            push = await measure(size, appends, append_pushing)
+            print(
+                f"{size:>9}{statistics.mean(rewrite) * 1000:>12.2f}"
+                f"{statistics.mean(push) * 1000:>10.2f}"
+            )
+    finally:
+        await database.conversations_collection.delete_many({"user_id": BENCHMARK_USER})
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appends", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.appends))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare listing conversations as summaries with loading whole documents.
+
+Seeds one user with 500 long conversations in the MongoDB at MONGO_URL and
+times a listing page through `get_user_conversation_summaries` and through
+`get_user_conversations`, which the history endpoint used before, reporting
+the latency and the peak Python memory of each. The benchmark conversations
+are deleted afterwards.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/conversation_listing.py --limit 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from agent import database
+from agent.database import ConversationInDB, ConversationMessage
+
+BENCHMARK_USER = "benchmark-listing"
+
+
+async def seed(conversations: int, messages: int, message_chars: int) -> None:
+    for c in range(conversations):
+        await database.save_conversation(
+            ConversationInDB(
+                user_id=BENCHMARK_USER,
+                title=f"conversation {c}",
+                messages=[
+                    ConversationMessage(
+                        id=str(i + 1),
+                        role="human" if i % 2 == 0 else "ai",
+                        content=(f"message {i} of {c} " * message_chars)[:message_chars],
+                    )
+                    for i in range(messages)
+                ],
+            )
+        )
+
+
+async def measure(name: str, list_page, limit: int, repeat: int) -> None:
+    timings = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await list_page(BENCHMARK_USER, 0, limit)
+        timings.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<12}{statistics.mean(timings) * 1000:>10.1f}{peak / 2**20:>10.1f}")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    await seed(args.conversations, args.messages, args.message_chars)
+    try:
+        print(f"{'listing':<12}{'ms/page':>10}{'peak MiB':>10}")
+        await measure("documents", database.get_user_conversations, args.limit, args.repeat)
+        await measure(
+            "summaries", database.get_user_conversation_summaries, args.limit, args.repeat
+        )
+    finally:
+        await database.conversations_collection.delete_many({"user_id": BENCHMARK_USER})
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--message-chars", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
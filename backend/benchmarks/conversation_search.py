@@ -0,0 +1,130 @@
+"""Compare text-index search with the previous regex search over conversations.
+
+Seeds one user with 100,000 synthetic conversations in the MongoDB at
+MONGO_URL, creates the indexes from `init_db`, and times the first page of
+`search_conversations` against the previous implementation, which matched
+three case-insensitive regexes and loaded whole documents, for a common word,
+a rare word, a two-word phrase and a partial word that takes the prefix
+fallback over the indexed title and tag keywords. The benchmark
+conversations are deleted afterwards.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/conversation_search.py --conversations 100000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+from bson import ObjectId
+
+from agent import database
+from agent.database import ConversationInDB, ConversationMessage
+
+BENCHMARK_USER = "benchmark-search"
+INSERT_BATCH = 1_000
+
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+async def seed(conversations: int, messages: int, words: List[str], rng: random.Random) -> None:
+    # Zipf-like word frequencies, so the first words are common and the last rare
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+
+    def text(length: int) -> str:
+        return " ".join(rng.choices(words, weights, k=length))
+
+    batch = []
+    for c in range(conversations):
+        conversation = ConversationInDB(
+            user_id=BENCHMARK_USER,
+            title=text(5),
+            tags=rng.sample(words[:50], 2),
+            messages=[
+                ConversationMessage(
+                    id=str(i + 1), role="human" if i % 2 == 0 else "ai", content=text(40)
+                )
+                for i in range(messages)
+            ],
+        )
+        doc = conversation.dict()
+        doc["_id"] = ObjectId(doc.pop("id"))
+        doc["keywords"] = database._keywords(conversation.title, conversation.tags)
+        batch.append(doc)
+        if len(batch) == INSERT_BATCH or c == conversations - 1:
+            await database.conversations_collection.insert_many(batch)
+            batch = []
+
+
+async def search_regex(user_id: str, query: str) -> List[ConversationInDB]:
+    """Previous implementation, scanning every message with unanchored regexes."""
+    query = query.strip('"')  # regexes have no phrase syntax
+    search_filter = {
+        "user_id": user_id,
+        "is_archived": False,
+        "$or": [
+            {"title": {"$regex": query, "$options": "i"}},
+            {"messages.content": {"$regex": query, "$options": "i"}},
+            {"tags": {"$regex": query, "$options": "i"}},
+        ],
+    }
+    return [
+        ConversationInDB(**{**doc, "id": str(doc["_id"])})
+        async for doc in database.conversations_collection.find(search_filter)
+        .sort("updated_at", -1)
+        .limit(20)
+    ]
+
+
+async def search_indexed(user_id: str, query: str):
+    return await database.search_conversations(user_id, query)
+
+
+async def measure(search, query: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await search(BENCHMARK_USER, query)
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings) * 1000
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    rng = random.Random(0)
+    words = vocabulary(args.vocabulary, rng)
+    queries = {
+        "common": words[1],
+        "rare": words[-1],
+        "phrase": f'"{words[0]} {words[1]}"',
+        "partial": words[len(words) // 2][:3],
+    }
+    await database.init_db()
+    try:
+        await seed(args.conversations, args.messages, words, rng)
+        print(f"{'query':<9}{'regex ms':>10}{'text ms':>10}{'speedup':>9}")
+        for name, query in queries.items():
+            regex = await measure(search_regex, query, args.repeat)
+            indexed = await measure(search_indexed, query, args.repeat)
+            print(f"{name:<9}{regex:>10.1f}{indexed:>10.1f}{regex / indexed:>8.1f}x")
+    finally:
+        await database.conversations_collection.delete_many({"user_id": BENCHMARK_USER})
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""In-process stand-in for the Gemini APIs used by the research graph.
+
+Every call sleeps for a fixed latency (with `time.sleep` on the sync path and
+`asyncio.sleep` on the async path) and returns a deterministic response shaped
+like the real one, so benchmarks exercise the graph without network access.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import BaseModel
+
+# The graph refuses to import without a key; the fakes never use it.
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+
+SHORT_URL_PATTERN = re.compile(r"https://vertexaisearch\.cloud\.google\.com/id/\d+-\d+")
+TASK_PATTERN = re.compile(r'<task index="(\d+)">\n(.*?)\n</task>', re.S)
+
+
+def _prompt_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "\n".join(_prompt_text(item) for item in value)
+    return str(getattr(value, "content", value))
+
+
+Sufficiency = Union[bool, Callable[[str], bool]]
+
+
+def _structured_response(schema: type, prompt: str, sufficient: Sufficiency) -> BaseModel:
+    from agent.tools_and_schemas import (
+        Reflection,
+        SearchQueryBatch,
+        SearchQueryList,
+        TaskSearchQueryList,
+    )
+
+    if schema is SearchQueryBatch:
+        return SearchQueryBatch(
+            results=[
+                TaskSearchQueryList(
+                    task=int(index),
+                    **_structured_response(SearchQueryList, task, sufficient).dict(),
+                )
+                for index, task in TASK_PATTERN.findall(prompt)
+            ]
+        )
+    if schema is SearchQueryList:
+        match = re.search(r"more than (\d+) queries", prompt)
+        count = int(match.group(1)) if match else 1
+        return SearchQueryList(
+            query=[f"search query {i} {hash(prompt) % 997}" for i in range(count)],
+            rationale="fake",
+        )
+    if schema is Reflection:
+        if callable(sufficient):
+            sufficient = sufficient(prompt)
+        return Reflection(
+            is_sufficient=sufficient,
+            knowledge_gap="" if sufficient else "more detail needed",
+            # Distinct per prompt, so query deduplication does not end the loop
+            follow_up_queries=[] if sufficient else [_follow_up_query(prompt)],
+        )
+    raise TypeError(f"No fake response for {schema!r}")
+
+
+def _follow_up_query(prompt: str) -> str:
+    digest = hashlib.sha1(prompt.encode()).hexdigest()
+    return f"follow up {digest[:8]} {digest[8:16]}"
+
+
+def _answer_text(prompt: str) -> str:
+    cited = SHORT_URL_PATTERN.findall(prompt)[:5]
+    links = " ".join(f"[source]({url})" for url in cited)
+    return f"Here is the researched answer. {links}".strip()
+
+
+class FakeStructuredModel:
+    """Structured-output stand-in returning schema instances."""
+
+    def __init__(
+        self, schema: type, latency: float, sufficient: Sufficiency, prefix: str = ""
+    ) -> None:
+        self.schema = schema
+        self.latency = latency
+        self.sufficient = sufficient
+        self.prefix = prefix
+
+    def invoke(self, prompt: Any, config: Any = None, **kwargs: Any) -> BaseModel:
+        time.sleep(self.latency)
+        return _structured_response(
+            self.schema, self.prefix + _prompt_text(prompt), self.sufficient
+        )
+
+    async def ainvoke(
+        self, prompt: Any, config: Any = None, **kwargs: Any
+    ) -> BaseModel:
+        await asyncio.sleep(self.latency)
+        return _structured_response(
+            self.schema, self.prefix + _prompt_text(prompt), self.sufficient
+        )
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model stand-in that answers by citing the short urls in the prompt."""
+
+    latency: float = 0.05
+    sufficient: Sufficiency = True
+    # Contents of the cached content the prompts continue, if any
+    prefix: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        text = _answer_text(self.prefix + _prompt_text(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        text = _answer_text(self.prefix + _prompt_text(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[str]:
+        # Small chunks so short urls regularly straddle chunk boundaries
+        text = _answer_text(self.prefix + _prompt_text(messages))
+        return [text[i : i + 7] for i in range(0, len(text), 7)]
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for piece in self._chunks(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for piece in self._chunks(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Any:
+        return FakeStructuredModel(schema, self.latency, self.sufficient, self.prefix)
+
+
+def _search_response(query: str) -> SimpleNamespace:
+    text = f"Findings about {query}. Second finding about {query}."
+    first_end = text.index(".") + 1
+    chunks = [
+        SimpleNamespace(
+            web=SimpleNamespace(uri=f"https://example.com/{i}/{abs(hash(query))}", title=f"site{i}.com")
+        )
+        for i in range(2)
+    ]
+    supports = [
+        SimpleNamespace(
+            segment=SimpleNamespace(start_index=0, end_index=first_end),
+            grounding_chunk_indices=[0],
+        ),
+        SimpleNamespace(
+            segment=SimpleNamespace(start_index=first_end + 1, end_index=len(text)),
+            grounding_chunk_indices=[0, 1],
+        ),
+    ]
+    metadata = SimpleNamespace(grounding_chunks=chunks, grounding_supports=supports)
+    return SimpleNamespace(
+        text=text, candidates=[SimpleNamespace(grounding_metadata=metadata)]
+    )
+
+
+class _FakeModels:
+    def __init__(self, latency: Union[float, Callable[[], float]]) -> None:
+        self.latency = latency
+
+    def _delay(self) -> float:
+        return self.latency() if callable(self.latency) else self.latency
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> Any:
+        time.sleep(self._delay())
+        return _search_response(_prompt_text(contents)[:80])
+
+
+class _FakeAsyncModels(_FakeModels):
+    async def generate_content(
+        self, model: str, contents: Any, config: Any = None
+    ) -> Any:
+        await asyncio.sleep(self._delay())
+        return _search_response(_prompt_text(contents)[:80])
+
+
+class FakeGenaiClient:
+    """google-genai `Client` stand-in returning grounded search responses.
+
+    `latency` is either fixed or a callable drawing the latency of each search.
+    """
+
+    def __init__(self, latency: Union[float, Callable[[], float]]) -> None:
+        self.models = _FakeModels(latency)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(latency))
+
+
+def install(
+    graph_module: Any,
+    latency: float = 0.05,
+    sufficient: Sufficiency = True,
+    search_latency: Optional[Callable[[], float]] = None,
+) -> None:
+    """Point the client accessors of `agent.graph` at the fakes.
+
+    `sufficient` is either fixed or a callable judging each reflection prompt.
+    """
+    chat = FakeChatModel(latency=latency, sufficient=sufficient)
+    genai = FakeGenaiClient(search_latency or latency)
+
+    def get_chat_model(model, temperature, cached_content=None):
+        if cached_content is None:
+            return chat
+        # Prompts continue a cached prefix held by the local stand-in backend
+        prefix = graph_module.context_cache.backend.get(cached_content)
+        return chat.model_copy(update={"prefix": prefix})
+
+    graph_module.get_chat_model = get_chat_model
+    graph_module.get_structured_model = (
+        lambda model, temperature, schema, cached_content=None: get_chat_model(
+            model, temperature, cached_content
+        ).with_structured_output(schema)
+    )
+    graph_module.get_genai_client = lambda: genai
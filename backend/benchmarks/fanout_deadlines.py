@@ -0,0 +1,95 @@
+"""Compare research run tail latency with and without fan-out deadlines.
+
+Runs the compiled graph against the fake Gemini stand-in, where a share of the
+grounded searches are stragglers taking many times the usual latency, and
+reports latency percentiles of full research runs for each fan-out setting.
+
+    python benchmarks/fanout_deadlines.py --runs 40 --straggler-rate 0.05
+"""
+
+import argparse
+import asyncio
+import importlib
+import random
+import statistics
+import time
+from typing import List
+
+import fake_gemini
+from langchain_core.messages import HumanMessage
+
+from agent.metrics import metrics
+
+# `agent` re-exports the compiled graph under the same name as the module.
+graph_module = importlib.import_module("agent.graph")
+
+SETTINGS = {
+    "wait all": {},
+    "timeout": {"branch_timeout_seconds": 0.4},
+    "quorum 0.8": {"branch_quorum": 0.8},
+    "both": {"branch_quorum": 0.8, "branch_timeout_seconds": 0.4},
+}
+
+
+def _state(i: int) -> dict:
+    return {
+        "messages": [HumanMessage(content=f"Research question number {i}")],
+        "initial_search_query_count": 5,
+        "max_research_loops": 2,
+    }
+
+
+async def run_all(runs: int, configurable: dict) -> List[float]:
+    config = {"configurable": {**configurable, "web_research_cache": False}}
+
+    async def one(i: int) -> float:
+        start = time.perf_counter()
+        await graph_module.graph.ainvoke(_state(i), config)
+        return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(one(i) for i in range(runs))))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake call latency (s)")
+    parser.add_argument("--straggler-rate", type=float, default=0.05)
+    parser.add_argument(
+        "--straggler-factor", type=float, default=20, help="Straggler latency multiple"
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+
+    def search_latency() -> float:
+        if rng.random() < args.straggler_rate:
+            return args.latency * args.straggler_factor
+        return args.latency * rng.uniform(0.5, 1.5)
+
+    fake_gemini.install(
+        graph_module, latency=args.latency, sufficient=False, search_latency=search_latency
+    )
+    print(
+        f"{'setting':<12}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'max s':>8}{'abandoned':>11}"
+    )
+    for name, configurable in SETTINGS.items():
+        metrics.reset()
+        latencies = sorted(asyncio.run(run_all(args.runs, configurable)))
+        abandoned = metrics.snapshot("web_research.")["counters"].get(
+            "web_research.abandoned", 0
+        )
+        print(
+            f"{name:<12}{statistics.median(latencies):>8.2f}"
+            f"{_percentile(latencies, 0.95):>8.2f}{_percentile(latencies, 0.99):>8.2f}"
+            f"{latencies[-1]:>8.2f}{abandoned:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
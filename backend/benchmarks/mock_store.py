@@ -0,0 +1,144 @@
+"""Compare the indexed mock store with the scans it used before.
+
+Fills the in-memory mock database with 1,000,000 synthetic messages spread
+over many users and conversations, then times a search, a listing page and
+a user lookup through `agent.mock_database` and through the previous
+implementations, which scanned every conversation, every message or every
+user. Also reports how long storing the conversations, which maintains the
+indexes, took.
+
+    python benchmarks/mock_store.py --users 200 --conversations 50 --messages 100
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List, Optional
+
+from agent import mock_database
+from agent.database import ConversationInDB, ConversationMessage, UserCreate, UserInDB
+
+
+async def create_users(users: int) -> List[UserInDB]:
+    return [
+        await mock_database.create_user(
+            UserCreate(
+                email=f"user{u}@example.com",
+                username=f"user{u}",
+                full_name=f"User {u}",
+                password="password123",
+            )
+        )
+        for u in range(users)
+    ]
+
+
+async def seed(users: List[UserInDB], conversations: int, messages: int, words: List[str]) -> None:
+    rng = random.Random(0)
+    # Zipf-like word frequencies, so the first words are common and the last rare
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+
+    def text(length: int) -> str:
+        return " ".join(rng.choices(words, weights, k=length))
+
+    for user in users:
+        for _ in range(conversations):
+            await mock_database.save_conversation(
+                ConversationInDB(
+                    user_id=user.id,
+                    title=text(5),
+                    tags=rng.sample(words[:50], 2),
+                    messages=[
+                        ConversationMessage(
+                            id=str(i + 1), role="human" if i % 2 == 0 else "ai", content=text(20)
+                        )
+                        for i in range(messages)
+                    ],
+                )
+            )
+
+
+async def search_scanning(user_id: str, query: str) -> List[ConversationInDB]:
+    """Previous search, substring-matching every message of every conversation."""
+    conversations = []
+    for conv in mock_database.mock_conversations.values():
+        if conv.user_id == user_id and not conv.is_archived:
+            if (query.lower() in conv.title.lower() or
+                    any(query.lower() in msg.content.lower() for msg in conv.messages) or
+                    any(query.lower() in tag.lower() for tag in conv.tags)):
+                conversations.append(conv)
+    return conversations
+
+
+async def list_scanning(user_id: str, limit: int) -> List[ConversationInDB]:
+    """Previous listing, sorting all of the user's conversations for each page."""
+    conversations = [
+        conv for conv in mock_database.mock_conversations.values()
+        if conv.user_id == user_id and not conv.is_archived
+    ]
+    conversations.sort(key=lambda x: x.updated_at, reverse=True)
+    return conversations[:limit]
+
+
+async def user_scanning(user_id: str) -> Optional[UserInDB]:
+    """Previous lookup, scanning every user."""
+    for user in mock_database.mock_users.values():
+        if user.id == user_id:
+            return user
+    return None
+
+
+async def measure(call, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings) * 1000
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    rng = random.Random(1)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(args.vocabulary)]
+    users = await create_users(args.users)
+    start = time.perf_counter()
+    await seed(users, args.conversations, args.messages, words)
+    total = args.users * args.conversations * args.messages
+    print(f"seeded {total:,} messages in {time.perf_counter() - start:.1f}s")
+
+    user = users[len(users) // 2]
+    cases = [
+        ("search common", lambda: search_scanning(user.id, words[1]),
+         lambda: mock_database.search_conversations(user.id, words[1])),
+        ("search rare", lambda: search_scanning(user.id, words[-1]),
+         lambda: mock_database.search_conversations(user.id, words[-1])),
+        ("list page", lambda: list_scanning(user.id, args.limit),
+         lambda: mock_database.get_user_conversation_summaries(user.id, limit=args.limit)),
+        ("user by id", lambda: user_scanning(user.id),
+         lambda: mock_database.get_user_by_id(user.id)),
+    ]
+    print(f"{'operation':<15}{'scan ms':>10}{'index ms':>10}{'speedup':>9}")
+    for name, scanning, indexed in cases:
+        before = await measure(scanning, args.repeat)
+        after = await measure(indexed, args.repeat)
+        print(f"{name:<15}{before:>10.3f}{after:>10.3f}{before / after:>8.1f}x")
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--conversations", type=int, default=50, help="Per user")
+    parser.add_argument("--messages", type=int, default=100, help="Per conversation")
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Measure configuration resolution and node overhead with Gemini stubbed out.
+
+Compares the cached `Configuration.from_runnable_config` with the previous
+implementation, which read the environment and validated a new model on every
+call, both in isolation and across full graph runs against a zero-latency
+fake Gemini.
+
+    python benchmarks/node_overhead.py --calls 20000 --runs 200
+"""
+
+import argparse
+import importlib
+import os
+import time
+import timeit
+
+import fake_gemini
+from langchain_core.messages import HumanMessage
+
+from agent.configuration import Configuration
+from agent.metrics import metrics
+
+# `agent` re-exports the compiled graph under the same name as the module.
+graph_module = importlib.import_module("agent.graph")
+
+
+def from_runnable_config_uncached(cls, config=None):
+    """Previous implementation, resolving the environment on every call."""
+    configurable = config["configurable"] if config and "configurable" in config else {}
+    raw_values = {
+        name: os.environ.get(name.upper(), configurable.get(name))
+        for name in cls.model_fields.keys()
+    }
+    values = {k: v for k, v in raw_values.items() if v is not None}
+    return cls(**values)
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    config = {
+        "configurable": {
+            "max_research_loops": 2,
+            "research_category": "technology",
+            "thread_id": "benchmark",
+        }
+    }
+    cached = Configuration.from_runnable_config
+    uncached = classmethod(from_runnable_config_uncached).__get__(None, Configuration)
+    print(f"{'resolution':<10}{'us/call':>10}{'us/run':>10}")
+
+    fake_gemini.install(graph_module, latency=0)
+    state = {"messages": [HumanMessage(content="What is new?")], "max_research_loops": 2}
+    run_config = {"configurable": {"web_research_cache": False}}
+    for name, resolve in (("uncached", uncached), ("cached", cached)):
+        per_call = timeit.timeit(lambda: resolve(config), number=args.calls) / args.calls
+        # Every node and router resolves the configuration through the class
+        Configuration.from_runnable_config = resolve
+        try:
+            graph_module.graph.invoke(state, run_config)
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                graph_module.graph.invoke(state, run_config)
+            per_run = (time.perf_counter() - start) / args.runs
+        finally:
+            Configuration.from_runnable_config = cached
+        metrics.reset()
+        print(f"{name:<10}{per_call * 1e6:>10.1f}{per_run * 1e6:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Throughput and latency of generate_query with and without micro-batching.
+
+Sends generate_query calls, each of its own thread, at a steady arrival
+rate to a fake model server with a fixed number of concurrent request
+slots, where a request costs a base latency plus a small amount per task
+it holds. Reports completed calls
+per second, mean and p95 latency, and the number of model requests for each
+batch window and arrival rate.
+
+    python benchmarks/query_batching.py --rates 20,50,100 --windows 0,0.005,0.02,0.05
+"""
+
+import argparse
+import asyncio
+import importlib
+import statistics
+import threading
+import time
+from typing import List
+
+import fake_gemini
+from langchain_core.messages import HumanMessage
+
+from agent.metrics import metrics
+
+# `agent` re-exports the compiled graph under the same name as the module.
+graph_module = importlib.import_module("agent.graph")
+
+
+class FakeServerModel(fake_gemini.FakeStructuredModel):
+    """Structured model whose requests share a fixed number of server slots."""
+
+    def __init__(self, schema, slots, base_latency, task_latency) -> None:
+        super().__init__(schema, latency=0, sufficient=True)
+        self.slots = slots
+        self.base_latency = base_latency
+        self.task_latency = task_latency
+
+    def invoke(self, prompt, config=None, **kwargs):
+        tasks = max(1, prompt.count("<task "))
+        with self.slots:
+            time.sleep(self.base_latency + self.task_latency * tasks)
+        return super().invoke(prompt)
+
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        return await asyncio.to_thread(self.invoke, prompt)
+
+
+async def measure(rate: float, duration: float, window: float) -> List[float]:
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        # Every call is its own run, as on the LangGraph server
+        config = {
+            "configurable": {"query_batch_window": window or None, "thread_id": f"thread-{i}"}
+        }
+        state = {"messages": [HumanMessage(content=f"Research question number {i}")]}
+        start = time.perf_counter()
+        await graph_module.agenerate_query(state, config)
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    for i in range(int(rate * duration)):
+        tasks.append(asyncio.ensure_future(one(i)))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", default="20,50,100", help="Calls per second")
+    parser.add_argument("--windows", default="0,0.005,0.02,0.05", help="Seconds, 0 is off")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--slots", type=int, default=8, help="Concurrent server requests")
+    parser.add_argument("--base-latency", type=float, default=0.2)
+    parser.add_argument("--task-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    slots = threading.BoundedSemaphore(args.slots)
+    fake_gemini.install(graph_module, latency=0)
+    graph_module.get_structured_model = (
+        lambda model, temperature, schema, cached_content=None: FakeServerModel(
+            schema, slots, args.base_latency, args.task_latency
+        )
+    )
+
+    print(f"{'rate':>6}{'window':>8}{'calls/s':>10}{'mean s':>9}{'p95 s':>9}{'requests':>10}")
+    for rate in (float(r) for r in args.rates.split(",")):
+        for window in (float(w) for w in args.windows.split(",")):
+            metrics.reset()
+            start = time.perf_counter()
+            latencies = asyncio.run(measure(rate, args.duration, window))
+            elapsed = time.perf_counter() - start
+            requests = (
+                metrics.snapshot("query_batch.")["counters"].get("query_batch.requests")
+                if window
+                else len(latencies)
+            )
+            print(
+                f"{rate:>6.0f}{window:>8.3f}{len(latencies) / elapsed:>10.1f}"
+                f"{statistics.mean(latencies):>9.3f}"
+                f"{statistics.quantiles(latencies, n=20)[-1]:>9.3f}{requests:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
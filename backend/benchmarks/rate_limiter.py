@@ -0,0 +1,120 @@
+"""Compare unthrottled retries with the shared Gemini rate limiter under a burst.
+
+A fake endpoint answers 429 once its per-second quota is spent. One heavy user
+bursts many calls while a light user sends a few; the benchmark reports 429s,
+failed calls and how long the light user waited, first with every call sent
+immediately and retried like the client's built-in retries, then through
+`RateLimiter` configured with twice the real quota so it has to adapt.
+
+    python benchmarks/rate_limiter.py --heavy 300 --light 20 --quota 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from agent.limiter import RateLimiter, TokenBucket
+from agent.metrics import metrics
+
+
+class QuotaExceeded(Exception):
+    code = 429
+
+
+class FakeEndpoint:
+    """Endpoint accepting `quota` requests per second and rejecting the rest."""
+
+    def __init__(self, quota: float, latency: float) -> None:
+        self.bucket = TokenBucket(quota, quota)
+        self.latency = latency
+        self.rejected = 0
+
+    async def generate(self) -> str:
+        now = time.monotonic()
+        if self.bucket.delay(1, now) > 0:
+            self.rejected += 1
+            raise QuotaExceeded("429 RESOURCE_EXHAUSTED")
+        self.bucket.take(1, now)
+        await asyncio.sleep(self.latency)
+        return "ok"
+
+
+async def naive_call(endpoint: FakeEndpoint, retries: int = 2) -> str:
+    # Mirrors client-side retries with a short exponential backoff
+    for attempt in range(retries + 1):
+        try:
+            return await endpoint.generate()
+        except QuotaExceeded:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(0.1 * 2**attempt)
+    raise AssertionError
+
+
+async def run(
+    heavy: int, light: int, call: Callable[[str], Awaitable[str]]
+) -> Dict[str, List[float]]:
+    results: Dict[str, List[float]] = {"heavy": [], "light": [], "failed": []}
+    start = time.perf_counter()
+
+    async def one(user: str) -> None:
+        try:
+            await call(user)
+        except QuotaExceeded:
+            results["failed"].append(time.perf_counter() - start)
+            return
+        results[user].append(time.perf_counter() - start)
+
+    users = ["heavy"] * heavy + ["light"] * light
+    await asyncio.gather(*(one(user) for user in users))
+    return results
+
+
+def report(name: str, endpoint: FakeEndpoint, results: Dict[str, List[float]]) -> None:
+    light = results["light"]
+    print(
+        f"{name:<10}{endpoint.rejected:>8}{len(results['failed']):>8}"
+        f"{max(results['heavy'] + light):>10.2f}"
+        f"{statistics.median(light) if light else float('nan'):>12.2f}"
+    )
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--heavy", type=int, default=300, help="Calls of the bursting user")
+    parser.add_argument("--light", type=int, default=20, help="Calls of the other user")
+    parser.add_argument("--quota", type=float, default=20, help="Endpoint requests/second")
+    parser.add_argument("--latency", type=float, default=0.05, help="Endpoint latency (s)")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'429s':>8}{'failed':>8}{'wall s':>10}{'light p50 s':>12}")
+
+    endpoint = FakeEndpoint(args.quota, args.latency)
+    results = asyncio.run(
+        run(args.heavy, args.light, lambda user: naive_call(endpoint))
+    )
+    report("naive", endpoint, results)
+
+    endpoint = FakeEndpoint(args.quota, args.latency)
+    limiter = RateLimiter({"fake": {"rps": args.quota * 2, "tpm": 10**9}}, 64, 2)
+    results = asyncio.run(
+        run(
+            args.heavy,
+            args.light,
+            lambda user: limiter.acall("fake", user, 100, endpoint.generate),
+        )
+    )
+    report("limiter", endpoint, results)
+    wait = metrics.snapshot("llm_limiter.wait_seconds.fake")["summaries"]
+    wait = wait["llm_limiter.wait_seconds.fake"]
+    print(
+        f"limiter queue wait: mean {wait['mean']:.2f} s, max {wait['max']:.2f} s; "
+        f"final rate factor {limiter.model('fake').rate_factor:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the cached get_research_topic with the previous `+=` version.
+
+Grows a conversation turn by turn, the way graph state does, and renders the
+research topic three times per turn (generate_query, reflection and
+finalize_answer). Reports the total time per conversation and the topic size
+with and without a turn window.
+
+    python benchmarks/research_topic.py --turns 200 --window 20
+"""
+
+import argparse
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.utils import get_research_topic
+
+
+def get_research_topic_concat(messages):
+    """Previous implementation, rebuilding the transcript with `+=`."""
+    if len(messages) == 1:
+        research_topic = messages[-1].content
+    else:
+        research_topic = ""
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                research_topic += f"User: {message.content}\n"
+            elif isinstance(message, AIMessage):
+                research_topic += f"Assistant: {message.content}\n"
+    return research_topic
+
+
+def synthetic_conversation(turns: int, turn_chars: int):
+    messages = []
+    for i in range(turns):
+        cls = HumanMessage if i % 2 == 0 else AIMessage
+        content = (f"turn {i} " + "lorem ipsum dolor sit amet " * turn_chars)[:turn_chars]
+        messages.append(cls(content=content, id=str(uuid.uuid4())))
+    return messages
+
+
+def run(conversation, render) -> float:
+    start = time.perf_counter()
+    for end in range(1, len(conversation) + 1):
+        messages = conversation[:end]
+        for _ in range(3):
+            render(messages)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--turn-chars", type=int, default=2_000)
+    parser.add_argument("--window", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    conversation = synthetic_conversation(args.turns, args.turn_chars)
+    assert get_research_topic(conversation) == get_research_topic_concat(conversation)
+
+    print(f"{'version':<10}{'ms/conv':>10}{'topic chars':>14}")
+    for name, render in (
+        ("concat", get_research_topic_concat),
+        ("cached", get_research_topic),
+        ("windowed", lambda messages: get_research_topic(messages, args.window)),
+    ):
+        # Fresh message ids per repeat so no run starts from a warm cache
+        seconds = min(
+            run(synthetic_conversation(args.turns, args.turn_chars), render)
+            for _ in range(args.repeat)
+        )
+        print(f"{name:<10}{seconds * 1000:>10.1f}{len(render(conversation)):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare single-pass short url substitution with the per-source loop.
+
+Builds an answer citing a subset of many gathered sources and rewrites it
+with the previous per-source `in`/`replace` loop, with `replace_short_urls`
+and with the streaming `ShortUrlRewriter` fed in small chunks.
+
+    python benchmarks/short_url_substitution.py --sources 1000
+"""
+
+import argparse
+import random
+import timeit
+
+from agent.streaming import SHORT_URL_PREFIX, ShortUrlRewriter, replace_short_urls
+
+
+def replace_short_urls_loop(text, sources):
+    """Previous implementation, scanning the whole answer once per source."""
+    unique_sources = []
+    for source in sources:
+        if source["short_url"] in text:
+            text = text.replace(source["short_url"], source["value"])
+            unique_sources.append(source)
+    return text, unique_sources
+
+
+def replace_short_urls_streaming(text, sources, chunk_size=16):
+    rewriter = ShortUrlRewriter(sources)
+    parts = [
+        rewriter.feed(text[i : i + chunk_size]) for i in range(0, len(text), chunk_size)
+    ]
+    parts.append(rewriter.flush())
+    return "".join(parts), rewriter.unique_sources
+
+
+def synthetic_answer(sources: int, cited: int, seed: int = 0):
+    rng = random.Random(seed)
+    # Three-digit indices so no short url is a prefix of another, which the
+    # loop implementation would corrupt.
+    gathered = [
+        {
+            "label": f"site{i}",
+            "short_url": f"{SHORT_URL_PREFIX}{i // 100}-{100 + i % 100}",
+            "value": f"https://example.com/articles/{i}",
+        }
+        for i in range(sources)
+    ]
+    paragraphs = []
+    for source in rng.sample(gathered, min(cited, sources)):
+        paragraphs.append(
+            "Analysts reported steady growth in the sector this quarter "
+            f"[{source['label']}]({source['short_url']})."
+        )
+    return "\n\n".join(paragraphs), gathered
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", type=int, default=1000)
+    parser.add_argument("--cited", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    text, sources = synthetic_answer(args.sources, args.cited)
+    expected_text, expected_sources = replace_short_urls_loop(text, sources)
+    for func in (replace_short_urls, replace_short_urls_streaming):
+        rewritten, used = func(text, sources)
+        assert rewritten == expected_text
+        assert sorted(s["short_url"] for s in used) == sorted(
+            s["short_url"] for s in expected_sources
+        )
+
+    print(f"{len(text)} chars, {args.sources} sources, {args.cited} cited")
+    for name, func in (
+        ("loop", replace_short_urls_loop),
+        ("one-pass", replace_short_urls),
+        ("streaming", replace_short_urls_streaming),
+    ):
+        seconds = timeit.timeit(lambda: func(text, sources), number=args.repeat)
+        print(f"{name:<10}{seconds / args.repeat * 1000:>10.2f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
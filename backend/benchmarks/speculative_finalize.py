@@ -0,0 +1,85 @@
+"""Measure the latency saved by drafting the answer while reflection runs.
+
+Runs the compiled graph against the fake Gemini stand-in with and without
+`speculative_finalize`, where a share of the questions is answered in one
+research loop and the rest need a follow-up loop, and reports the mean
+latency, the speculation win rate and the tokens spent on discarded drafts.
+
+    python benchmarks/speculative_finalize.py --runs 50 --sufficient-rate 0.7
+"""
+
+import argparse
+import asyncio
+import importlib
+import statistics
+import time
+from typing import List
+
+import fake_gemini
+from langchain_core.messages import HumanMessage
+
+from agent.metrics import metrics
+
+# `agent` re-exports the compiled graph under the same name as the module.
+graph_module = importlib.import_module("agent.graph")
+
+
+def _state(i: int) -> dict:
+    return {
+        "messages": [HumanMessage(content=f"Research question number {i}")],
+        "initial_search_query_count": 3,
+        "max_research_loops": 2,
+    }
+
+
+async def run_group(runs: int, speculative: bool) -> List[float]:
+    config = {
+        "configurable": {"speculative_finalize": speculative, "web_research_cache": False}
+    }
+
+    async def one(i: int) -> float:
+        start = time.perf_counter()
+        await graph_module.graph.ainvoke(_state(i), config)
+        return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(one(i) for i in range(runs))))
+
+
+def measure(runs: int, sufficient_rate: float, latency: float, speculative: bool) -> None:
+    metrics.reset()
+    sufficient_runs = round(runs * sufficient_rate)
+    latencies: List[float] = []
+    for sufficient, count in ((True, sufficient_runs), (False, runs - sufficient_runs)):
+        fake_gemini.install(graph_module, latency=latency, sufficient=sufficient)
+        latencies += asyncio.run(run_group(count, speculative))
+    counters = metrics.snapshot("speculative_finalize.")["counters"]
+    attempts = counters.get("speculative_finalize.attempts", 0)
+    wins = counters.get("speculative_finalize.wins", 0)
+    print(
+        f"{'on' if speculative else 'off':<13}{statistics.mean(latencies):>10.3f}"
+        f"{wins / attempts if attempts else 0:>10.2f}"
+        f"{counters.get('speculative_finalize.wasted_tokens', 0):>15}"
+    )
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument(
+        "--sufficient-rate",
+        type=float,
+        default=0.7,
+        help="Share of questions answered after the first research loop",
+    )
+    # Long enough that a saved model round trip outweighs graph overhead
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake call latency (s)")
+    args = parser.parse_args()
+
+    print(f"{'speculation':<13}{'mean s':>10}{'win rate':>10}{'wasted tokens':>15}")
+    for speculative in (False, True):
+        measure(args.runs, args.sufficient_rate, args.latency, speculative)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Measure sources_gathered size and reducer time over a multi-loop research run.
+
+Replays the sources_gathered updates of a synthetic run (several branches per
+loop, each citing a handful of pages many times) through `operator.add` and
+through `merge_sources`, and reports the serialized checkpoint size of the
+channel and the total reducer time.
+
+    python benchmarks/state_growth.py --loops 5
+"""
+
+import argparse
+import operator
+import random
+import time
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.state import merge_sources
+from agent.streaming import SHORT_URL_PREFIX
+
+
+def branch_sources(branch_id: int, rng: random.Random, supports: int, pages: int):
+    sources = []
+    for _ in range(supports):
+        for page in rng.sample(range(pages), rng.randint(1, 3)):
+            sources.append(
+                {
+                    "label": f"site{page}",
+                    "short_url": f"{SHORT_URL_PREFIX}{branch_id}-{page}",
+                    "value": f"https://vertexaisearch.cloud.google.com/grounding-api-redirect/{branch_id:04d}{page:04d}"
+                    + "x" * 180,
+                }
+            )
+    return sources
+
+
+def replay(reducer, updates):
+    state, elapsed, sizes = [], 0.0, []
+    serde = JsonPlusSerializer()
+    for loop_updates in updates:
+        for update in loop_updates:
+            start = time.perf_counter()
+            state = reducer(state, update)
+            elapsed += time.perf_counter() - start
+        sizes.append(len(serde.dumps_typed(state)[1]))
+    return state, elapsed, sizes
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loops", type=int, default=5)
+    parser.add_argument("--branches", type=int, default=3, help="web_research branches per loop")
+    parser.add_argument("--supports", type=int, default=25, help="Grounding supports per branch")
+    parser.add_argument("--pages", type=int, default=8, help="Distinct pages per branch")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    updates, branch_id = [], 0
+    for _ in range(args.loops):
+        loop_updates = []
+        for _ in range(args.branches):
+            loop_updates.append(branch_sources(branch_id, rng, args.supports, args.pages))
+            branch_id += 1
+        updates.append(loop_updates)
+
+    for name, reducer in (("operator.add", operator.add), ("merge_sources", merge_sources)):
+        state, elapsed, sizes = replay(reducer, updates)
+        per_loop = " ".join(f"{size / 1024:.0f}" for size in sizes)
+        print(
+            f"{name:<14}{len(state):>6} sources  {elapsed * 1000:>7.2f} ms reducer  "
+            f"checkpoint KiB per loop: {per_loop}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,34 @@
 
 from typing import List, Optional
 from datetime import datetime, timedelta
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
 from fastapi.security import HTTPBearer
-from pydantic import BaseModel
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel, Field
 
 from agent.database import (
-    UserCreate, UserLogin, UserResponse, ConversationInDB, ConversationMessage,
+    UserCreate, UserLogin, UserResponse, ConversationInDB, ConversationMessage, ConversationPage,
     create_user, authenticate_user, get_user_by_username, get_user_by_email,
-    create_access_token, save_conversation, get_user_conversations,
-    get_conversation_by_id, update_conversation, search_conversations
+    create_access_token, save_conversation, get_user_conversation_summaries,
+    get_conversation_by_id, search_conversations,
+    append_messages, decode_cursor
 )
 from agent.auth import get_current_active_user, create_user_response
+from agent.cache import answer_cache, web_research_cache
+from agent.clients import registry as client_registry
+from agent.coalesce import coalesced_graph
+from agent.context_cache import context_cache
+from agent.depth import depth_controller
+from agent.limiter import rate_limiter
+from agent.metrics import metrics
+from agent.state import RUN_INPUT_FIELDS
 
 router = APIRouter()
 security = HTTPBearer()
 
+# Largest page the conversation list and search return
+MAX_PAGE_SIZE = 100
+
 # Auth models
 class Token(BaseModel):
     access_token: str
@@ -46,6 +59,19 @@ class MessageCreate(BaseModel):
 class SearchRequest(BaseModel):
     query: str
     category: Optional[str] = None
+    limit: int = Field(20, ge=1, le=MAX_PAGE_SIZE)
+    cursor: Optional[str] = None
+
+class ResearchRequest(BaseModel):
+    question: str
+    category: Optional[str] = None
+    initial_search_query_count: Optional[int] = None
+    max_research_loops: Optional[int] = None
+    reasoning_model: Optional[str] = None
+
+class ResearchResponse(BaseModel):
+    answer: str
+    sources: List[dict]
 
 # Authentication endpoints
 @router.post("/api/auth/register", response_model=Token)
@@ -131,25 +157,36 @@ async def create_conversation(
 
 @router.get("/api/conversations", response_model=List[ConversationResponse])
 async def get_conversations(
-    skip: int = 0,
-    limit: int = 50,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: UserResponse = Depends(get_current_active_user)
 ):
-    """Get user's conversations."""
-    conversations = await get_user_conversations(current_user.id, skip, limit)
-    
+    """Get user's conversations.
+
+    The cursor of the next page, if any, is returned in the X-Next-Cursor header.
+    """
+    _check_cursor(cursor)
+    page = await get_user_conversation_summaries(current_user.id, skip, limit, cursor)
+    return _page_response(page, response)
+
+def _check_cursor(cursor: Optional[str]) -> None:
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _page_response(page: ConversationPage, response: Response) -> List[ConversationResponse]:
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
     return [
         ConversationResponse(
-            id=conv.id,
-            title=conv.title,
-            category=conv.category,
-            tags=conv.tags,
-            created_at=conv.created_at,
-            updated_at=conv.updated_at,
-            message_count=len(conv.messages),
-            last_message_preview=conv.messages[-1].content[:100] + "..." if conv.messages else None
+            **summary.dict(exclude={"last_message_preview"}),
+            last_message_preview=summary.last_message_preview + "..." if summary.message_count else None
         )
-        for conv in conversations
+        for summary in page.conversations
     ]
 
 @router.get("/api/conversations/{conversation_id}", response_model=ConversationInDB)
@@ -174,50 +211,101 @@ async def add_message_to_conversation(
     current_user: UserResponse = Depends(get_current_active_user)
 ):
     """Add a message to a conversation."""
-    conversation = await get_conversation_by_id(conversation_id)
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    if conversation.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to access this conversation")
-    
-    new_message = ConversationMessage(
-        id=str(len(conversation.messages) + 1),
-        role=message.role,
-        content=message.content,
-        metadata=message.metadata
-    )
-    
-    conversation.messages.append(new_message)
-    await update_conversation(conversation_id, {"messages": [msg.dict() for msg in conversation.messages]})
-    
+    await _append_messages(conversation_id, current_user, [message])
     return {"message": "Message added successfully"}
 
+@router.post("/api/conversations/{conversation_id}/messages/batch")
+async def add_messages_to_conversation(
+    conversation_id: str,
+    messages: List[MessageCreate],
+    current_user: UserResponse = Depends(get_current_active_user)
+):
+    """Add several messages, such as a question and its answer, in one update."""
+    if not messages:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="At least one message is required",
+        )
+    appended = await _append_messages(conversation_id, current_user, messages)
+    return {"message": "Messages added successfully", "ids": [m.id for m in appended]}
+
+async def _append_messages(
+    conversation_id: str, current_user: UserResponse, messages: List[MessageCreate]
+) -> List[ConversationMessage]:
+    new_messages = [
+        # Ids are assigned by the data layer
+        ConversationMessage(id="", role=m.role, content=m.content, metadata=m.metadata)
+        for m in messages
+    ]
+    appended = await append_messages(conversation_id, current_user.id, new_messages)
+    if appended is None:
+        # Only failed appends pay for loading the conversation
+        conversation = await get_conversation_by_id(conversation_id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        raise HTTPException(status_code=403, detail="Not authorized to access this conversation")
+    return appended
+
 @router.post("/api/conversations/search", response_model=List[ConversationResponse])
 async def search_user_conversations(
     search_request: SearchRequest,
+    response: Response,
     current_user: UserResponse = Depends(get_current_active_user)
 ):
-    """Search through user's conversations."""
-    conversations = await search_conversations(
+    """Search through user's conversations, paged like the conversation list."""
+    _check_cursor(search_request.cursor)
+    page = await search_conversations(
         current_user.id, 
         search_request.query, 
-        search_request.category
+        search_request.category,
+        search_request.limit,
+        search_request.cursor
     )
-    
-    return [
-        ConversationResponse(
-            id=conv.id,
-            title=conv.title,
-            category=conv.category,
-            tags=conv.tags,
-            created_at=conv.created_at,
-            updated_at=conv.updated_at,
-            message_count=len(conv.messages),
-            last_message_preview=conv.messages[-1].content[:100] + "..." if conv.messages else None
+    return _page_response(page, response)
+
+# Research endpoints
+@router.post("/api/research", response_model=ResearchResponse)
+async def run_research(
+    request: ResearchRequest,
+    response: Response,
+    current_user: UserResponse = Depends(get_current_active_user)
+):
+    """Answer a research question, reusing a cached answer when one is fresh."""
+    state = {"messages": [HumanMessage(content=request.question)]}
+    for field in RUN_INPUT_FIELDS:
+        if getattr(request, field) is not None:
+            state[field] = getattr(request, field)
+    category = request.category or "general"
+    config = {"configurable": {"research_category": category, "user_id": current_user.id}}
+
+    key = answer_cache.key(state, config)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        response.headers["X-Cache"] = "HIT"
+        return ResearchResponse(
+            answer=cached["answer"].content, sources=cached["sources_gathered"]
         )
-        for conv in conversations
-    ]
+
+    result = await coalesced_graph.ainvoke(state, config)
+    answer_cache.store(key, result, category)
+    response.headers["X-Cache"] = "MISS"
+    return ResearchResponse(
+        answer=result["messages"][-1].content, sources=result.get("sources_gathered", [])
+    )
+
+# Metrics endpoints
+@router.get("/api/metrics")
+async def get_metrics(current_user: UserResponse = Depends(get_current_active_user)):
+    """Get in-process agent metrics."""
+    return {
+        "llm_clients": client_registry.stats(),
+        "web_research_cache": web_research_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "context_cache": context_cache.stats(),
+        "llm_limiter": rate_limiter.stats(),
+        "research_depth": depth_controller.stats(),
+        **metrics.snapshot(),
+    }
 
 # Category-specific endpoints
 @router.get("/api/categories/trending")
@@ -31,8 +31,10 @@ async def lifespan(app: FastAPI):
         db_module.create_access_token = mock_database.create_access_token
         db_module.save_conversation = mock_database.save_conversation
         db_module.get_user_conversations = mock_database.get_user_conversations
+        db_module.get_user_conversation_summaries = mock_database.get_user_conversation_summaries
         db_module.get_conversation_by_id = mock_database.get_conversation_by_id
         db_module.update_conversation = mock_database.update_conversation
+        db_module.append_messages = mock_database.append_messages
         db_module.search_conversations = mock_database.search_conversations
     yield
     # Cleanup on shutdown if needed
@@ -52,6 +54,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API routes
@@ -0,0 +1,158 @@
+"""Micro-batching of concurrent generate_query calls into one model request."""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable
+
+from agent.limiter import rate_limiter
+from agent.metrics import metrics
+from agent.prompts import batched_query_writer_instructions
+from agent.utils import estimate_tokens
+
+# Batch requests are queued in the rate limiter under their own caller
+BATCH_CALLER = "query-batch"
+
+_batch_pool = ThreadPoolExecutor(thread_name_prefix="query-batch")
+
+
+class _QueryBatch:
+    """Prompts collected for one model, with the futures of their callers."""
+
+    def __init__(self, model: str, batch_llm: Runnable, llm: Runnable) -> None:
+        self.model = model
+        self.batch_llm = batch_llm
+        self.llm = llm
+        self.items: List[Tuple[str, Future]] = []
+
+
+class QueryBatcher:
+    """Sends query generation prompts arriving close together as one request.
+
+    The first prompt for a model opens a batch, which is sent `window` seconds
+    later or as soon as it holds `max_size` prompts. Each research run sends
+    one prompt, so a batch holds the prompts of different runs and users. A
+    batch of several prompts goes out as one multi-task prompt through
+    `batch_llm`, with every prompt inside its own task tags, and each result
+    names the task it answers. Unless the results answer every task exactly
+    once, the batched response is discarded and every prompt is sent on its
+    own through `llm`, as is a batch of one.
+    """
+
+    def __init__(self) -> None:
+        """Start with no batch open."""
+        self._lock = threading.Lock()
+        self._open: Dict[str, _QueryBatch] = {}
+
+    def _enqueue(
+        self,
+        model: str,
+        prompt: str,
+        batch_llm: Runnable,
+        llm: Runnable,
+        window: float,
+        max_size: int,
+    ) -> Future:
+        future: Future = Future()
+        with self._lock:
+            batch = self._open.get(model)
+            if batch is None:
+                batch = self._open[model] = _QueryBatch(model, batch_llm, llm)
+                timer = threading.Timer(window, self._flush, (batch,))
+                timer.daemon = True
+                timer.start()
+            batch.items.append((prompt, future))
+            full = len(batch.items) >= max_size
+            if full:
+                del self._open[model]
+        if full:
+            _batch_pool.submit(self._send, batch)
+        return future
+
+    def _flush(self, batch: _QueryBatch) -> None:
+        with self._lock:
+            # Already sent because it filled up before the window closed
+            if self._open.get(batch.model) is not batch:
+                return
+            del self._open[batch.model]
+        self._send(batch)
+
+    def _send(self, batch: _QueryBatch) -> None:
+        metrics.observe("query_batch.size", len(batch.items))
+        metrics.incr("query_batch.prompts", len(batch.items))
+        prompts = [prompt for prompt, _ in batch.items]
+        try:
+            if len(prompts) == 1:
+                results = [self._invoke(batch, batch.llm, prompts[0])]
+            else:
+                tasks = "\n\n".join(
+                    f'<task index="{i}">\n{prompt}\n</task>'
+                    for i, prompt in enumerate(prompts, 1)
+                )
+                response = self._invoke(
+                    batch,
+                    batch.batch_llm,
+                    batched_query_writer_instructions.format(
+                        count=len(prompts), tasks=tasks
+                    ),
+                )
+                results = self._by_task(response.results, len(prompts))
+                if results is None:
+                    metrics.incr("query_batch.mismatches")
+                    results = [
+                        self._invoke(batch, batch.llm, prompt) for prompt in prompts
+                    ]
+        except BaseException as exc:
+            for _, future in batch.items:
+                future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for (_, future), result in zip(batch.items, results):
+            future.set_result(result)
+
+    @staticmethod
+    def _by_task(results: List[Any], count: int) -> Optional[List[Any]]:
+        """Order `results` by task, or None unless each task has exactly one."""
+        by_task = {result.task: result for result in results}
+        if len(results) != count or sorted(by_task) != list(range(1, count + 1)):
+            return None
+        return [by_task[task] for task in range(1, count + 1)]
+
+    @staticmethod
+    def _invoke(batch: _QueryBatch, llm: Runnable, prompt: str) -> Any:
+        metrics.incr("query_batch.requests")
+        return rate_limiter.call(
+            batch.model, BATCH_CALLER, estimate_tokens(prompt), lambda: llm.invoke(prompt)
+        )
+
+    def run(
+        self,
+        model: str,
+        prompt: str,
+        batch_llm: Runnable,
+        llm: Runnable,
+        window: float,
+        max_size: int,
+    ) -> Any:
+        """Return the structured result for `prompt`, sent within a batch."""
+        return self._enqueue(model, prompt, batch_llm, llm, window, max_size).result()
+
+    async def arun(
+        self,
+        model: str,
+        prompt: str,
+        batch_llm: Runnable,
+        llm: Runnable,
+        window: float,
+        max_size: int,
+    ) -> Any:
+        """Async implementation of `run`."""
+        return await asyncio.wrap_future(
+            self._enqueue(model, prompt, batch_llm, llm, window, max_size)
+        )
+
+
+query_batcher = QueryBatcher()
@@ -0,0 +1,298 @@
+"""Caches for research results shared across graph runs."""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from agent.configuration import Configuration
+from agent.metrics import metrics
+from agent.state import RUN_INPUT_FIELDS
+from agent.utils import fold_case_and_whitespace, get_research_topic, normalize_query
+
+WEB_RESEARCH_CACHE_SIZE = int(os.getenv("WEB_RESEARCH_CACHE_SIZE", "1024"))
+WEB_RESEARCH_CACHE_PATH = os.getenv("WEB_RESEARCH_CACHE_PATH")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(60 * 60)))
+
+# Seconds a web research result stays fresh, per research category.
+WEB_RESEARCH_CACHE_TTLS = {
+    "trending": 10 * 60,
+    "sports": 10 * 60,
+    "technology": 60 * 60,
+    "general": 6 * 60 * 60,
+}
+
+SHORT_URL_PREFIX = "https://vertexaisearch.cloud.google.com/id/"
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after a per-entry TTL."""
+
+    def __init__(self, max_size: int) -> None:
+        """Keep at most `max_size` entries."""
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the live value for `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """Store `value` under `key` for `ttl` seconds, evicting the oldest entries."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> bool:
+        """Remove `key`, returning whether it was present."""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every key matching `predicate`, returning how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """Return the number of entries, expired ones included until they are read."""
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCacheStore:
+    """On-disk cache tier storing JSON values with an absolute expiry time."""
+
+    def __init__(self, path: str) -> None:
+        """Open or create the SQLite database at `path`."""
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the live value for `key`, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store `value` under `key` for `ttl` seconds and drop expired rows."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Remove every row."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+
+def _rebase_short_urls(value: Any, old_id: int, new_id: int) -> Any:
+    """Rewrite short urls minted for branch `old_id` to belong to branch `new_id`."""
+    old, new = f"{SHORT_URL_PREFIX}{old_id}-", f"{SHORT_URL_PREFIX}{new_id}-"
+    if isinstance(value, str):
+        return value.replace(old, new)
+    if isinstance(value, list):
+        return [_rebase_short_urls(item, old_id, new_id) for item in value]
+    if isinstance(value, dict):
+        return {k: _rebase_short_urls(v, old_id, new_id) for k, v in value.items()}
+    return value
+
+
+class WebResearchCache:
+    """Two-tier cache of `web_research` state updates.
+
+    Entries are keyed on the normalized query, the model and the date the
+    search prompt was rendered for, so a result never outlives the day it was
+    grounded on. The in-memory LRU is always consulted first; the optional
+    SQLite tier survives restarts and is shared by every worker using the
+    same file.
+    """
+
+    def __init__(
+        self, max_size: int = WEB_RESEARCH_CACHE_SIZE, path: Optional[str] = None
+    ) -> None:
+        """Keep `max_size` results in memory, and on disk at `path` if given."""
+        self.memory = TTLCache(max_size)
+        self.disk = SQLiteCacheStore(path) if path else None
+
+    @staticmethod
+    def key(query: str, model: str, date_bucket: str) -> str:
+        """Return the content address of a search."""
+        payload = "\x1f".join((normalize_query(query), model, date_bucket))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str, branch_id: int) -> Optional[Dict[str, Any]]:
+        """Return the cached state update for `key`, re-minted for `branch_id`."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            metrics.incr("web_research_cache.memory_hits")
+        elif self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                metrics.incr("web_research_cache.disk_hits")
+                # Only for what is left of its TTL, which may have begun in
+                # another worker. Entries without an expiry stay on disk.
+                remaining = entry.get("expires_at", 0) - time.time()
+                if remaining > 0:
+                    self.memory.set(key, entry, remaining)
+        if entry is None:
+            metrics.incr("web_research_cache.misses")
+            return None
+        metrics.incr("web_research_cache.bytes_saved", entry["size"])
+        return _rebase_short_urls(entry["update"], entry["branch_id"], branch_id)
+
+    def store(
+        self, key: str, branch_id: int, update: Dict[str, Any], category: Optional[str]
+    ) -> None:
+        """Cache a state update with the TTL of its research category."""
+        ttl = WEB_RESEARCH_CACHE_TTLS.get(category or "general")
+        if ttl is None:
+            ttl = WEB_RESEARCH_CACHE_TTLS["general"]
+        entry = {
+            "branch_id": branch_id,
+            "update": update,
+            # Wall clock time, like the expiry of the disk tier
+            "expires_at": time.time() + ttl,
+            "size": len(json.dumps(update).encode("utf-8")),
+        }
+        self.memory.set(key, entry, ttl)
+        if self.disk is not None:
+            self.disk.set(key, entry, ttl)
+
+    def clear(self) -> None:
+        """Drop every cached result from both tiers."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit rate and bytes saved since start-up."""
+        counters = metrics.snapshot("web_research_cache.")["counters"]
+        hits = counters.get("web_research_cache.memory_hits", 0) + counters.get(
+            "web_research_cache.disk_hits", 0
+        )
+        lookups = hits + counters.get("web_research_cache.misses", 0)
+        return {
+            "entries": len(self.memory),
+            "hits": hits,
+            "misses": counters.get("web_research_cache.misses", 0),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "bytes_saved": counters.get("web_research_cache.bytes_saved", 0),
+        }
+
+
+class AnswerCache:
+    """In-memory cache of final research answers.
+
+    Entries are keyed on the research topic of the conversation, with only
+    case and whitespace folded, the run inputs and the effective
+    `Configuration`, and hold the final answer message with the sources it
+    cites. They expire after ANSWER_CACHE_TTL, or sooner for research
+    categories whose web results go stale faster.
+    """
+
+    def __init__(
+        self, max_size: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL
+    ) -> None:
+        """Keep `max_size` answers for at most `ttl` seconds each."""
+        self.entries = TTLCache(max_size)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(input: Dict[str, Any], config: Optional[RunnableConfig]) -> Tuple[str, str]:
+        """Return the (topic, settings) key of a research run."""
+        topic = fold_case_and_whitespace(get_research_topic(input["messages"]))
+        settings = {
+            "input": {name: input.get(name) for name in RUN_INPUT_FIELDS},
+            "config": Configuration.from_runnable_config(config).model_dump(),
+        }
+        digest = hashlib.sha256(
+            json.dumps(settings, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        return topic, digest
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached answer for `key`, or None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            metrics.incr("answer_cache.misses")
+            return None
+        metrics.incr("answer_cache.hits")
+        return copy.deepcopy(entry)
+
+    def store(
+        self, key: Tuple[str, str], result: Dict[str, Any], category: Optional[str]
+    ) -> None:
+        """Cache the final answer and sources of a finished run."""
+        ttl = min(self.ttl, WEB_RESEARCH_CACHE_TTLS.get(category or "general", self.ttl))
+        entry = {
+            "answer": result["messages"][-1],
+            "sources_gathered": result.get("sources_gathered", []),
+        }
+        self.entries.set(key, copy.deepcopy(entry), ttl)
+
+    def invalidate(self, question: Optional[str] = None) -> int:
+        """Drop the answers to `question` under any settings, or every answer."""
+        if question is None:
+            removed = len(self.entries)
+            self.entries.clear()
+            return removed
+        topic = fold_case_and_whitespace(question)
+        return self.entries.delete_where(lambda key: key[0] == topic)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit rate since start-up."""
+        counters = metrics.snapshot("answer_cache.")["counters"]
+        hits = counters.get("answer_cache.hits", 0)
+        misses = counters.get("answer_cache.misses", 0)
+        return {
+            "entries": len(self.entries),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+
+web_research_cache = WebResearchCache(path=WEB_RESEARCH_CACHE_PATH)
+answer_cache = AnswerCache()
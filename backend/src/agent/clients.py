@@ -0,0 +1,149 @@
+"""Process-wide registry of Gemini clients shared by the graph nodes."""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Type
+
+from google.genai import Client
+from langchain_core.runnables import Runnable
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import BaseModel
+
+from agent.metrics import metrics
+
+LLM_CLIENT_CACHE_SIZE = int(os.getenv("LLM_CLIENT_CACHE_SIZE", "32"))
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class ClientRegistry:
+    """Bounded LRU cache of clients keyed by model settings.
+
+    Clients are shared by every thread that has no running event loop. Code
+    running on an event loop gets one instance per loop, because the async
+    transport of a client must not be shared between loops.
+    """
+
+    def __init__(self, max_size: int = LLM_CLIENT_CACHE_SIZE) -> None:
+        """Keep at most `max_size` clients."""
+        self.max_size = max_size
+        self._clients: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the client stored under `key`, building it with `factory` on a miss."""
+        key = (key, _running_loop())
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                metrics.incr("llm_clients.hits")
+                return client
+
+        # Build outside the lock so a slow construction doesn't block other models.
+        start = time.perf_counter()
+        client = factory()
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            existing = self._clients.get(key)
+            if existing is not None:
+                # Another caller won the race, keep theirs so the client stays shared.
+                self._clients.move_to_end(key)
+                metrics.incr("llm_clients.hits")
+                return existing
+            self._clients[key] = client
+            metrics.incr("llm_clients.misses")
+            metrics.observe("llm_clients.construction_seconds", elapsed)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                metrics.incr("llm_clients.evictions")
+            metrics.set_gauge("llm_clients.size", len(self._clients))
+        return client
+
+    def clear(self) -> None:
+        """Drop every cached client."""
+        with self._lock:
+            self._clients.clear()
+            metrics.set_gauge("llm_clients.size", 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss and construction-time counters for the registry."""
+        snapshot = metrics.snapshot("llm_clients.")
+        construction = snapshot["summaries"].get("llm_clients.construction_seconds")
+        with self._lock:
+            size = len(self._clients)
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "hits": snapshot["counters"].get("llm_clients.hits", 0),
+            "misses": snapshot["counters"].get("llm_clients.misses", 0),
+            "evictions": snapshot["counters"].get("llm_clients.evictions", 0),
+            "construction_seconds": construction["total"] if construction else 0.0,
+        }
+
+
+registry = ClientRegistry()
+
+
+def get_genai_client() -> Client:
+    """Return the shared google-genai client used for grounded search calls."""
+    return registry.get(
+        ("genai",), lambda: Client(api_key=os.getenv("GEMINI_API_KEY"))
+    )
+
+
+def get_chat_model(
+    model: str, temperature: float, cached_content: Optional[str] = None
+) -> Runnable:
+    """Return the shared chat model for `model` at `temperature`.
+
+    `cached_content` names a Gemini cached content the model's prompts continue.
+    It is bound to the shared model per call, as cached contents are too short
+    lived to key clients on.
+    """
+    chat_model = registry.get(
+        ("chat", model, temperature),
+        lambda: ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            # Throttled calls are retried by agent.limiter at an adapted rate
+            max_retries=0,
+            api_key=os.getenv("GEMINI_API_KEY"),
+        ),
+    )
+    if cached_content is None:
+        return chat_model
+    return chat_model.bind(cached_content=cached_content)
+
+
+def get_structured_model(
+    model: str,
+    temperature: float,
+    schema: Type[BaseModel],
+    cached_content: Optional[str] = None,
+) -> Runnable:
+    """Return the shared structured-output wrapper of a chat model for `schema`."""
+    if cached_content is None:
+        return registry.get(
+            ("structured", model, temperature, schema),
+            lambda: get_chat_model(model, temperature).with_structured_output(schema),
+        )
+    # Requests on cached contents cannot declare tools, so the schema is
+    # enforced through the response format instead of function calling
+    structured = registry.get(
+        ("structured", model, temperature, schema, "json_mode"),
+        lambda: get_chat_model(model, temperature).with_structured_output(
+            schema, method="json_mode"
+        ),
+    )
+    # Call arguments reach the chat model at the head of the wrapper
+    return structured.bind(cached_content=cached_content)
@@ -0,0 +1,207 @@
+"""Single-flight execution of identical concurrent research runs."""
+
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+
+from agent.configuration import Configuration
+from agent.graph import graph
+from agent.metrics import metrics
+from agent.state import RUN_INPUT_FIELDS
+from agent.utils import fold_case_and_whitespace
+
+
+def _message_key(message: Any) -> Tuple[str, str]:
+    if isinstance(message, BaseMessage):
+        role, content = message.type, message.content
+    elif isinstance(message, dict):
+        role, content = message.get("type", message.get("role", "")), message["content"]
+    else:
+        role, content = "human", message
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True)
+    return role, fold_case_and_whitespace(content)
+
+
+class _StreamFlight:
+    """Events of a shared stream, replayed to every subscriber."""
+
+    def __init__(self) -> None:
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Any = None, done: bool = False) -> None:
+        if done:
+            self.done = True
+        else:
+            self.events.append(event)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            changed = self._changed
+            if index < len(self.events):
+                yield self.events[index]
+                index += 1
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await changed.wait()
+
+
+class CoalescingGraph:
+    """Front for a compiled graph that shares one execution between identical runs.
+
+    Runs started while an identical run is in flight, with the same messages
+    up to case and whitespace, run inputs and effective `Configuration`, wait
+    for that run instead of executing the graph again. Every caller gets its own copy of the
+    final state, and `astream` subscribers receive every event of the shared
+    stream from the start. Runs on a thread (which carry checkpointed state)
+    or with their own callbacks are never coalesced.
+    """
+
+    def __init__(self, graph: Any) -> None:
+        """Coalesce the runs of the compiled `graph`."""
+        self.graph = graph
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._async_calls: Dict[Tuple[Any, str], asyncio.Task] = {}
+        self._streams: Dict[Tuple[Any, str], _StreamFlight] = {}
+
+    @staticmethod
+    def key(
+        input: Dict[str, Any], config: Optional[RunnableConfig], **kwargs: Any
+    ) -> Optional[str]:
+        """Return the single-flight key of a run, or None if it must run alone."""
+        config = config or {}
+        if config.get("callbacks") or config.get("configurable", {}).get("thread_id"):
+            return None
+        payload = {
+            "messages": [_message_key(m) for m in input.get("messages", [])],
+            "input": {name: input.get(name) for name in RUN_INPUT_FIELDS},
+            "config": Configuration.from_runnable_config(config).model_dump(),
+            "options": kwargs,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def invoke(
+        self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        """Run the graph, or wait for an identical run already in flight."""
+        key = self.key(input, config, **kwargs)
+        if key is None:
+            return self.graph.invoke(input, config, **kwargs)
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = Future()
+        if not leader:
+            metrics.incr("coalesce.followers")
+            return copy.deepcopy(flight.result())
+
+        metrics.incr("coalesce.leaders")
+        try:
+            result = self.graph.invoke(input, config, **kwargs)
+        except BaseException as exc:
+            flight.set_exception(exc)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ainvoke(
+        self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        """Async implementation of `invoke`."""
+        key = self.key(input, config, **kwargs)
+        if key is None:
+            return await self.graph.ainvoke(input, config, **kwargs)
+        # Tasks belong to one event loop, so flights are per loop
+        flight_key = (asyncio.get_running_loop(), key)
+        task = self._async_calls.get(flight_key)
+        if task is None:
+            metrics.incr("coalesce.leaders")
+            task = asyncio.ensure_future(self.graph.ainvoke(input, config, **kwargs))
+            self._async_calls[flight_key] = task
+            task.add_done_callback(lambda _: self._async_calls.pop(flight_key, None))
+            # Shielded so one caller going away does not cancel the others' run
+            return await asyncio.shield(task)
+        metrics.incr("coalesce.followers")
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def astream(
+        self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """Stream the graph, or join an identical stream already in flight."""
+        key = self.key(input, config, stream=True, **kwargs)
+        if key is None:
+            async for event in self.graph.astream(input, config, **kwargs):
+                yield event
+            return
+        flight_key = (asyncio.get_running_loop(), key)
+        flight = self._streams.get(flight_key)
+        if flight is None:
+            metrics.incr("coalesce.leaders")
+            flight = self._streams[flight_key] = _StreamFlight()
+            flight.task = asyncio.ensure_future(
+                self._pump(flight_key, flight, input, config, kwargs)
+            )
+        else:
+            metrics.incr("coalesce.followers")
+        flight.subscribers += 1
+        try:
+            async for event in flight.subscribe():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            # Nobody is listening anymore, stop paying for the run
+            if flight.subscribers == 0 and not flight.done:
+                self._forget_stream(flight_key, flight)
+                flight.task.cancel()
+
+    def _forget_stream(self, flight_key: Tuple[Any, str], flight: _StreamFlight) -> None:
+        # New runs start a fresh flight once this one has finished
+        if self._streams.get(flight_key) is flight:
+            del self._streams[flight_key]
+
+    async def _pump(
+        self,
+        flight_key: Tuple[Any, str],
+        flight: _StreamFlight,
+        input: Dict[str, Any],
+        config: Optional[RunnableConfig],
+        kwargs: Dict[str, Any],
+    ) -> None:
+        try:
+            async for event in self.graph.astream(input, config, **kwargs):
+                flight.publish(event)
+        except BaseException as exc:
+            flight.error = exc
+            if not isinstance(exc, Exception):
+                raise
+        finally:
+            self._forget_stream(flight_key, flight)
+            flight.publish(done=True)
+
+
+coalesced_graph = CoalescingGraph(graph)
@@ -1,6 +1,8 @@
+import json
 import os
-from pydantic import BaseModel, Field
-from typing import Any, Optional
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Any, Dict, Literal, Optional, Tuple
 
 from langchain_core.runnables import RunnableConfig
 
@@ -8,6 +10,9 @@ from langchain_core.runnables import RunnableConfig
 class Configuration(BaseModel):
     """The configuration for the agent."""
 
+    # Instances are cached and shared by every node of every run
+    model_config = ConfigDict(frozen=True)
+
     query_generator_model: str = Field(
         default="gemini-2.0-flash",
         metadata={
@@ -39,22 +44,196 @@ class Configuration(BaseModel):
         metadata={"description": "The maximum number of research loops to perform."},
     )
 
+    query_batch_window: Optional[float] = Field(
+        default=None,
+        metadata={
+            "description": "Seconds during which concurrent query generation requests are collected into one batched model call. Unset sends each request on its own."
+        },
+    )
+
+    query_batch_size: int = Field(
+        default=16,
+        metadata={
+            "description": "Maximum number of query generation requests sent in one batched model call."
+        },
+    )
+
+    max_topic_turns: Optional[int] = Field(
+        default=None,
+        metadata={
+            "description": "Number of latest conversation turns kept verbatim in the research topic, besides the first one. Older turns are omitted. Unset keeps the whole conversation."
+        },
+    )
+
+    adaptive_depth: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether the initial query count and research loop budget are chosen per question, up to number_of_initial_queries and max_research_loops."
+        },
+    )
+
+    latency_budget_seconds: Optional[float] = Field(
+        default=None,
+        metadata={
+            "description": "Seconds of research a run should fit in. With adaptive_depth, caps the research loops at what past runs managed in that time."
+        },
+    )
+
+    query_similarity_threshold: float = Field(
+        default=0.85,
+        metadata={
+            "description": "Similarity (0-1) at or above which a generated query is dropped as a duplicate of an earlier one. Values above 1 disable deduplication."
+        },
+    )
+
+    summary_token_budgets: Dict[str, int] = Field(
+        default={
+            "gemini-2.0-flash": 200_000,
+            "gemini-2.5-flash": 200_000,
+            "gemini-2.5-pro": 100_000,
+        },
+        metadata={
+            "description": "Maximum estimated tokens of web research summaries packed into the reflection and answer prompts, per model name."
+        },
+    )
+
+    default_summary_token_budget: int = Field(
+        default=100_000,
+        metadata={
+            "description": "Summary token budget for models missing from summary_token_budgets."
+        },
+    )
+
+    research_category: Optional[str] = Field(
+        default=None,
+        metadata={
+            "description": "The category of the research question (trending, sports, technology or general)."
+        },
+    )
+
+    web_research_cache: bool = Field(
+        default=True,
+        metadata={
+            "description": "Whether to reuse cached web research results for repeated search queries."
+        },
+    )
+
+    speculative_finalize: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether to draft the final answer while reflection runs and keep it when no further research loop follows."
+        },
+    )
+
+    context_caching: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether the static instruction prefixes of the query, reflection and answer prompts are sent as Gemini cached contents."
+        },
+    )
+
+    branch_timeout_seconds: Optional[float] = Field(
+        default=None,
+        metadata={
+            "description": "Seconds after which web research branches still searching are abandoned so the research loop can proceed. Unset waits for every branch."
+        },
+    )
+
+    branch_quorum: float = Field(
+        default=1.0,
+        metadata={
+            "description": "Share (0-1) of web research branches that must return before the remaining branches are abandoned."
+        },
+    )
+
+    late_branch_results: Literal["discard", "merge"] = Field(
+        default="discard",
+        metadata={
+            "description": "Whether results of abandoned web research branches are discarded or merged into the next research loop."
+        },
+    )
+
+    @field_validator("summary_token_budgets", mode="before")
+    @classmethod
+    def _parse_budgets(cls, value: Any) -> Any:
+        # Values read from the environment arrive as JSON strings
+        return json.loads(value) if isinstance(value, str) else value
+
+    @property
+    def fanout_deadlines(self) -> bool:
+        """Whether web research branches run under a deadline or quorum."""
+        return self.branch_timeout_seconds is not None or self.branch_quorum < 1
+
+    def summary_token_budget(self, model: str) -> int:
+        """Return the summary token budget for `model`."""
+        return self.summary_token_budgets.get(model, self.default_summary_token_budget)
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
     ) -> "Configuration":
-        """Create a Configuration instance from a RunnableConfig."""
+        """Create a Configuration instance from a RunnableConfig.
+
+        Instances are shared between calls with equal configurable values, so
+        resolving the configuration again in every node is a dict lookup.
+        """
         configurable = (
             config["configurable"] if config and "configurable" in config else {}
         )
+        values = tuple(
+            (name, _freeze(configurable.get(name))) for name in cls.model_fields
+        )
+        try:
+            hash(values)
+        except TypeError:
+            # Unhashable configurable values are resolved without the cache
+            return _resolve.__wrapped__(cls, values)
+        return _resolve(cls, values)
+
+
+class _FrozenDict(tuple):
+    """Hashable stand-in for a dict value, made of its items sorted by key."""
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        # Sorted on repr so keys of mixed types never have to compare
+        items = sorted(value.items(), key=lambda item: repr(item[0]))
+        return _FrozenDict((k, _freeze(v)) for k, v in items)
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, _FrozenDict):
+        return {k: _thaw(v) for k, v in value}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def _snapshot_environment() -> Dict[str, str]:
+    names = (name.upper() for name in Configuration.model_fields)
+    return {name: os.environ[name] for name in names if name in os.environ}
+
+
+# Environment overrides, read once instead of on every node call
+_environment = _snapshot_environment()
+
 
-        # Get raw values from environment or config
-        raw_values: dict[str, Any] = {
-            name: os.environ.get(name.upper(), configurable.get(name))
-            for name in cls.model_fields.keys()
-        }
+@lru_cache(maxsize=256)
+def _resolve(cls: type, values: Tuple[Tuple[str, Any], ...]) -> Configuration:
+    # Environment values take precedence over the runnable config
+    raw_values = {
+        name: _environment.get(name.upper(), _thaw(value))
+        for name, value in values
+    }
+    return cls(**{k: v for k, v in raw_values.items() if v is not None})
 
-        # Filter out None values
-        values = {k: v for k, v in raw_values.items() if v is not None}
 
-        return cls(**values)
+def reload_environment() -> None:
+    """Re-read configuration overrides from the environment."""
+    global _environment
+    _environment = _snapshot_environment()
+    _resolve.cache_clear()
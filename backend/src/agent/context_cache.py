@@ -0,0 +1,320 @@
+"""Gemini cached contents for the prompt prefixes repeated across research calls."""
+
+import hashlib
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, NamedTuple, Optional, Protocol, Sequence, Set, Tuple
+
+from google.genai import types
+
+from agent.clients import get_genai_client
+from agent.metrics import metrics
+from agent.prompts import PromptTemplate
+from agent.utils import estimate_tokens
+
+CONTEXT_CACHE_TTL = float(os.getenv("CONTEXT_CACHE_TTL", str(60 * 60)))
+# Gemini rejects cached contents below a per-model minimum size
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+# Seconds before a prefix whose cache could not be created is tried again
+CONTEXT_CACHE_RETRY_SECONDS = 5 * 60
+# Prefixes remembered as seen once, waiting for a second sighting
+CONTEXT_CACHE_MAX_SIGHTINGS = 4096
+
+
+class ContextCacheBackend(Protocol):
+    """Storage of cached contents, addressed by the name it assigns."""
+
+    def create(self, model: str, contents: str, ttl: float, display_name: str) -> str:
+        """Cache `contents` for `model` for `ttl` seconds and return its name."""
+        ...
+
+    def refresh(self, name: str, ttl: float) -> None:
+        """Extend the life of `name` to `ttl` seconds from now."""
+        ...
+
+    def delete(self, name: str) -> None:
+        """Delete `name`."""
+        ...
+
+
+class GenaiContextCacheBackend:
+    """Cached contents stored by the Gemini API."""
+
+    def create(self, model: str, contents: str, ttl: float, display_name: str) -> str:
+        """Cache `contents` for `model` for `ttl` seconds and return its name."""
+        cached = get_genai_client().caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                contents=[contents], ttl=f"{int(ttl)}s", display_name=display_name
+            ),
+        )
+        return cached.name
+
+    def refresh(self, name: str, ttl: float) -> None:
+        """Extend the life of `name` to `ttl` seconds from now."""
+        get_genai_client().caches.update(
+            name=name, config=types.UpdateCachedContentConfig(ttl=f"{int(ttl)}s")
+        )
+
+    def delete(self, name: str) -> None:
+        """Delete `name`."""
+        get_genai_client().caches.delete(name=name)
+
+
+class LocalContextCacheBackend:
+    """In-process stand-in for the cached-content API, for tests and benchmarks."""
+
+    def __init__(self) -> None:
+        """Start with nothing cached."""
+        self._contents: Dict[str, Tuple[str, str, float]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def create(self, model: str, contents: str, ttl: float, display_name: str) -> str:
+        """Cache `contents` for `model` for `ttl` seconds and return its name."""
+        with self._lock:
+            name = f"cachedContents/local-{next(self._ids)}"
+            self._contents[name] = (model, contents, time.monotonic() + ttl)
+        return name
+
+    def refresh(self, name: str, ttl: float) -> None:
+        """Extend the life of `name` to `ttl` seconds from now."""
+        with self._lock:
+            model, contents, _ = self._entry(name)
+            self._contents[name] = (model, contents, time.monotonic() + ttl)
+
+    def delete(self, name: str) -> None:
+        """Delete `name`."""
+        with self._lock:
+            self._contents.pop(name, None)
+
+    def get(self, name: str) -> str:
+        """Return the contents cached under `name`."""
+        with self._lock:
+            return self._entry(name)[1]
+
+    def _entry(self, name: str) -> Tuple[str, str, float]:
+        entry = self._contents.get(name)
+        if entry is None or entry[2] <= time.monotonic():
+            raise KeyError(f"Cached content {name} not found")
+        return entry
+
+
+class _Entry(NamedTuple):
+    # None while the prefix is waiting out a failed creation
+    name: Optional[str]
+    expires_at: float
+
+
+class ContextCache:
+    """Cached contents of prompt prefixes, keyed by template, model and prefix.
+
+    Lookups never wait on the network: a missing or ageing cache is created
+    or refreshed on a background thread and the call goes out uncached in the
+    meantime. Entries are refreshed once less than half their TTL remains,
+    and forgotten once they expire. Caches of prefixes holding a run's
+    research are owned by that run and deleted when it releases them.
+    """
+
+    def __init__(
+        self,
+        backend: ContextCacheBackend,
+        ttl: float = CONTEXT_CACHE_TTL,
+        min_tokens: int = CONTEXT_CACHE_MIN_TOKENS,
+    ) -> None:
+        """Cache prefixes of at least `min_tokens` in `backend` for `ttl` seconds."""
+        self.backend = backend
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self._entries: Dict[str, _Entry] = {}
+        self._pending: Set[str] = set()
+        # Prefixes seen once by an owner, which get a cache when seen again
+        self._sightings: OrderedDict[Tuple[str, Optional[str]], None] = OrderedDict()
+        # Runs using each cache created for a run, deleted when all are done
+        self._owners: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        # One worker, so cache management calls reach the backend in order
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="context-cache")
+
+    @staticmethod
+    def key(template: PromptTemplate, model: str, prefix: str) -> str:
+        """Return the address of a rendered prefix of `template` for `model`."""
+        payload = "\x1f".join((template.template, model, prefix))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self,
+        template: PromptTemplate,
+        model: str,
+        prefixes: Sequence[str],
+        owner: Optional[str] = None,
+    ) -> Optional[Tuple[str, str]]:
+        """Return the name and text of the longest cached prefix, if any.
+
+        `prefixes` are ordered longest first, each one starting the ones
+        before it. A cache is only created for a prefix seen before, the
+        longest of them, so a prompt that grows between calls caches what it
+        shares with the previous call and a prefix sent once is never billed.
+        Caches created for an `owner` are deleted by `release`.
+        """
+        if not prefixes or estimate_tokens(prefixes[0]) < self.min_tokens:
+            return None
+        now = time.monotonic()
+        hit, creating = None, False
+        with self._lock:
+            for i, prefix in enumerate(prefixes):
+                if i and estimate_tokens(prefix) < self.min_tokens:
+                    # The shorter prefixes are too small as well
+                    break
+                key = self.key(template, model, prefix)
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires_at <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is not None and entry.name is None:
+                    continue
+                if entry is not None:
+                    if entry.expires_at - now < self.ttl / 2 and key not in self._pending:
+                        self._pending.add(key)
+                        self._pool.submit(self._renew, key, entry, model, prefix, None)
+                    if owner is not None and key in self._owners:
+                        self._owners[key].add(owner)
+                    hit = (entry.name, prefix)
+                    break
+                if self._seen_before(key, owner) and not creating and key not in self._pending:
+                    creating = True
+                    self._pending.add(key)
+                    self._pool.submit(self._renew, key, None, model, prefix, owner)
+        if hit is None:
+            metrics.incr("context_cache.misses")
+            return None
+        metrics.incr("context_cache.hits")
+        metrics.incr("context_cache.tokens_saved", estimate_tokens(hit[1]))
+        return hit
+
+    def _seen_before(self, key: str, owner: Optional[str]) -> bool:
+        # Called with the lock held. A run's caches go when it finishes, so
+        # only its own sightings count towards creating one.
+        sighting = (key, owner)
+        if sighting in self._sightings:
+            del self._sightings[sighting]
+            return True
+        self._sightings[sighting] = None
+        if len(self._sightings) > CONTEXT_CACHE_MAX_SIGHTINGS:
+            self._sightings.popitem(last=False)
+        return False
+
+    def _renew(
+        self,
+        key: str,
+        entry: Optional[_Entry],
+        model: str,
+        prefix: str,
+        owner: Optional[str],
+    ) -> None:
+        try:
+            if entry is not None:
+                try:
+                    self.backend.refresh(entry.name, self.ttl)
+                    metrics.incr("context_cache.refreshes")
+                    self._set(key, entry.name)
+                    return
+                except Exception:
+                    # Expired or deleted server-side, cache the prefix again
+                    metrics.incr("context_cache.errors")
+            try:
+                name = self.backend.create(model, prefix, self.ttl, f"prefix-{key[:16]}")
+            except Exception:
+                metrics.incr("context_cache.errors")
+                with self._lock:
+                    self._entries[key] = _Entry(
+                        None, time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+                    )
+                return
+            metrics.incr("context_cache.creates")
+            self._set(key, name)
+            if owner is not None:
+                with self._lock:
+                    self._owners.setdefault(key, set()).add(owner)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _set(self, key: str, name: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = _Entry(name, now + self.ttl)
+            # Prefixes of past days are never looked up again
+            for expired in [k for k, e in self._entries.items() if e.expires_at <= now]:
+                del self._entries[expired]
+            metrics.set_gauge("context_cache.size", len(self._entries))
+
+    def flush(self) -> None:
+        """Wait until every pending creation and refresh has finished."""
+        self._pool.submit(lambda: None).result()
+
+    def release(self, owner: str) -> None:
+        """Delete the caches created for `owner` once no other owner uses them.
+
+        Runs after the creations already queued, so a cache still being
+        created for `owner` is deleted as well.
+        """
+        self._pool.submit(self._release, owner)
+
+    def _release(self, owner: str) -> None:
+        names = []
+        with self._lock:
+            for key, owners in list(self._owners.items()):
+                owners.discard(owner)
+                if owners:
+                    continue
+                del self._owners[key]
+                entry = self._entries.pop(key, None)
+                if entry is not None and entry.name:
+                    names.append(entry.name)
+            metrics.set_gauge("context_cache.size", len(self._entries))
+        self._delete(names)
+
+    def _delete(self, names: Sequence[str]) -> None:
+        for name in names:
+            try:
+                self.backend.delete(name)
+                metrics.incr("context_cache.deletes")
+            except Exception:
+                metrics.incr("context_cache.errors")
+
+    def clear(self) -> None:
+        """Delete every cached content created by this cache."""
+        with self._lock:
+            names = [entry.name for entry in self._entries.values() if entry.name]
+            self._entries.clear()
+            self._owners.clear()
+            self._sightings.clear()
+            metrics.set_gauge("context_cache.size", 0)
+        self._delete(names)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit rate and input tokens served from cached contents."""
+        counters = metrics.snapshot("context_cache.")["counters"]
+        hits = counters.get("context_cache.hits", 0)
+        misses = counters.get("context_cache.misses", 0)
+        with self._lock:
+            size = sum(1 for entry in self._entries.values() if entry.name)
+        return {
+            "entries": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "creates": counters.get("context_cache.creates", 0),
+            "deletes": counters.get("context_cache.deletes", 0),
+            "refreshes": counters.get("context_cache.refreshes", 0),
+            "errors": counters.get("context_cache.errors", 0),
+            "tokens_saved": counters.get("context_cache.tokens_saved", 0),
+        }
+
+
+context_cache = ContextCache(GenaiContextCacheBackend())
@@ -1,10 +1,14 @@
 """Database configuration and models for the LangGraph Research Application."""
 
+import base64
+import json
 import os
-from typing import Optional, List, Dict, Any
+import re
+from typing import Optional, List, Dict, Any, Tuple, Union
 from datetime import datetime, timedelta
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
 from pydantic import BaseModel, Field, EmailStr
 from passlib.context import CryptContext
 from jose import jwt
@@ -81,6 +85,25 @@ class ConversationInDB(BaseModel):
     is_archived: bool = False
     sources_used: List[Dict[str, Any]] = Field(default_factory=list)
 
+class ConversationSummary(BaseModel):
+    """The fields of a conversation shown in the history list, without messages."""
+    id: str
+    title: str
+    category: Optional[str] = None
+    tags: List[str] = Field(default_factory=list)
+    created_at: datetime
+    updated_at: datetime
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+
+class ConversationPage(BaseModel):
+    """One page of conversation summaries and the cursor of the next page, if any."""
+    conversations: List[ConversationSummary]
+    next_cursor: Optional[str] = None
+
+# Characters of the last message kept in a conversation summary
+PREVIEW_LENGTH = 100
+
 class SessionInDB(BaseModel):
     id: str = Field(default_factory=lambda: str(ObjectId()))
     user_id: str
@@ -156,10 +179,30 @@ async def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
     )
     return user
 
+_WORDS = re.compile(r"\w+")
+
+def _keywords(title: str, tags: List[str]) -> List[str]:
+    # Lowercased words of the title and tags, so the prefix fallback of search
+    # is answered by an index on them instead of scanning every message
+    words = _WORDS.findall(title.lower())
+    for tag in tags:
+        words += _WORDS.findall(tag.lower())
+    return sorted(set(words))
+
+def _summary_fields(messages: List[Any]) -> Dict[str, Any]:
+    # Kept next to the messages so listing never has to read them
+    if not messages:
+        return {"message_count": 0, "last_message_preview": None}
+    last = messages[-1]
+    content = last["content"] if isinstance(last, dict) else last.content
+    return {"message_count": len(messages), "last_message_preview": content[:PREVIEW_LENGTH]}
+
 async def save_conversation(conversation: ConversationInDB) -> str:
     conversation_doc = conversation.dict()
     conversation_doc["_id"] = ObjectId(conversation.id)
     conversation_doc.pop("id")
+    conversation_doc.update(_summary_fields(conversation.messages))
+    conversation_doc["keywords"] = _keywords(conversation.title, conversation.tags)
     result = await conversations_collection.insert_one(conversation_doc)
     return str(result.inserted_id)
 
@@ -172,6 +215,101 @@ async def get_user_conversations(user_id: str, skip: int = 0, limit: int = 50) -
         conversations.append(ConversationInDB(**conv_doc))
     return conversations
 
+# Conversations written before the summary fields existed derive them on the server
+_SUMMARY_PROJECTION = {
+    "title": 1,
+    "category": 1,
+    "tags": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "message_count": {
+        "$ifNull": ["$message_count", {"$size": {"$ifNull": ["$messages", []]}}]
+    },
+    "last_message_preview": {
+        "$ifNull": [
+            "$last_message_preview",
+            {"$substrCP": [
+                {"$ifNull": [{"$arrayElemAt": ["$messages.content", -1]}, ""]},
+                0,
+                PREVIEW_LENGTH,
+            ]},
+        ]
+    },
+}
+
+def _summary_from_doc(conv_doc: Dict[str, Any]) -> ConversationSummary:
+    conv_doc["id"] = str(conv_doc.pop("_id"))
+    if not conv_doc.get("message_count"):
+        conv_doc["last_message_preview"] = None
+    return ConversationSummary(**conv_doc)
+
+def encode_cursor(key: Union[datetime, float], conversation_id: str) -> str:
+    """Return the opaque cursor of the page after the conversation with sort key `key`."""
+    value = key.isoformat() if isinstance(key, datetime) else key
+    payload = json.dumps([value, conversation_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Union[datetime, float], str]:
+    """Return the sort key a cursor points after, raising ValueError if it is malformed.
+
+    The key is the `updated_at` of the last conversation of a page in
+    recency order, or its relevance score for text search results.
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, conversation_id = json.loads(payload)
+        if isinstance(key, str):
+            key = datetime.fromisoformat(key)
+        elif isinstance(key, (int, float)) and not isinstance(key, bool):
+            key = float(key)
+        else:
+            raise TypeError(key)
+        return key, str(ObjectId(conversation_id))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def _after(field: str, key: Any, conversation_id: str) -> Dict[str, Any]:
+    # Conversations sorted after (key, _id) in descending order
+    return {"$or": [
+        {field: {"$lt": key}},
+        {field: key, "_id": {"$lt": ObjectId(conversation_id)}},
+    ]}
+
+def _page(rows: List[Tuple[Any, ConversationSummary]], limit: int) -> ConversationPage:
+    # Rows are (sort key, summary) pairs, one more than the page if another page follows
+    summaries = [summary for _, summary in rows[:limit]]
+    if len(rows) <= limit:
+        return ConversationPage(conversations=summaries)
+    key, last = rows[limit - 1]
+    return ConversationPage(conversations=summaries, next_cursor=encode_cursor(key, last.id))
+
+async def _summary_page(
+    query_filter: Dict[str, Any], limit: int, skip: int = 0, cursor: Optional[str] = None
+) -> ConversationPage:
+    if cursor:
+        updated_at, conversation_id = decode_cursor(cursor)
+        query_filter = {
+            **query_filter,
+            "$and": query_filter.get("$and", []) + [_after("updated_at", updated_at, conversation_id)],
+        }
+    docs = conversations_collection.find(query_filter, _SUMMARY_PROJECTION).sort(
+        [("updated_at", -1), ("_id", -1)]
+    ).skip(skip).limit(limit + 1)
+    summaries = [_summary_from_doc(conv_doc) async for conv_doc in docs]
+    return _page([(summary.updated_at, summary) for summary in summaries], limit)
+
+async def get_user_conversation_summaries(
+    user_id: str, skip: int = 0, limit: int = 50, cursor: Optional[str] = None
+) -> ConversationPage:
+    """List a user's conversations for the history panel, without their messages.
+
+    Pass the `next_cursor` of a page as `cursor` to get the page after it;
+    unlike `skip`, a cursor costs the same however deep the page is.
+    """
+    return await _summary_page(
+        {"user_id": user_id, "is_archived": False}, limit, skip, cursor
+    )
+
 async def get_conversation_by_id(conversation_id: str) -> Optional[ConversationInDB]:
     conv_doc = await conversations_collection.find_one({"_id": ObjectId(conversation_id)})
     if conv_doc:
@@ -180,38 +318,153 @@ async def get_conversation_by_id(conversation_id: str) -> Optional[ConversationI
     return None
 
 async def update_conversation(conversation_id: str, update_data: Dict[str, Any]) -> bool:
+    if "messages" in update_data:
+        update_data = {**update_data, **_summary_fields(update_data["messages"])}
+    if "title" in update_data or "tags" in update_data:
+        current = {}
+        if "title" not in update_data or "tags" not in update_data:
+            current = await conversations_collection.find_one(
+                {"_id": ObjectId(conversation_id)}, projection={"title": 1, "tags": 1}
+            ) or {}
+        title = update_data.get("title", current.get("title", ""))
+        tags = update_data.get("tags", current.get("tags", []))
+        update_data = {**update_data, "keywords": _keywords(title, tags)}
     result = await conversations_collection.update_one(
         {"_id": ObjectId(conversation_id)},
         {"$set": {**update_data, "updated_at": datetime.utcnow()}}
     )
     return result.modified_count > 0
 
-async def search_conversations(user_id: str, query: str, category: Optional[str] = None) -> List[ConversationInDB]:
-    search_filter = {
-        "user_id": user_id,
-        "is_archived": False,
-        "$or": [
-            {"title": {"$regex": query, "$options": "i"}},
-            {"messages.content": {"$regex": query, "$options": "i"}},
-            {"tags": {"$regex": query, "$options": "i"}}
-        ]
-    }
-    
+def _appended_message(message: ConversationMessage, offset: int) -> Dict[str, Any]:
+    # Values are literals so content starting with "$" is not read as a field path
+    doc = {key: {"$literal": value} for key, value in message.dict(exclude={"id"}).items()}
+    doc["id"] = {"$toString": {"$add": ["$message_seq", offset]}}
+    return doc
+
+async def append_messages(
+    conversation_id: str, user_id: str, messages: List[ConversationMessage]
+) -> Optional[List[ConversationMessage]]:
+    """Append messages to a conversation of `user_id` in one atomic update.
+
+    Message ids are taken from a per-conversation sequence kept in the
+    document, so concurrent appends never reuse an id or lose a message, and
+    only the new messages travel to the server. Returns the appended messages
+    with their ids, or None if the user has no such conversation.
+    """
+    if not messages:
+        owned = await conversations_collection.find_one(
+            {"_id": ObjectId(conversation_id), "user_id": user_id}, projection={"_id": 1}
+        )
+        return [] if owned else None
+    count = len(messages)
+    # Conversations written before the sequence existed continue from their length
+    current_seq = {"$ifNull": ["$message_seq", {"$size": {"$ifNull": ["$messages", []]}}]}
+    conv_doc = await conversations_collection.find_one_and_update(
+        {"_id": ObjectId(conversation_id), "user_id": user_id},
+        [
+            {"$set": {"message_seq": {"$add": [current_seq, count]}}},
+            {"$set": {
+                "messages": {"$concatArrays": [
+                    {"$ifNull": ["$messages", []]},
+                    [_appended_message(m, i - count + 1) for i, m in enumerate(messages)],
+                ]},
+                "updated_at": datetime.utcnow(),
+                "last_message_preview": {"$literal": messages[-1].content[:PREVIEW_LENGTH]},
+            }},
+            {"$set": {"message_count": {"$size": "$messages"}}},
+        ],
+        projection={"message_seq": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if conv_doc is None:
+        return None
+    first_id = conv_doc["message_seq"] - count + 1
+    return [m.copy(update={"id": str(first_id + i)}) for i, m in enumerate(messages)]
+
+async def _text_search_page(
+    search_filter: Dict[str, Any], query: str, limit: int, after: Optional[Tuple[float, str]]
+) -> ConversationPage:
+    pipeline: List[Dict[str, Any]] = [
+        # $text must come first and is answered by the text index
+        {"$match": {**search_filter, "$text": {"$search": query}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if after:
+        pipeline.append({"$match": _after("score", *after)})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {**_SUMMARY_PROJECTION, "score": 1}},
+    ]
+    rows = []
+    async for conv_doc in conversations_collection.aggregate(pipeline):
+        score = conv_doc.pop("score")
+        rows.append((score, _summary_from_doc(conv_doc)))
+    return _page(rows, limit)
+
+def _prefix_filter(query: str) -> Optional[Dict[str, Any]]:
+    # Every word of the query starts a title or tag word, so partial words like
+    # "quant" find "quantum". Anchored, case-sensitive regexes on the lowercased
+    # keywords are answered by a range of the (user_id, keywords) index.
+    words = _WORDS.findall(query.lower())
+    if not words:
+        return None
+    return {"$and": [{"keywords": {"$regex": "^" + re.escape(word)}} for word in words]}
+
+async def search_conversations(
+    user_id: str,
+    query: str,
+    category: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> ConversationPage:
+    """Search a user's conversations, most relevant first.
+
+    Whole words and quoted phrases are answered by the text index, ranked by
+    text score. Queries the index finds nothing for, such as a partial word,
+    fall back to conversations whose title or tags have words starting with
+    each word of the query, ranked by recency. A cursor carries its ranking,
+    so the pages of one search stay in the same mode.
+    """
+    search_filter: Dict[str, Any] = {"user_id": user_id, "is_archived": False}
     if category:
         search_filter["category"] = category
-    
-    conversations = []
-    async for conv_doc in conversations_collection.find(search_filter).sort("updated_at", -1).limit(20):
-        conv_doc["id"] = str(conv_doc["_id"])
-        conversations.append(ConversationInDB(**conv_doc))
-    return conversations
+    query = query.strip()
+    if not query:
+        return await _summary_page(search_filter, limit, cursor=cursor)
+
+    after = decode_cursor(cursor) if cursor else None
+    if after is None or isinstance(after[0], float):
+        page = await _text_search_page(search_filter, query, limit, after)
+        if page.conversations or after is not None:
+            return page
+    prefix_filter = _prefix_filter(query)
+    if prefix_filter is None:
+        return ConversationPage(conversations=[])
+    return await _summary_page({**search_filter, **prefix_filter}, limit, cursor=cursor)
 
 # Initialize database indexes
 async def init_db():
     # Create indexes for better performance
     await users_collection.create_index("username", unique=True)
     await users_collection.create_index("email", unique=True)
-    await conversations_collection.create_index([("user_id", 1), ("updated_at", -1)])
+    await conversations_collection.create_index([("user_id", 1), ("updated_at", -1), ("_id", -1)])
     await conversations_collection.create_index([("user_id", 1), ("category", 1)])
     await conversations_collection.create_index([("title", "text"), ("messages.content", "text"), ("tags", "text")])
-    await sessions_collection.create_index("expires_at", expireAfterSeconds=0)
\ No newline at end of file
+    await conversations_collection.create_index([("user_id", 1), ("keywords", 1)])
+    await _add_missing_keywords()
+    await sessions_collection.create_index("expires_at", expireAfterSeconds=0)
+
+async def _add_missing_keywords(batch_size: int = 1000) -> None:
+    # Conversations written before the keywords existed get them once, at startup
+    updates = []
+    async for conv_doc in conversations_collection.find(
+        {"keywords": {"$exists": False}}, projection={"title": 1, "tags": 1}
+    ):
+        keywords = _keywords(conv_doc.get("title", ""), conv_doc.get("tags", []))
+        updates.append(UpdateOne({"_id": conv_doc["_id"]}, {"$set": {"keywords": keywords}}))
+        if len(updates) == batch_size:
+            await conversations_collection.bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        await conversations_collection.bulk_write(updates, ordered=False)
@@ -0,0 +1,161 @@
+"""Adaptive choice of how many queries and research loops a run gets."""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from agent.metrics import metrics
+from agent.utils import topic_similarity, topic_vector
+
+# Past runs remembered per research category
+RESEARCH_HISTORY_SIZE = int(os.getenv("RESEARCH_HISTORY_SIZE", "500"))
+# Number of recent decisions kept for inspection
+RESEARCH_DECISION_LOG_SIZE = 100
+
+# Questions up to this many words that ask about one thing get one query
+SHORT_QUESTION_WORDS = 12
+LONG_QUESTION_WORDS = 30
+# Past runs at least this similar to a question count towards its history
+SIMILAR_TOPIC_THRESHOLD = 0.5
+# Similar past runs needed before their sufficiency rate is trusted
+MIN_SIMILAR_RUNS = 3
+# Categories whose questions are usually answered by one round of fresh news
+NEWS_CATEGORIES = ("trending", "sports")
+# Weight of the newest run in the moving average of seconds per research loop
+LOOP_SECONDS_SMOOTHING = 0.2
+
+_WORDS = re.compile(r"\w+")
+_ASPECT_SEPARATORS = re.compile(r",|;|\band\b|\bvs\.?|\bversus\b|\bcompared?\b", re.I)
+
+
+class DepthController:
+    """Picks the initial query count and loop budget of each research run.
+
+    The configured or requested values are upper bounds. Short questions
+    about a single thing get fewer initial queries, and questions whose
+    similar past topics were usually answered after the first loop get fewer
+    loops, as do news categories. A latency budget caps the loops at what
+    past runs managed per loop. Every decision and its signals are kept in a
+    bounded log, and every outcome feeds the history of its category.
+    """
+
+    def __init__(self, history_size: int = RESEARCH_HISTORY_SIZE) -> None:
+        """Judge each category on its last `history_size` runs."""
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._history: Dict[str, Deque[Tuple[Counter, bool]]] = {}
+        self._loop_seconds: Optional[float] = None
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=RESEARCH_DECISION_LOG_SIZE)
+
+    def _sufficiency(self, vector: Counter, category: str) -> Tuple[Optional[float], int]:
+        with self._lock:
+            history = list(self._history.get(category, ()))
+        similar = [
+            sufficient
+            for other, sufficient in history
+            if topic_similarity(vector, other) >= SIMILAR_TOPIC_THRESHOLD
+        ]
+        if len(similar) < MIN_SIMILAR_RUNS:
+            return None, len(similar)
+        return sum(similar) / len(similar), len(similar)
+
+    def plan(
+        self,
+        question: str,
+        category: Optional[str],
+        max_queries: int,
+        max_loops: int,
+        latency_budget: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Return the research plan for `question` within the given bounds."""
+        category = category or "general"
+        words = len(_WORDS.findall(question))
+        aspects = 1 + len(_ASPECT_SEPARATORS.findall(question))
+        if words <= SHORT_QUESTION_WORDS:
+            queries = aspects
+        elif words <= LONG_QUESTION_WORDS:
+            queries = max(2, aspects)
+        else:
+            queries = max_queries
+        queries = max(1, min(max_queries, queries))
+
+        rate, similar_runs = self._sufficiency(topic_vector(question), category)
+        loops = max_loops
+        if rate is not None and rate >= 0.8:
+            loops = 1
+        elif rate is not None and rate >= 0.5:
+            loops = math.ceil(max_loops / 2)
+        if category in NEWS_CATEGORIES:
+            loops = min(loops, max_loops - 1)
+        loop_seconds = self._loop_seconds
+        if latency_budget is not None and loop_seconds:
+            loops = min(loops, math.floor(latency_budget / loop_seconds))
+        loops = max(1, min(max_loops, loops))
+
+        plan = {
+            "initial_search_query_count": queries,
+            "max_research_loops": loops,
+            "signals": {
+                "words": words,
+                "aspects": aspects,
+                "category": category,
+                "similar_runs": similar_runs,
+                "sufficiency_rate": rate,
+                "latency_budget": latency_budget,
+                "loop_seconds": loop_seconds,
+            },
+            "started_at": time.time(),
+        }
+        self.decisions.append(plan)
+        metrics.incr("research_depth.plans")
+        metrics.incr("research_depth.queries_saved", max_queries - queries)
+        metrics.incr("research_depth.loops_saved", max_loops - loops)
+        return plan
+
+    def record(
+        self, plan: Dict[str, Any], question: str, loops: int, sufficient: bool
+    ) -> None:
+        """Feed the outcome of a planned run back into the history."""
+        category = plan["signals"]["category"]
+        elapsed = time.time() - plan["started_at"]
+        with self._lock:
+            history = self._history.get(category)
+            if history is None:
+                history = self._history[category] = deque(maxlen=self.history_size)
+            # A run counts as answered by one loop only if the first reflection said so
+            history.append((topic_vector(question), sufficient and loops == 1))
+            per_loop = elapsed / max(loops, 1)
+            self._loop_seconds = (
+                per_loop
+                if self._loop_seconds is None
+                else self._loop_seconds
+                + LOOP_SECONDS_SMOOTHING * (per_loop - self._loop_seconds)
+            )
+        metrics.incr(
+            "research_depth.sufficient" if sufficient else "research_depth.insufficient"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return outcome counters and the most recent decisions."""
+        counters = metrics.snapshot("research_depth.")["counters"]
+        with self._lock:
+            history = {category: len(runs) for category, runs in self._history.items()}
+            loop_seconds = self._loop_seconds
+        recent: List[Dict[str, Any]] = list(self.decisions)[-10:]
+        return {
+            "plans": counters.get("research_depth.plans", 0),
+            "queries_saved": counters.get("research_depth.queries_saved", 0),
+            "loops_saved": counters.get("research_depth.loops_saved", 0),
+            "sufficient": counters.get("research_depth.sufficient", 0),
+            "insufficient": counters.get("research_depth.insufficient", 0),
+            "history": history,
+            "loop_seconds": loop_seconds,
+            "recent_decisions": recent,
+        }
+
+
+depth_controller = DepthController()
@@ -0,0 +1,208 @@
+"""Deadline and quorum coordination for the web_research fan-out."""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from agent.cache import TTLCache
+from agent.metrics import metrics
+
+# Batches and late results are dropped after this long if a run never claims them.
+FANOUT_STATE_TTL = 60 * 60
+# Longest a branch waits for its search when only a quorum is configured
+FANOUT_MAX_WAIT = float(os.getenv("FANOUT_MAX_WAIT", "300"))
+
+_search_pool = ThreadPoolExecutor(thread_name_prefix="web-research")
+
+
+class FanoutBatch:
+    """The web_research branches sent by one fan-out.
+
+    Branches wait for their search until the batch is released, which happens
+    once `quorum` of the branches have returned a result or `timeout` seconds
+    after the first branch started, whichever comes first. Without a timeout
+    the wait is capped at FANOUT_MAX_WAIT, so a branch never blocks on a batch
+    that was evicted or recreated. A branch whose search is still running at
+    release is abandoned so the research loop can proceed; failed searches
+    do not count towards the quorum.
+    """
+
+    def __init__(
+        self,
+        coordinator: "FanoutCoordinator",
+        run_id: str,
+        batch_id: str,
+        size: int,
+        quorum: float,
+        timeout: Optional[float],
+        merge_late: bool,
+    ) -> None:
+        """Wait for the `quorum` share of `size` branches, for at most `timeout` seconds."""
+        self.coordinator = coordinator
+        self.run_id = run_id
+        self.batch_id = batch_id
+        self.size = size
+        self.needed = min(size, max(1, math.ceil(size * quorum)))
+        self.deadline = time.monotonic() + (timeout if timeout is not None else FANOUT_MAX_WAIT)
+        self.merge_late = merge_late
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._reported = 0
+        self._released = False
+        self._waiters: List[Callable[[], None]] = []
+
+    def _remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def _on_release(self, wake: Callable[[], None]) -> None:
+        with self._lock:
+            if not self._released:
+                self._waiters.append(wake)
+                return
+        wake()
+
+    def _report(self, completed: bool) -> None:
+        with self._lock:
+            self._reported += 1
+            if completed:
+                self._completed += 1
+            waiters = []
+            if self._completed >= self.needed and not self._released:
+                self._released, waiters, self._waiters = True, self._waiters, []
+            finished = self._reported >= self.size
+        for wake in waiters:
+            wake()
+        if finished:
+            self.coordinator.forget(self.batch_id)
+
+    def _keep_late(self, done: "Future | asyncio.Future") -> None:
+        if done.cancelled() or done.exception() is not None:
+            return
+        if self.merge_late:
+            self.coordinator.add_late_result(self.run_id, done.result())
+        else:
+            metrics.incr("web_research.late_discarded")
+
+    def run(self, search: Callable[[], Any]) -> Optional[Any]:
+        """Run `search` on a worker thread, returning None if it is abandoned."""
+        started = time.perf_counter()
+        future: Future = _search_pool.submit(search)
+        wake = threading.Event()
+        future.add_done_callback(lambda _: wake.set())
+        self._on_release(wake.set)
+        wake.wait(self._remaining())
+        if future.done():
+            self._report(completed=future.exception() is None)
+            metrics.observe("web_research.branch_seconds", time.perf_counter() - started)
+            return future.result()
+
+        self._report(completed=False)
+        metrics.incr("web_research.abandoned")
+        # A worker thread cannot be interrupted, so the search finishes regardless
+        future.add_done_callback(self._keep_late)
+        return None
+
+    async def arun(self, search: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """Await `search`, returning None if it is abandoned."""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(search())
+        released = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(
+                lambda: released.done() or released.set_result(None)
+            )
+
+        self._on_release(wake)
+        try:
+            await asyncio.wait(
+                {task, released},
+                timeout=self._remaining(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        except BaseException:
+            task.cancel()
+            raise
+        if task.done():
+            self._report(completed=not task.cancelled() and task.exception() is None)
+            metrics.observe("web_research.branch_seconds", time.perf_counter() - started)
+            return task.result()
+
+        self._report(completed=False)
+        metrics.incr("web_research.abandoned")
+        if self.merge_late:
+            task.add_done_callback(self._keep_late)
+        else:
+            task.cancel()
+        return None
+
+
+class FanoutCoordinator:
+    """Process-wide registry of fan-out batches and the late results of each run."""
+
+    def __init__(self) -> None:
+        """Start with no batches."""
+        self._lock = threading.Lock()
+        self._batches = TTLCache(max_size=4096)
+        self._late = TTLCache(max_size=4096)
+
+    @staticmethod
+    def new_run_id() -> str:
+        """Return an id grouping the fan-outs of one research run."""
+        return uuid4().hex
+
+    @staticmethod
+    def new_batch(run_id: str, size: int) -> Dict[str, Any]:
+        """Return the `fanout` field sent to every branch of a new batch."""
+        return {"run_id": run_id, "batch_id": uuid4().hex, "size": size}
+
+    def batch(
+        self,
+        fanout: Dict[str, Any],
+        quorum: float,
+        timeout: Optional[float],
+        merge_late: bool,
+    ) -> FanoutBatch:
+        """Return the batch described by a branch's `fanout` field."""
+        with self._lock:
+            batch = self._batches.get(fanout["batch_id"])
+            if batch is None:
+                batch = FanoutBatch(
+                    self,
+                    fanout["run_id"],
+                    fanout["batch_id"],
+                    fanout["size"],
+                    quorum,
+                    timeout,
+                    merge_late,
+                )
+                self._batches.set(fanout["batch_id"], batch, FANOUT_STATE_TTL)
+            return batch
+
+    def forget(self, batch_id: str) -> None:
+        """Drop a batch once every branch has reported."""
+        self._batches.delete(batch_id)
+
+    def add_late_result(self, run_id: str, result: Any) -> None:
+        """Keep the result of an abandoned branch for the next loop of its run."""
+        with self._lock:
+            pending = self._late.get(run_id) or []
+            self._late.set(run_id, pending + [result], FANOUT_STATE_TTL)
+        metrics.incr("web_research.late_stored")
+
+    def claim_late_results(self, run_id: str) -> List[Any]:
+        """Remove and return the late results waiting for `run_id`."""
+        with self._lock:
+            pending = self._late.get(run_id) or []
+            self._late.delete(run_id)
+        metrics.incr("web_research.late_merged", len(pending))
+        return pending
+
+
+fanout = FanoutCoordinator()
@@ -1,46 +1,238 @@
+import asyncio
 import os
+from typing import Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from functools import partial
 
-from agent.tools_and_schemas import SearchQueryList, Reflection
+from agent.tools_and_schemas import SearchQueryBatch, SearchQueryList, Reflection
 from dotenv import load_dotenv
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from langgraph.types import Send
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
-from langchain_core.runnables import RunnableConfig
-from google.genai import Client
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
 from agent.state import (
     OverallState,
+    merge_sources,
     QueryGenerationState,
     ReflectionState,
     WebSearchState,
 )
-from agent.configuration import Configuration
+from agent.configuration import Configuration, reload_environment
 from agent.prompts import (
+    PromptTemplate,
     get_current_date,
     query_writer_instructions,
     web_searcher_instructions,
     reflection_instructions,
     answer_instructions,
 )
-from langchain_google_genai import ChatGoogleGenerativeAI
+from agent.batching import query_batcher
+from agent.cache import web_research_cache
+from agent.clients import get_chat_model, get_genai_client, get_structured_model
+from agent.context_cache import context_cache
+from agent.depth import depth_controller
+from agent.fanout import fanout
+from agent.limiter import caller_id, rate_limiter
+from agent.metrics import metrics
+from agent.streaming import (
+    ReplayChatModel,
+    ShortUrlRewriter,
+    ShortUrlRewritingChatModel,
+)
 from agent.utils import (
+    deduplicate_queries,
+    estimate_tokens,
     get_citations,
     get_research_topic,
     insert_citation_markers,
+    pack_summaries,
     resolve_urls,
 )
 
 load_dotenv()
+# Take the configuration overrides loaded from .env into account
+reload_environment()
 
 if os.getenv("GEMINI_API_KEY") is None:
     raise ValueError("GEMINI_API_KEY is not set")
 
 # Used for Google Search API
-genai_client = Client(api_key=os.getenv("GEMINI_API_KEY"))
+web_search_config = {
+    "tools": [{"google_search": {}}],
+    "temperature": 0,
+}
+
+
+def _limited(model: str, config: RunnableConfig, prompt: str, call):
+    # Every Gemini call waits for the process-wide limiter of its model
+    return rate_limiter.call(model, caller_id(config), estimate_tokens(prompt), call)
+
+
+async def _alimited(model: str, config: RunnableConfig, prompt: str, call):
+    return await rate_limiter.acall(
+        model, caller_id(config), estimate_tokens(prompt), call
+    )
+
+
+def _record_prompt_tokens(node: str, prompt: str) -> None:
+    metrics.observe(f"prompt_tokens.{node}", estimate_tokens(prompt))
+
+
+def _render_prompt(
+    caching: bool,
+    template: PromptTemplate,
+    model: str,
+    summaries: Optional[Sequence[str]] = None,
+    separator: str = "",
+    run_id: Optional[str] = None,
+    **values,
+):
+    # With context caching the longest prefix with a cache lives server-side
+    # and only the rest is sent; until one exists the whole prompt goes out.
+    if summaries is not None:
+        values["summaries"] = separator.join(summaries)
+    prompt = template.format(**values)
+    if not caching:
+        return prompt, None
+    # The summaries follow the static prefix and only grow across research
+    # loops and follow-up turns, so each run of leading summaries extends it
+    static_prefix = template.static_prefix(**values)
+    prefixes = [
+        static_prefix + separator.join(summaries[:count])
+        for count in range(len(summaries or ()), 0, -1)
+    ] + [static_prefix]
+    # Prefixes holding the summaries of a run are cached for that run only
+    owner = run_id if summaries else None
+    cached = context_cache.lookup(template, model, prefixes, owner)
+    if cached is None or not prompt.startswith(cached[1]):
+        return prompt, None
+    cached_content, prefix = cached
+    return prompt[len(prefix):], cached_content
+
+
+def _packed_summaries(
+    state: OverallState, configurable: Configuration, model: str, research_topic: str
+):
+    # Keep the summaries within the model's budget as research loops accumulate
+    summaries = state["web_research_result"]
+    packed = pack_summaries(
+        summaries, research_topic, configurable.summary_token_budget(model)
+    )
+    if len(packed) < len(summaries):
+        metrics.incr("summary_packing.dropped", len(summaries) - len(packed))
+    return packed
 
 
 # Nodes
+#
+# Every node that calls Gemini has a sync and an async implementation sharing the
+# same prompt building and result handling. LangGraph runs the async one under
+# `ainvoke`/`astream`, so the web_research fan-out waits on the event loop instead
+# of blocking one thread per query.
+def _prepare_generate_query(state: OverallState, config: RunnableConfig):
+    configurable = Configuration.from_runnable_config(config)
+
+    plan = _research_plan(state, configurable)
+    state["research_plan"] = plan
+    if plan is not None:
+        state["initial_search_query_count"] = plan["initial_search_query_count"]
+    # check for custom initial search query count
+    elif state.get("initial_search_query_count") is None:
+        state["initial_search_query_count"] = configurable.number_of_initial_queries
+
+    # Format the prompt
+    current_date = get_current_date()
+    formatted_prompt, cached_content = _render_prompt(
+        # Batched prompts are sent whole, inside the multi-task prompt
+        configurable.context_caching and configurable.query_batch_window is None,
+        query_writer_instructions,
+        configurable.query_generator_model,
+        current_date=current_date,
+        research_topic=get_research_topic(
+            state["messages"], configurable.max_topic_turns
+        ),
+        number_queries=state["initial_search_query_count"],
+    )
+    _record_prompt_tokens("generate_query", formatted_prompt)
+
+    # Gemini 2.0 Flash, shared across runs
+    structured_llm = get_structured_model(
+        configurable.query_generator_model, 1.0, SearchQueryList, cached_content
+    )
+    return configurable, structured_llm, formatted_prompt
+
+
+def _latest_question(messages) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return str(message.content)
+    return ""
+
+
+def _research_plan(state: OverallState, configurable: Configuration):
+    if not configurable.adaptive_depth:
+        return None
+    # Requested and configured depths are the upper bounds of the plan
+    return depth_controller.plan(
+        _latest_question(state["messages"]),
+        configurable.research_category,
+        state.get("initial_search_query_count")
+        or configurable.number_of_initial_queries,
+        state.get("max_research_loops") or configurable.max_research_loops,
+        configurable.latency_budget_seconds,
+    )
+
+
+def _record_research(state: OverallState) -> None:
+    plan = state.get("research_plan")
+    if plan is not None:
+        depth_controller.record(
+            plan,
+            _latest_question(state["messages"]),
+            state.get("research_loop_count", 0),
+            bool(state.get("is_sufficient")),
+        )
+
+
+def _query_batch_args(
+    configurable: Configuration, structured_llm, formatted_prompt: str
+):
+    model = configurable.query_generator_model
+    return (
+        model,
+        formatted_prompt,
+        get_structured_model(model, 1.0, SearchQueryBatch),
+        structured_llm,
+        configurable.query_batch_window,
+        configurable.query_batch_size,
+    )
+
+
+def _generate_query_update(
+    state: OverallState, configurable: Configuration, result
+) -> QueryGenerationState:
+    # Drop paraphrased queries before they fan out into paid grounded searches
+    queries = _deduplicate(
+        result.query, state.get("search_query", []), configurable
+    )
+    return {
+        "search_query": queries,
+        "research_plan": state["research_plan"],
+        "research_run_id": fanout.new_run_id(),
+    }
+
+
+def _deduplicate(queries, already_run, configurable: Configuration):
+    kept = deduplicate_queries(
+        queries, already_run, configurable.query_similarity_threshold
+    )
+    metrics.incr("query_dedup.dropped", len(queries) - len(kept))
+    return kept
+
+
 def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerationState:
     """LangGraph node that generates search queries based on the User's question.
 
@@ -54,102 +246,219 @@ def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerati
     Returns:
         Dictionary with state update, including search_query key containing the generated queries
     """
-    configurable = Configuration.from_runnable_config(config)
-
-    # check for custom initial search query count
-    if state.get("initial_search_query_count") is None:
-        state["initial_search_query_count"] = configurable.number_of_initial_queries
-
-    # init Gemini 2.0 Flash
-    llm = ChatGoogleGenerativeAI(
-        model=configurable.query_generator_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
-    structured_llm = llm.with_structured_output(SearchQueryList)
-
-    # Format the prompt
-    current_date = get_current_date()
-    formatted_prompt = query_writer_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        number_queries=state["initial_search_query_count"],
+    configurable, structured_llm, formatted_prompt = _prepare_generate_query(
+        state, config
     )
     # Generate the search queries
-    result = structured_llm.invoke(formatted_prompt)
-    return {"search_query": result.query}
+    if configurable.query_batch_window is not None:
+        result = query_batcher.run(
+            *_query_batch_args(configurable, structured_llm, formatted_prompt)
+        )
+    else:
+        result = _limited(
+            configurable.query_generator_model,
+            config,
+            formatted_prompt,
+            lambda: structured_llm.invoke(formatted_prompt),
+        )
+    return _generate_query_update(state, configurable, result)
+
+
+async def agenerate_query(
+    state: OverallState, config: RunnableConfig
+) -> QueryGenerationState:
+    """Async implementation of `generate_query`."""
+    configurable, structured_llm, formatted_prompt = _prepare_generate_query(
+        state, config
+    )
+    if configurable.query_batch_window is not None:
+        result = await query_batcher.arun(
+            *_query_batch_args(configurable, structured_llm, formatted_prompt)
+        )
+    else:
+        result = await _alimited(
+            configurable.query_generator_model,
+            config,
+            formatted_prompt,
+            lambda: structured_llm.ainvoke(formatted_prompt),
+        )
+    return _generate_query_update(state, configurable, result)
+
 
+def _fanout_field(state, configurable: Configuration, size: int) -> dict:
+    if not configurable.fanout_deadlines:
+        return {}
+    return {"fanout": fanout.new_batch(state["research_run_id"], size)}
 
-def continue_to_web_research(state: QueryGenerationState):
+
+def continue_to_web_research(state: QueryGenerationState, config: RunnableConfig):
     """LangGraph node that sends the search queries to the web research node.
 
     This is used to spawn n number of web research nodes, one for each search query.
     """
+    configurable = Configuration.from_runnable_config(config)
+    fanout_field = _fanout_field(state, configurable, len(state["search_query"]))
     return [
-        Send("web_research", {"search_query": search_query, "id": int(idx)})
+        Send(
+            "web_research",
+            {"search_query": search_query, "id": int(idx), **fanout_field},
+        )
         for idx, search_query in enumerate(state["search_query"])
     ]
 
 
-def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
-    """LangGraph node that performs web research using the native Google Search API tool.
-
-    Executes a web search using the native Google Search API tool in combination with Gemini 2.0 Flash.
-
-    Args:
-        state: Current graph state containing the search query and research loop count
-        config: Configuration for the runnable, including search API settings
-
-    Returns:
-        Dictionary with state update, including sources_gathered, research_loop_count, and web_research_results
-    """
-    # Configure
+def _prepare_web_research(state: WebSearchState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
+    current_date = get_current_date()
     formatted_prompt = web_searcher_instructions.format(
-        current_date=get_current_date(),
+        current_date=current_date,
         research_topic=state["search_query"],
     )
-
-    # Uses the google genai client as the langchain client doesn't return grounding metadata
-    response = genai_client.models.generate_content(
-        model=configurable.query_generator_model,
-        contents=formatted_prompt,
-        config={
-            "tools": [{"google_search": {}}],
-            "temperature": 0,
-        },
+    _record_prompt_tokens("web_research", formatted_prompt)
+    # Results are cached per query, model and day since the prompt embeds the date
+    cache_key = (
+        web_research_cache.key(
+            state["search_query"], configurable.query_generator_model, current_date
+        )
+        if configurable.web_research_cache
+        else None
+    )
+    return configurable, formatted_prompt, cache_key
+
+
+def _cached_web_research(state: WebSearchState, cache_key):
+    if cache_key is None:
+        return None
+    cached = web_research_cache.lookup(cache_key, state["id"])
+    if cached is None:
+        return None
+    return {**cached, "search_query": [state["search_query"]]}
+
+
+def _fanout_batch(state: WebSearchState, configurable: Configuration):
+    if not state.get("fanout"):
+        return None
+    return fanout.batch(
+        state["fanout"],
+        configurable.branch_quorum,
+        configurable.branch_timeout_seconds,
+        merge_late=configurable.late_branch_results == "merge",
     )
+
+
+def _branch_update(state: WebSearchState, update) -> OverallState:
+    if update is None:
+        # Abandoned, the query still counts as run so later branch ids stay unique
+        return {"search_query": [state["search_query"]]}
+    late = fanout.claim_late_results(state["fanout"]["run_id"])
+    if not late:
+        return update
+    # Results of branches abandoned in an earlier loop of this run
+    return {
+        **update,
+        "web_research_result": update["web_research_result"]
+        + [text for result in late for text in result["web_research_result"]],
+        "sources_gathered": merge_sources(
+            update["sources_gathered"],
+            [source for result in late for source in result["sources_gathered"]],
+        ),
+    }
+
+
+def _web_research_update(
+    state: WebSearchState, response, configurable: Configuration, cache_key
+) -> OverallState:
     # resolve the urls to short urls for saving tokens and time
     resolved_urls = resolve_urls(
         response.candidates[0].grounding_metadata.grounding_chunks, state["id"]
     )
     # Gets the citations and adds them to the generated text
     citations = get_citations(response, resolved_urls)
-    modified_text = insert_citation_markers(response.text, citations)
-    sources_gathered = [item for citation in citations for item in citation["segments"]]
+    modified_text = insert_citation_markers(
+        response.text, citations, byte_offsets=True
+    )
+    sources_gathered = merge_sources(
+        [], [item for citation in citations for item in citation["segments"]]
+    )
 
-    return {
+    update = {
         "sources_gathered": sources_gathered,
         "search_query": [state["search_query"]],
         "web_research_result": [modified_text],
     }
+    if cache_key is not None:
+        web_research_cache.store(
+            cache_key, state["id"], update, configurable.research_category
+        )
+    return update
 
 
-def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
-    """LangGraph node that identifies knowledge gaps and generates potential follow-up queries.
+def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
+    """LangGraph node that performs web research using the native Google Search API tool.
 
-    Analyzes the current summary to identify areas for further research and generates
-    potential follow-up queries. Uses structured output to extract
-    the follow-up query in JSON format.
+    Executes a web search using the native Google Search API tool in combination with Gemini 2.0 Flash.
 
     Args:
-        state: Current graph state containing the running summary and research topic
-        config: Configuration for the runnable, including LLM provider settings
+        state: Current graph state containing the search query and research loop count
+        config: Configuration for the runnable, including search API settings
 
     Returns:
-        Dictionary with state update, including search_query key containing the generated follow-up query
+        Dictionary with state update, including sources_gathered, research_loop_count, and web_research_results
     """
+    configurable, formatted_prompt, cache_key = _prepare_web_research(state, config)
+
+    def search() -> OverallState:
+        cached = _cached_web_research(state, cache_key)
+        if cached is not None:
+            return cached
+
+        # Uses the google genai client as the langchain client doesn't return grounding metadata
+        response = _limited(
+            configurable.query_generator_model,
+            config,
+            formatted_prompt,
+            lambda: get_genai_client().models.generate_content(
+                model=configurable.query_generator_model,
+                contents=formatted_prompt,
+                config=web_search_config,
+            ),
+        )
+        return _web_research_update(state, response, configurable, cache_key)
+
+    batch = _fanout_batch(state, configurable)
+    if batch is None:
+        return search()
+    return _branch_update(state, batch.run(search))
+
+
+async def aweb_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
+    """Async implementation of `web_research`."""
+    configurable, formatted_prompt, cache_key = _prepare_web_research(state, config)
+
+    async def search() -> OverallState:
+        cached = _cached_web_research(state, cache_key)
+        if cached is not None:
+            return cached
+
+        response = await _alimited(
+            configurable.query_generator_model,
+            config,
+            formatted_prompt,
+            lambda: get_genai_client().aio.models.generate_content(
+                model=configurable.query_generator_model,
+                contents=formatted_prompt,
+                config=web_search_config,
+            ),
+        )
+        return _web_research_update(state, response, configurable, cache_key)
+
+    batch = _fanout_batch(state, configurable)
+    if batch is None:
+        return await search()
+    return _branch_update(state, await batch.arun(search))
+
+
+def _prepare_reflection(state: OverallState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
     # Increment the research loop count and get the reasoning model
     state["research_loop_count"] = state.get("research_loop_count", 0) + 1
@@ -157,27 +466,193 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
 
     # Format the prompt
     current_date = get_current_date()
-    formatted_prompt = reflection_instructions.format(
+    research_topic = get_research_topic(
+        state["messages"], configurable.max_topic_turns
+    )
+    summaries = _packed_summaries(state, configurable, reasoning_model, research_topic)
+    formatted_prompt, cached_content = _render_prompt(
+        configurable.context_caching,
+        reflection_instructions,
+        reasoning_model,
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n\n---\n\n".join(state["web_research_result"]),
+        research_topic=research_topic,
+        summaries=summaries,
+        separator="\n\n---\n\n",
+        run_id=state.get("research_run_id"),
     )
-    # init Reasoning Model
-    llm = ChatGoogleGenerativeAI(
-        model=reasoning_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
+    _record_prompt_tokens("reflection", formatted_prompt)
+    # Reasoning Model, shared across runs
+    structured_llm = get_structured_model(
+        reasoning_model, 1.0, Reflection, cached_content
     )
-    result = llm.with_structured_output(Reflection).invoke(formatted_prompt)
+    return configurable, reasoning_model, structured_llm, formatted_prompt
 
-    return {
+
+def _reflection_update(
+    state: OverallState, configurable: Configuration, result
+) -> ReflectionState:
+    update = {
         "is_sufficient": result.is_sufficient,
         "knowledge_gap": result.knowledge_gap,
-        "follow_up_queries": result.follow_up_queries,
+        "follow_up_queries": _deduplicate(
+            result.follow_up_queries, state["search_query"], configurable
+        ),
         "research_loop_count": state["research_loop_count"],
         "number_of_ran_queries": len(state["search_query"]),
+        # Cleared every loop so an earlier draft is never taken as the answer
+        "speculative_answer": None,
     }
+    # Decided here, where the run's loop budget is in the state, and only read by
+    # evaluate_research, so a kept draft and the route never disagree
+    update["research_complete"] = _research_complete({**state, **update}, configurable)
+    return update
+
+
+# The draft runs without the node's callbacks so its tokens are not streamed to
+# clients before reflection decides whether the draft is kept. A kept draft is
+# streamed by finalize_answer.
+_SPECULATIVE_CONFIG: RunnableConfig = {"callbacks": []}
+_speculation_pool = ThreadPoolExecutor(thread_name_prefix="speculative-finalize")
+
+
+def _draft_answer(llm: ShortUrlRewritingChatModel, answer_prompt: str, stop: Event):
+    # Streamed so a discarded draft stops at its next chunk, as a future that is
+    # already running cannot be cancelled
+    answer = None
+    for chunk in llm.stream(answer_prompt, _SPECULATIVE_CONFIG):
+        if stop.is_set():
+            break
+        answer = chunk if answer is None else answer + chunk
+    return answer
+
+
+def _keep_speculation(
+    update: ReflectionState, llm: ShortUrlRewritingChatModel, answer
+) -> ReflectionState:
+    metrics.incr("speculative_finalize.wins")
+    return {**update, "speculative_answer": _finalize_answer_update(llm, answer)}
+
+
+def _discard_speculation(draft, answer_prompt: str, stop: Optional[Event] = None) -> None:
+    metrics.incr("speculative_finalize.losses")
+    metrics.incr("speculative_finalize.wasted_tokens", estimate_tokens(answer_prompt))
+
+    def count_output(done) -> None:
+        # Output tokens are only wasted as far as the draft got before it stopped
+        if not done.cancelled() and done.exception() is None and done.result():
+            metrics.incr(
+                "speculative_finalize.wasted_tokens",
+                estimate_tokens(done.result().content),
+            )
+
+    draft.add_done_callback(count_output)
+    if stop is not None:
+        stop.set()
+    draft.cancel()
+
+
+def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
+    """LangGraph node that identifies knowledge gaps and generates potential follow-up queries.
+
+    Analyzes the current summary to identify areas for further research and generates
+    potential follow-up queries. Uses structured output to extract
+    the follow-up query in JSON format.
+
+    Args:
+        state: Current graph state containing the running summary and research topic
+        config: Configuration for the runnable, including LLM provider settings
+
+    Returns:
+        Dictionary with state update, including search_query key containing the generated follow-up query
+    """
+    configurable, reasoning_model, structured_llm, formatted_prompt = (
+        _prepare_reflection(state, config)
+    )
+    reflect = partial(structured_llm.invoke, formatted_prompt)
+    if not configurable.speculative_finalize:
+        result = _limited(reasoning_model, config, formatted_prompt, reflect)
+        return _reflection_update(state, configurable, result)
+
+    # Draft the answer on a worker thread while the reflection call runs
+    answer_model, llm, answer_prompt = _prepare_finalize_answer(state, config)
+    metrics.incr("speculative_finalize.attempts")
+    stop = Event()
+    draft = _speculation_pool.submit(
+        _limited,
+        answer_model,
+        config,
+        answer_prompt,
+        partial(_draft_answer, llm, answer_prompt, stop),
+    )
+    try:
+        result = _limited(reasoning_model, config, formatted_prompt, reflect)
+    except BaseException:
+        stop.set()
+        raise
+    update = _reflection_update(state, configurable, result)
+    if not update["research_complete"]:
+        _discard_speculation(draft, answer_prompt, stop)
+        return update
+    try:
+        answer = draft.result()
+    except Exception:
+        answer = None
+    if answer is None:
+        metrics.incr("speculative_finalize.errors")
+        return update
+    return _keep_speculation(update, llm, answer)
+
+
+async def areflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
+    """Async implementation of `reflection`."""
+    configurable, reasoning_model, structured_llm, formatted_prompt = (
+        _prepare_reflection(state, config)
+    )
+    reflect = partial(structured_llm.ainvoke, formatted_prompt)
+    if not configurable.speculative_finalize:
+        result = await _alimited(reasoning_model, config, formatted_prompt, reflect)
+        return _reflection_update(state, configurable, result)
+
+    answer_model, llm, answer_prompt = _prepare_finalize_answer(state, config)
+    metrics.incr("speculative_finalize.attempts")
+    draft = asyncio.ensure_future(
+        _alimited(
+            answer_model,
+            config,
+            answer_prompt,
+            lambda: llm.ainvoke(answer_prompt, _SPECULATIVE_CONFIG),
+        )
+    )
+    try:
+        result = await _alimited(reasoning_model, config, formatted_prompt, reflect)
+    except BaseException:
+        draft.cancel()
+        raise
+    update = _reflection_update(state, configurable, result)
+    if not update["research_complete"]:
+        _discard_speculation(draft, answer_prompt)
+        return update
+    try:
+        answer = await draft
+    except Exception:
+        metrics.incr("speculative_finalize.errors")
+        return update
+    return _keep_speculation(update, llm, answer)
+
+
+def _research_complete(state, configurable: Configuration) -> bool:
+    if state.get("research_plan") is not None:
+        max_research_loops = state["research_plan"]["max_research_loops"]
+    elif state.get("max_research_loops") is not None:
+        max_research_loops = state["max_research_loops"]
+    else:
+        max_research_loops = configurable.max_research_loops
+    return (
+        state["is_sufficient"]
+        or state["research_loop_count"] >= max_research_loops
+        # Every follow-up query was a duplicate of one already run
+        or not state["follow_up_queries"]
+    )
 
 
 def evaluate_research(
@@ -197,26 +672,85 @@ def evaluate_research(
         String literal indicating the next node to visit ("web_research" or "finalize_summary")
     """
     configurable = Configuration.from_runnable_config(config)
-    max_research_loops = (
-        state.get("max_research_loops")
-        if state.get("max_research_loops") is not None
-        else configurable.max_research_loops
-    )
-    if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops:
+    if state["research_complete"]:
         return "finalize_answer"
     else:
+        fanout_field = _fanout_field(
+            state, configurable, len(state["follow_up_queries"])
+        )
         return [
             Send(
                 "web_research",
                 {
                     "search_query": follow_up_query,
                     "id": state["number_of_ran_queries"] + int(idx),
+                    **fanout_field,
                 },
             )
             for idx, follow_up_query in enumerate(state["follow_up_queries"])
         ]
 
 
+def _prepare_finalize_answer(state: OverallState, config: RunnableConfig):
+    configurable = Configuration.from_runnable_config(config)
+    reasoning_model = state.get("reasoning_model") or configurable.answer_model
+
+    # Format the prompt
+    current_date = get_current_date()
+    research_topic = get_research_topic(
+        state["messages"], configurable.max_topic_turns
+    )
+    summaries = _packed_summaries(state, configurable, reasoning_model, research_topic)
+    formatted_prompt, cached_content = _render_prompt(
+        configurable.context_caching,
+        answer_instructions,
+        reasoning_model,
+        current_date=current_date,
+        research_topic=research_topic,
+        summaries=summaries,
+        separator="\n---\n\n",
+        run_id=state.get("research_run_id"),
+    )
+    _record_prompt_tokens("finalize_answer", formatted_prompt)
+
+    # Reasoning Model, default to Gemini 2.5 Flash, shared across runs. The wrapper
+    # replaces the short urls with the original urls as the answer streams.
+    llm = ShortUrlRewritingChatModel(
+        model=get_chat_model(reasoning_model, 0, cached_content),
+        rewriter=ShortUrlRewriter(state["sources_gathered"]),
+    )
+    return reasoning_model, llm, formatted_prompt
+
+
+def _finalize_answer_update(llm: ShortUrlRewritingChatModel, result):
+    # Keep the id of the streamed chunks so clients replace them with this message
+    return {
+        "messages": [AIMessage(content=result.content, id=result.id)],
+        "sources_gathered": llm.rewriter.unique_sources,
+    }
+
+
+def _release_context_caches(state: OverallState) -> None:
+    # The summaries of a run are not sent again once its answer is written
+    if state.get("research_run_id"):
+        context_cache.release(state["research_run_id"])
+
+
+def _replay_model(state: OverallState) -> ReplayChatModel:
+    # The draft was generated outside the callbacks, so clients have not seen it yet
+    return ReplayChatModel(message=state["speculative_answer"]["messages"][0])
+
+
+def _speculative_answer_update(state: OverallState, replayed):
+    # The answer drafted during reflection saw exactly the summaries we would use.
+    # It keeps the id it was streamed under so clients replace the chunks with it.
+    return {
+        **state["speculative_answer"],
+        "messages": [AIMessage(content=replayed.content, id=replayed.id)],
+        "speculative_answer": None,
+    }
+
+
 def finalize_answer(state: OverallState, config: RunnableConfig):
     """LangGraph node that finalizes the research summary.
 
@@ -230,49 +764,48 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
     Returns:
         Dictionary with state update, including running_summary key containing the formatted final summary with sources
     """
-    configurable = Configuration.from_runnable_config(config)
-    reasoning_model = state.get("reasoning_model") or configurable.answer_model
-
-    # Format the prompt
-    current_date = get_current_date()
-    formatted_prompt = answer_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n---\n\n".join(state["web_research_result"]),
-    )
-
-    # init Reasoning Model, default to Gemini 2.5 Flash
-    llm = ChatGoogleGenerativeAI(
-        model=reasoning_model,
-        temperature=0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
-    result = llm.invoke(formatted_prompt)
-
-    # Replace the short urls with the original urls and add all used urls to the sources_gathered
-    unique_sources = []
-    for source in state["sources_gathered"]:
-        if source["short_url"] in result.content:
-            result.content = result.content.replace(
-                source["short_url"], source["value"]
-            )
-            unique_sources.append(source)
-
-    return {
-        "messages": [AIMessage(content=result.content)],
-        "sources_gathered": unique_sources,
-    }
+    _record_research(state)
+    try:
+        if state.get("speculative_answer"):
+            replayed = _replay_model(state).invoke(state["messages"], config)
+            return _speculative_answer_update(state, replayed)
+        reasoning_model, llm, formatted_prompt = _prepare_finalize_answer(state, config)
+        result = _limited(
+            reasoning_model, config, formatted_prompt, lambda: llm.invoke(formatted_prompt)
+        )
+        return _finalize_answer_update(llm, result)
+    finally:
+        _release_context_caches(state)
+
+
+async def afinalize_answer(state: OverallState, config: RunnableConfig):
+    """Async implementation of `finalize_answer`."""
+    _record_research(state)
+    try:
+        if state.get("speculative_answer"):
+            replayed = await _replay_model(state).ainvoke(state["messages"], config)
+            return _speculative_answer_update(state, replayed)
+        reasoning_model, llm, formatted_prompt = _prepare_finalize_answer(state, config)
+        result = await _alimited(
+            reasoning_model, config, formatted_prompt, lambda: llm.ainvoke(formatted_prompt)
+        )
+        return _finalize_answer_update(llm, result)
+    finally:
+        _release_context_caches(state)
 
 
 # Create our Agent Graph
 builder = StateGraph(OverallState, config_schema=Configuration)
 
 # Define the nodes we will cycle between
-builder.add_node("generate_query", generate_query)
-builder.add_node("web_research", web_research)
-builder.add_node("reflection", reflection)
-builder.add_node("finalize_answer", finalize_answer)
+builder.add_node(
+    "generate_query", RunnableLambda(generate_query, afunc=agenerate_query)
+)
+builder.add_node("web_research", RunnableLambda(web_research, afunc=aweb_research))
+builder.add_node("reflection", RunnableLambda(reflection, afunc=areflection))
+builder.add_node(
+    "finalize_answer", RunnableLambda(finalize_answer, afunc=afinalize_answer)
+)
 
 # Set the entrypoint as `generate_query`
 # This means that this node is the first one called
@@ -0,0 +1,364 @@
+"""Process-wide rate limiting of the Gemini calls made by the graph nodes."""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from langchain_core.runnables import RunnableConfig
+
+from agent.metrics import metrics
+
+T = TypeVar("T")
+
+# Requests per second and tokens per minute per model, overridable with a JSON
+# object in LLM_RATE_LIMITS, e.g. {"gemini-2.5-pro": {"rps": 1, "tpm": 500000}}.
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "gemini-2.0-flash": {"rps": 33, "tpm": 4_000_000},
+    "gemini-2.5-flash": {"rps": 16, "tpm": 1_000_000},
+    "gemini-2.5-pro": {"rps": 2.5, "tpm": 2_000_000},
+}
+FALLBACK_RATE_LIMIT = {"rps": 10, "tpm": 1_000_000}
+LLM_RATE_LIMITS = {
+    **DEFAULT_RATE_LIMITS,
+    **json.loads(os.getenv("LLM_RATE_LIMITS", "{}")),
+}
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "64"))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "2"))
+# Seconds before the first retry of a server error, doubled on each further
+# attempt up to the maximum, with full jitter.
+LLM_RETRY_BACKOFF_BASE = float(os.getenv("LLM_RETRY_BACKOFF_BASE", "1"))
+LLM_RETRY_BACKOFF_MAX = float(os.getenv("LLM_RETRY_BACKOFF_MAX", "20"))
+
+# Status codes worth retrying; only 429 lowers the request rate.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Additive increase per successful call and multiplicative decrease per 429.
+RATE_INCREASE = 0.05
+RATE_DECREASE = 0.5
+MIN_RATE_FACTOR = 0.05
+
+
+def caller_id(config: Optional[RunnableConfig]) -> str:
+    """Return the identity calls of a run are queued under for fair scheduling."""
+    configurable = (config or {}).get("configurable", {})
+    return str(
+        configurable.get("user_id") or configurable.get("thread_id") or "anonymous"
+    )
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """Return the HTTP status behind `exc`, following wrapped exceptions."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        for attr in ("code", "status_code"):
+            value = getattr(exc, attr, None)
+            if isinstance(value, int):
+                return value
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def _total_tokens(result: Any) -> Optional[int]:
+    usage = getattr(result, "usage_metadata", None)
+    if isinstance(usage, dict):
+        return usage.get("total_tokens")
+    return getattr(usage, "total_token_count", None)
+
+
+class TokenBucket:
+    """Bucket refilled at `rate` units per second up to `capacity`.
+
+    The level may go negative when a call used more than it reserved, which
+    delays the following calls until the debt is repaid.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """Start full, refilling at `rate` units a second up to `capacity`."""
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Return the seconds until `amount` can be taken."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        """Remove `amount`, which may leave the bucket in debt."""
+        self._refill(now)
+        self.level -= amount
+
+    def drain(self, now: float) -> None:
+        """Empty the bucket, keeping any debt."""
+        self._refill(now)
+        self.level = min(self.level, 0.0)
+
+    def set_rate(self, rate: float, now: float) -> None:
+        """Change the refill rate from `now` on."""
+        self._refill(now)
+        self.rate = rate
+
+
+class _Ticket:
+    __slots__ = ("caller", "tokens", "wake", "granted", "queued_at")
+
+    def __init__(self, caller: str, tokens: int, wake: Callable[[], None]) -> None:
+        self.caller = caller
+        self.tokens = tokens
+        self.wake = wake
+        self.granted = False
+        self.queued_at = time.perf_counter()
+
+
+class ModelLimiter:
+    """Admission control for the calls to one model.
+
+    A call is admitted when the request and token buckets allow it and fewer
+    than `max_in_flight` calls are running. Waiting calls are queued per
+    caller and admitted round-robin across callers, so one user's burst does
+    not starve everyone else. Both bucket rates are scaled by a factor that
+    halves on every 429 and recovers additively with each successful call.
+    """
+
+    def __init__(self, model: str, rps: float, tpm: float, max_in_flight: int) -> None:
+        """Allow `rps` requests a second, `tpm` tokens a minute and `max_in_flight` calls at once."""
+        self.model = model
+        self.rps = rps
+        self.tpm = tpm
+        self.max_in_flight = max_in_flight
+        self.requests = TokenBucket(rps, max(1.0, rps))
+        self.tokens = TokenBucket(tpm / 60, tpm)
+        self.rate_factor = 1.0
+        self.in_flight = 0
+        self._queues: OrderedDict[str, Deque[_Ticket]] = OrderedDict()
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def _dispatch(self) -> Optional[float]:
+        # Admit queued calls round-robin; return the seconds until the next
+        # admission is possible, or None if it waits for a call to finish.
+        admitted, delay = [], None
+        with self._lock:
+            now = time.monotonic()
+            while self._queues and self.in_flight < self.max_in_flight:
+                caller, queue = next(iter(self._queues.items()))
+                ticket = queue[0]
+                wait = max(
+                    self.requests.delay(1, now), self.tokens.delay(ticket.tokens, now)
+                )
+                if wait > 0:
+                    delay = wait
+                    break
+                self.requests.take(1, now)
+                self.tokens.take(ticket.tokens, now)
+                queue.popleft()
+                # Move the caller behind everyone else waiting
+                del self._queues[caller]
+                if queue:
+                    self._queues[caller] = queue
+                self._queued -= 1
+                self.in_flight += 1
+                ticket.granted = True
+                admitted.append(ticket)
+            self._record_gauges()
+        for ticket in admitted:
+            metrics.observe(
+                f"llm_limiter.wait_seconds.{self.model}",
+                time.perf_counter() - ticket.queued_at,
+            )
+            ticket.wake()
+        return delay
+
+    def _enqueue(self, ticket: _Ticket) -> None:
+        with self._lock:
+            self._queues.setdefault(ticket.caller, deque()).append(ticket)
+            self._queued += 1
+
+    def _abandon(self, ticket: _Ticket) -> None:
+        with self._lock:
+            if ticket.granted:
+                # Admitted just before the waiter gave up, hand the slot back
+                self.in_flight -= 1
+            else:
+                queue = self._queues[ticket.caller]
+                queue.remove(ticket)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[ticket.caller]
+            self._record_gauges()
+        self._dispatch()
+
+    def _record_gauges(self) -> None:
+        metrics.set_gauge(f"llm_limiter.queue_depth.{self.model}", self._queued)
+        metrics.set_gauge(f"llm_limiter.in_flight.{self.model}", self.in_flight)
+
+    def acquire(self, caller: str, tokens: int) -> None:
+        """Block the current thread until a call may start."""
+        event = threading.Event()
+        ticket = _Ticket(caller, tokens, event.set)
+        self._enqueue(ticket)
+        try:
+            delay = self._dispatch()
+            while not ticket.granted:
+                event.wait(delay)
+                event.clear()
+                delay = self._dispatch()
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    async def aacquire(self, caller: str, tokens: int) -> None:
+        """Wait on the event loop until a call may start."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        ticket = _Ticket(caller, tokens, lambda: loop.call_soon_threadsafe(event.set))
+        self._enqueue(ticket)
+        try:
+            delay = self._dispatch()
+            while not ticket.granted:
+                try:
+                    await asyncio.wait_for(event.wait(), delay)
+                except TimeoutError:
+                    pass
+                event.clear()
+                delay = self._dispatch()
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    def release(
+        self, reserved: int, result: Any = None, error: Optional[BaseException] = None
+    ) -> None:
+        """Finish a call, charging its actual token usage and adapting the rate."""
+        with self._lock:
+            now = time.monotonic()
+            self.in_flight -= 1
+            used = _total_tokens(result) if error is None else None
+            if used is not None and used > reserved:
+                self.tokens.take(used - reserved, now)
+            if error is not None and status_code(error) == 429:
+                self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor * RATE_DECREASE)
+                # Start the next request only after a full interval at the new rate
+                self.requests.drain(now)
+                metrics.incr(f"llm_limiter.throttled.{self.model}")
+            elif error is None and self.rate_factor < 1.0:
+                self.rate_factor = min(1.0, self.rate_factor + RATE_INCREASE)
+            self.requests.set_rate(self.rps * self.rate_factor, now)
+            self.tokens.set_rate(self.tpm / 60 * self.rate_factor, now)
+            metrics.set_gauge(f"llm_limiter.rate_factor.{self.model}", self.rate_factor)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limits and load of this model."""
+        with self._lock:
+            return {
+                "queue_depth": self._queued,
+                "in_flight": self.in_flight,
+                "rate_factor": self.rate_factor,
+                "requests_per_second": self.rps * self.rate_factor,
+                "tokens_per_minute": self.tpm * self.rate_factor,
+            }
+
+
+class RateLimiter:
+    """Per-model limiters shared by every Gemini call in the process."""
+
+    def __init__(
+        self,
+        limits: Dict[str, Dict[str, float]] = LLM_RATE_LIMITS,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        retries: int = LLM_RATE_LIMIT_RETRIES,
+    ) -> None:
+        """Limit each model by its entry in `limits`, and retry `retries` times."""
+        self.limits = limits
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self._models: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def model(self, model: str) -> ModelLimiter:
+        """Return the limiter of `model`, creating it on first use."""
+        with self._lock:
+            limiter = self._models.get(model)
+            if limiter is None:
+                limit = self.limits.get(model, FALLBACK_RATE_LIMIT)
+                limiter = ModelLimiter(
+                    model, limit["rps"], limit["tpm"], self.max_in_flight
+                )
+                self._models[model] = limiter
+            return limiter
+
+    def _should_retry(self, exc: BaseException, attempt: int) -> bool:
+        if attempt >= self.retries or status_code(exc) not in RETRYABLE_STATUS_CODES:
+            return False
+        metrics.incr("llm_limiter.retries")
+        return True
+
+    def _backoff(self, exc: BaseException, attempt: int) -> float:
+        # A 429 already slowed the model's bucket down; server errors back off
+        # on their own so a struggling backend is not hit again at once.
+        if status_code(exc) == 429:
+            return 0.0
+        return random.uniform(
+            0, min(LLM_RETRY_BACKOFF_MAX, LLM_RETRY_BACKOFF_BASE * 2**attempt)
+        )
+
+    def call(self, model: str, caller: str, tokens: int, func: Callable[[], T]) -> T:
+        """Run `func` once the limiter of `model` admits it, retrying throttled and failed calls."""
+        limiter = self.model(model)
+        attempt = 0
+        while True:
+            limiter.acquire(caller, tokens)
+            try:
+                result = func()
+            except BaseException as exc:
+                limiter.release(tokens, error=exc)
+                if not isinstance(exc, Exception) or not self._should_retry(exc, attempt):
+                    raise
+                time.sleep(self._backoff(exc, attempt))
+                attempt += 1
+                continue
+            limiter.release(tokens, result)
+            return result
+
+    async def acall(
+        self, model: str, caller: str, tokens: int, func: Callable[[], Awaitable[T]]
+    ) -> T:
+        """Async implementation of `call`."""
+        limiter = self.model(model)
+        attempt = 0
+        while True:
+            await limiter.aacquire(caller, tokens)
+            try:
+                result = await func()
+            except BaseException as exc:
+                limiter.release(tokens, error=exc)
+                if not isinstance(exc, Exception) or not self._should_retry(exc, attempt):
+                    raise
+                await asyncio.sleep(self._backoff(exc, attempt))
+                attempt += 1
+                continue
+            limiter.release(tokens, result)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the load of every model called so far."""
+        with self._lock:
+            models = dict(self._models)
+        return {name: limiter.stats() for name, limiter in models.items()}
+
+
+rate_limiter = RateLimiter()
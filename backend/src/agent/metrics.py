@@ -0,0 +1,79 @@
+"""Process-wide counters, gauges and timing summaries for the research agent."""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+class Metrics:
+    """Thread-safe in-memory metrics store.
+
+    Counters only ever increase, gauges hold the last value that was set and
+    summaries keep the count, total and maximum of every observed value.
+    """
+
+    def __init__(self) -> None:
+        """Start with every metric empty."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(int)
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increment the counter `name` by `value`."""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set the gauge `name` to `value`."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation of `value` in the summary `name`."""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {"count": 1, "total": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["total"] += value
+                summary["max"] = max(summary["max"], value)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        """Observe the wall-clock seconds spent inside the block in `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """Return a copy of all metrics, optionally restricted to a name prefix."""
+
+        def keep(name: str) -> bool:
+            return prefix is None or name.startswith(prefix)
+
+        with self._lock:
+            return {
+                "counters": {k: v for k, v in self._counters.items() if keep(k)},
+                "gauges": {k: v for k, v in self._gauges.items() if keep(k)},
+                "summaries": {
+                    k: {**v, "mean": v["total"] / v["count"]}
+                    for k, v in self._summaries.items()
+                    if keep(k)
+                },
+            }
+
+    def reset(self) -> None:
+        """Drop every recorded metric."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+metrics = Metrics()
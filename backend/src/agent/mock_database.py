@@ -1,14 +1,19 @@
 """Mock database implementation for testing without MongoDB."""
 
 import os
-from typing import Optional, List, Dict, Any
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import islice
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Set, Tuple
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from jose import jwt
 from bson import ObjectId
 from .database import (
     UserInDB, UserCreate, UserLogin, UserResponse, ConversationInDB, 
-    ConversationMessage, SessionInDB
+    ConversationMessage, ConversationSummary, ConversationPage, SessionInDB,
+    PREVIEW_LENGTH, encode_cursor, decode_cursor
 )
 
 # Configuration
@@ -23,6 +28,37 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 mock_users = {}
 mock_conversations = {}
 mock_sessions = {}
+# Last message id handed out per conversation
+mock_message_seqs = {}
+
+# Indexes, kept in step with the storage above by the functions below
+mock_users_by_id = {}
+# (updated_at, id) of each user's unarchived conversations, oldest first
+mock_user_conversations: Dict[str, List[Tuple[datetime, str]]] = {}
+# Per user, token -> {conversation id: occurrences in its title, tags and messages}
+mock_postings: Dict[str, Dict[str, Dict[str, int]]] = {}
+# Per user, the tokens of mock_postings in sorted order, for prefix matches
+mock_vocabularies: Dict[str, List[str]] = {}
+# Per user, stem -> the tokens of mock_postings with that stem, for text matches
+mock_stems: Dict[str, Dict[str, Set[str]]] = {}
+# Token counts of each conversation, to take it out of mock_postings again
+mock_conversation_tokens: Dict[str, Counter] = {}
+
+_WORDS = re.compile(r"\w+")
+_PHRASES = re.compile(r'"([^"]*)"')
+_NEGATED = re.compile(r"(?<!\S)-(\w+)")
+_VOWEL = re.compile(r"[aeiouy]")
+# Words the MongoDB text index leaves out for the English language
+_STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor
+not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these
+they this those through to too under until up very was we were what when where
+which while who whom why will with would you your yours yourself yourselves
+""".split())
 
 def generate_mock_id():
     return str(ObjectId())
@@ -40,6 +76,7 @@ test_user = UserInDB(
 )
 mock_users["testuser"] = test_user
 mock_users["test@example.com"] = test_user
+mock_users_by_id[test_user.id] = test_user
 
 # Database initialization
 async def init_db():
@@ -70,10 +107,7 @@ async def get_user_by_email(email: str) -> Optional[UserInDB]:
     return mock_users.get(email)
 
 async def get_user_by_id(user_id: str) -> Optional[UserInDB]:
-    for user in mock_users.values():
-        if user.id == user_id:
-            return user
-    return None
+    return mock_users_by_id.get(user_id)
 
 async def create_user(user: UserCreate) -> UserInDB:
     hashed_password = get_password_hash(user.password)
@@ -92,6 +126,7 @@ async def create_user(user: UserCreate) -> UserInDB:
     
     mock_users[user.username] = user_doc
     mock_users[user.email] = user_doc
+    mock_users_by_id[user_id] = user_doc
     return user_doc
 
 async def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
@@ -104,21 +139,198 @@ async def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
     user.last_login = datetime.utcnow()
     return user
 
+def _tokens(text: str) -> List[str]:
+    return _WORDS.findall(text.lower())
+
+def _stem(token: str) -> str:
+    # A light English stemmer folding plurals, -ed and -ing endings and a final e,
+    # so that like the text index "notes" finds "note" and "entangled" "entanglement"
+    if token.endswith(("sses", "ies")):
+        token = token[:-2]
+    elif token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+        token = token[:-1]
+    for suffix in ("ing", "ed"):
+        if token.endswith(suffix) and _VOWEL.search(token[:-len(suffix)]):
+            token = token[:-len(suffix)]
+            if len(token) > 2 and token[-1] == token[-2] and token[-1] not in "aeioulsz":
+                token = token[:-1]
+            break
+    if token.endswith("y") and _VOWEL.search(token[:-1]):
+        token = token[:-1] + "i"
+    if token.endswith("e") and len(token) > 3:
+        token = token[:-1]
+    for suffix in ("ement", "ment"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[:-len(suffix)]
+    return token
+
+def _search_terms(text: str) -> List[str]:
+    # Stems of the words the text index keeps, as it would tokenize `text`
+    return [_stem(token) for token in _tokens(text) if token not in _STOP_WORDS]
+
+def _message_tokens(messages: List[Any]) -> Counter:
+    counts = Counter()
+    for message in messages:
+        # update_conversation may be given messages as dicts
+        counts.update(_tokens(message["content"] if isinstance(message, dict) else message.content))
+    return counts
+
+def _add_tokens(conv: ConversationInDB, counts: Counter) -> None:
+    postings = mock_postings.setdefault(conv.user_id, {})
+    vocabulary = mock_vocabularies.setdefault(conv.user_id, [])
+    for token, count in counts.items():
+        posting = postings.get(token)
+        if posting is None:
+            posting = postings[token] = {}
+            insort(vocabulary, token)
+            mock_stems.setdefault(conv.user_id, {}).setdefault(_stem(token), set()).add(token)
+        posting[conv.id] = posting.get(conv.id, 0) + count
+    mock_conversation_tokens.setdefault(conv.id, Counter()).update(counts)
+
+def _list_conversation(conv: ConversationInDB) -> None:
+    if not conv.is_archived:
+        insort(mock_user_conversations.setdefault(conv.user_id, []), (conv.updated_at, conv.id))
+
+def _unlist_conversation(conv: ConversationInDB) -> None:
+    keys = mock_user_conversations.get(conv.user_id, [])
+    i = bisect_left(keys, (conv.updated_at, conv.id))
+    if i < len(keys) and keys[i] == (conv.updated_at, conv.id):
+        del keys[i]
+
+def _index_conversation(conv: ConversationInDB) -> None:
+    counts = Counter(_tokens(conv.title))
+    for tag in conv.tags:
+        counts.update(_tokens(tag))
+    counts.update(_message_tokens(conv.messages))
+    _add_tokens(conv, counts)
+    _list_conversation(conv)
+
+def _unindex_conversation(conv: ConversationInDB) -> None:
+    postings = mock_postings.get(conv.user_id, {})
+    vocabulary = mock_vocabularies.get(conv.user_id, [])
+    stems = mock_stems.get(conv.user_id, {})
+    for token in mock_conversation_tokens.pop(conv.id, ()):
+        posting = postings[token]
+        del posting[conv.id]
+        if not posting:
+            del postings[token]
+            del vocabulary[bisect_left(vocabulary, token)]
+            stemmed = stems[_stem(token)]
+            stemmed.discard(token)
+            if not stemmed:
+                del stems[_stem(token)]
+    _unlist_conversation(conv)
+
+def _recent(user_id: str, after: Optional[Tuple[Any, str]] = None, skip: int = 0) -> Iterator[ConversationInDB]:
+    # A user's unarchived conversations newest first, starting after a cursor's sort key
+    keys = mock_user_conversations.get(user_id, [])
+    if after is not None and not isinstance(after[0], datetime):
+        return  # a relevance cursor matches nothing, as in MongoDB
+    end = len(keys) if after is None else bisect_left(keys, after)
+    for i in range(end - 1 - skip, -1, -1):
+        yield mock_conversations[keys[i][1]]
+
+def _text_matches(user_id: str, query: str) -> Dict[str, int]:
+    # Text scores of the user's conversations, matched like a MongoDB $text search:
+    # any word of the query up to its stem, leaving out stop words. Conversations
+    # must also contain every quoted phrase and none of the words negated with "-".
+    postings = mock_postings.get(user_id, {})
+    stems = mock_stems.get(user_id, {})
+    phrases = [phrase.lower() for phrase in _PHRASES.findall(query) if phrase.strip()]
+    unquoted = _PHRASES.sub(" ", query)
+    negated = {_stem(token) for word in _NEGATED.findall(unquoted) for token in _tokens(word)}
+    terms = set(_search_terms(_NEGATED.sub(" ", unquoted) + " " + " ".join(phrases))) - negated
+    scores: Dict[str, int] = {}
+    for term in terms:
+        for token in stems.get(term, ()):
+            for conv_id, count in postings[token].items():
+                scores[conv_id] = scores.get(conv_id, 0) + count
+    excluded = {
+        conv_id for term in negated for token in stems.get(term, ()) for conv_id in postings[token]
+    }
+    return {
+        conv_id: score for conv_id, score in scores.items()
+        if conv_id not in excluded
+        and all(_contains(mock_conversations[conv_id], phrase) for phrase in phrases)
+    }
+
+def _contains(conv: ConversationInDB, text: str) -> bool:
+    # Case-insensitive substring match on the fields the text index covers
+    return (
+        text in conv.title.lower()
+        or any(text in tag.lower() for tag in conv.tags)
+        or any(text in message.content.lower() for message in conv.messages)
+    )
+
+def _keywords(conv: ConversationInDB) -> Set[str]:
+    # The words of the title and tags, like the keywords field in MongoDB
+    words = set(_tokens(conv.title))
+    for tag in conv.tags:
+        words.update(_tokens(tag))
+    return words
+
+def _prefix_matches(user_id: str, query: str) -> List[str]:
+    # Conversations whose title or tags have a word starting with each word of
+    # `query`, like the keywords filter of the MongoDB fallback. The index narrows
+    # them down to those with such words anywhere, then the keywords decide.
+    words = _tokens(query)
+    postings = mock_postings.get(user_id, {})
+    vocabulary = mock_vocabularies.get(user_id, [])
+    candidates: Optional[Set[str]] = None
+    for token in words:
+        merged: Set[str] = set()
+        for i in range(bisect_left(vocabulary, token), len(vocabulary)):
+            if not vocabulary[i].startswith(token):
+                break
+            merged.update(postings[vocabulary[i]])
+        candidates = merged if candidates is None else candidates & merged
+        if not candidates:
+            return []
+    if candidates is None:
+        return []
+    return [
+        conv_id for conv_id in candidates
+        if all(
+            any(keyword.startswith(word) for keyword in _keywords(mock_conversations[conv_id]))
+            for word in words
+        )
+    ]
+
 async def save_conversation(conversation: ConversationInDB) -> str:
     conversation_id = generate_mock_id()
     conversation.id = conversation_id
     mock_conversations[conversation_id] = conversation
+    _index_conversation(conversation)
     return conversation_id
 
 async def get_user_conversations(user_id: str, skip: int = 0, limit: int = 50) -> List[ConversationInDB]:
-    conversations = []
-    for conv in mock_conversations.values():
-        if conv.user_id == user_id and not conv.is_archived:
-            conversations.append(conv)
-    
-    # Sort by updated_at descending
-    conversations.sort(key=lambda x: x.updated_at, reverse=True)
-    return conversations[skip:skip + limit]
+    return list(islice(_recent(user_id, skip=skip), limit))
+
+def _summary(conv: ConversationInDB) -> ConversationSummary:
+    return ConversationSummary(
+        id=conv.id,
+        title=conv.title,
+        category=conv.category,
+        tags=conv.tags,
+        created_at=conv.created_at,
+        updated_at=conv.updated_at,
+        message_count=len(conv.messages),
+        last_message_preview=conv.messages[-1].content[:PREVIEW_LENGTH] if conv.messages else None
+    )
+
+def _page(rows: Iterable[Tuple[Any, ConversationInDB]], limit: int) -> ConversationPage:
+    # Rows are (sort key, conversation) in page order; one more than the page is read
+    # to tell whether another page follows, with the same cursors as the MongoDB implementation
+    rows = list(islice(rows, limit + 1))
+    conversations = [_summary(conv) for _, conv in rows[:limit]]
+    if len(rows) <= limit:
+        return ConversationPage(conversations=conversations)
+    key, last = rows[limit - 1]
+    return ConversationPage(conversations=conversations, next_cursor=encode_cursor(key, last.id))
+
+async def get_user_conversation_summaries(user_id: str, skip: int = 0, limit: int = 50, cursor: Optional[str] = None) -> ConversationPage:
+    after = decode_cursor(cursor) if cursor else None
+    return _page(((conv.updated_at, conv) for conv in _recent(user_id, after, skip)), limit)
 
 async def get_conversation_by_id(conversation_id: str) -> Optional[ConversationInDB]:
     return mock_conversations.get(conversation_id)
@@ -128,22 +340,64 @@ async def update_conversation(conversation_id: str, update_data: Dict[str, Any])
     if not conversation:
         return False
     
+    _unindex_conversation(conversation)
     for key, value in update_data.items():
         if hasattr(conversation, key):
             setattr(conversation, key, value)
     
     conversation.updated_at = datetime.utcnow()
+    _index_conversation(conversation)
     return True
 
-async def search_conversations(user_id: str, query: str, category: Optional[str] = None) -> List[ConversationInDB]:
-    conversations = []
-    for conv in mock_conversations.values():
-        if conv.user_id == user_id and not conv.is_archived:
-            # Simple search in title and messages
-            if (query.lower() in conv.title.lower() or 
-                any(query.lower() in msg.content.lower() for msg in conv.messages) or
-                any(query.lower() in tag.lower() for tag in conv.tags)):
-                if not category or conv.category == category:
-                    conversations.append(conv)
-    
-    return conversations
+async def append_messages(
+    conversation_id: str, user_id: str, messages: List[ConversationMessage]
+) -> Optional[List[ConversationMessage]]:
+    conversation = mock_conversations.get(conversation_id)
+    if not conversation or conversation.user_id != user_id:
+        return None
+    if not messages:
+        return []
+    seq = mock_message_seqs.get(conversation_id, len(conversation.messages))
+    appended = [m.copy(update={"id": str(seq + i + 1)}) for i, m in enumerate(messages)]
+    mock_message_seqs[conversation_id] = seq + len(appended)
+    _unlist_conversation(conversation)
+    conversation.messages.extend(appended)
+    conversation.updated_at = datetime.utcnow()
+    _list_conversation(conversation)
+    _add_tokens(conversation, _message_tokens(appended))
+    return appended
+
+async def search_conversations(user_id: str, query: str, category: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None) -> ConversationPage:
+    """Search like the MongoDB implementation, through the in-memory indexes.
+
+    Conversations with any word of the query, compared by stem and leaving out
+    stop words as the text index does, rank by how often the words occur.
+    Quoted phrases must all be present and words negated with "-" absent. If
+    nothing matches, conversations whose title or tags have words starting
+    with each word of the query rank by recency. A blank query lists conversations by recency. Text scores are
+    occurrence counts rather than MongoDB's weighted scores, so the ranking
+    of matches, though not which conversations match, may differ.
+    """
+    def wanted(conv: ConversationInDB) -> bool:
+        return not conv.is_archived and (not category or conv.category == category)
+
+    after = decode_cursor(cursor) if cursor else None
+    if not query.strip():
+        return _page(((conv.updated_at, conv) for conv in _recent(user_id, after) if wanted(conv)), limit)
+
+    query = query.strip()
+    if after is None or isinstance(after[0], float):
+        ranked = sorted(((float(score), conv_id) for conv_id, score in _text_matches(user_id, query).items()), reverse=True)
+        page = _page(
+            ((key[0], mock_conversations[key[1]]) for key in ranked
+             if (after is None or key < after) and wanted(mock_conversations[key[1]])),
+            limit
+        )
+        if page.conversations or after is not None:
+            return page
+    ranked = sorted(((mock_conversations[conv_id].updated_at, conv_id) for conv_id in _prefix_matches(user_id, query)), reverse=True)
+    return _page(
+        ((key[0], mock_conversations[key[1]]) for key in ranked
+         if (after is None or key < after) and wanted(mock_conversations[key[1]])),
+        limit
+    )
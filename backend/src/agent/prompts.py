@@ -1,12 +1,111 @@
-from datetime import datetime
+import string
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
 
+# Number of rendered static prefixes kept per template
+PROMPT_PREFIX_CACHE_SIZE = 16
 
-# Get current date in a readable format
-def get_current_date():
-    return datetime.now().strftime("%B %d, %Y")
+# (formatted date, timestamp of the next local midnight)
+_current_date: Tuple[str, float] = ("", 0.0)
 
 
-query_writer_instructions = """Your goal is to generate sophisticated and diverse web search queries. These queries are intended for an advanced automated web research tool capable of analyzing complex results, following links, and synthesizing information.
+# Get current date in a readable format
+def get_current_date():
+    global _current_date
+    date, expires_at = _current_date
+    if time.time() < expires_at:
+        return date
+    now = datetime.now()
+    midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    date = now.strftime("%B %d, %Y")
+    _current_date = (date, midnight.timestamp())
+    return date
+
+
+def _unparse(segments: List[tuple]) -> str:
+    """Turn `string.Formatter().parse` output back into a format string."""
+    parts = []
+    for literal, field, spec, conversion in segments:
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            parts.append(
+                "{" + field + (f"!{conversion}" if conversion else "")
+                + (f":{spec}" if spec else "") + "}"
+            )
+    return "".join(parts)
+
+
+class PromptTemplate:
+    """A `str.format` template parsed once and rendered as prefix plus tail.
+
+    The static prefix is the text before the first field outside
+    `static_fields`. It only depends on the static values (the date and
+    other low-cardinality settings), so it is rendered once per distinct
+    values and can be reused as a cached model input. Only the tail, which
+    holds the per-call fields, is built on every call.
+    """
+
+    def __init__(
+        self, template: str, static_fields: Tuple[str, ...] = ("current_date",)
+    ) -> None:
+        """Split `template` where its first field outside `static_fields` begins."""
+        self.template = template
+        self.static_fields = static_fields
+        segments = list(string.Formatter().parse(template))
+        split = next(
+            (
+                i
+                for i, (_, field, _, _) in enumerate(segments)
+                if field is not None and field not in static_fields
+            ),
+            len(segments),
+        )
+        # The literal before the first per-call field still belongs to the prefix
+        prefix = segments[:split]
+        tail = segments[split:]
+        if tail:
+            prefix = prefix + [(tail[0][0], None, None, None)]
+            tail = [("", *tail[0][1:])] + tail[1:]
+        self._prefix_template = _unparse(prefix)
+        self._tail_template = _unparse(tail)
+        # Static values -> rendered prefix
+        self._rendered: Dict[Tuple[Any, ...], str] = {}
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        """Return the template text."""
+        return self.template
+
+    def _prefix(self, values: Dict[str, Any]) -> str:
+        values.setdefault("current_date", get_current_date())
+        key = tuple(values.get(name) for name in self.static_fields)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            rendered = self._prefix_template.format(**values)
+            with self._lock:
+                if len(self._rendered) >= PROMPT_PREFIX_CACHE_SIZE:
+                    self._rendered.clear()
+                self._rendered[key] = rendered
+        return rendered
+
+    def static_prefix(self, **values: Any) -> str:
+        """Render the static prefix, `current_date` defaulting to today."""
+        return self._prefix(values)
+
+    def render_tail(self, **values: Any) -> str:
+        """Render the text after the static prefix."""
+        return self._tail_template.format(**values)
+
+    def format(self, **values: Any) -> str:
+        """Render the whole prompt, like `str.format` on the template."""
+        prefix = self._prefix(values)
+        return prefix + self.render_tail(**values)
+
+
+query_writer_instructions = PromptTemplate(
+    """Your goal is to generate sophisticated and diverse web search queries. These queries are intended for an advanced automated web research tool capable of analyzing complex results, following links, and synthesizing information.
 
 Instructions:
 - Always prefer a single search query, only add another query if the original question requests multiple aspects or elements and one query is not enough.
@@ -31,10 +130,13 @@ Topic: What revenue grew more last year apple stock or the number of people buyi
 }}
 ```
 
-Context: {research_topic}"""
+Context: {research_topic}""",
+    static_fields=("current_date", "number_queries"),
+)
 
 
-web_searcher_instructions = """Conduct targeted Google Searches to gather the most recent, credible information on "{research_topic}" and synthesize it into a verifiable text artifact.
+web_searcher_instructions = PromptTemplate(
+    """Conduct targeted Google Searches to gather the most recent, credible information on the research topic below and synthesize it into a verifiable text artifact.
 
 Instructions:
 - Query should ensure that the most current information is gathered. The current date is {current_date}.
@@ -46,8 +148,10 @@ Instructions:
 Research Topic:
 {research_topic}
 """
+)
 
-reflection_instructions = """You are an expert research assistant analyzing summaries about "{research_topic}".
+reflection_instructions = PromptTemplate(
+    """You are an expert research assistant analyzing summaries about the research topic below.
 
 Instructions:
 - Identify knowledge gaps or areas that need deeper exploration and generate a follow-up query. (1 or multiple).
@@ -77,9 +181,14 @@ Reflect carefully on the Summaries to identify knowledge gaps and produce a foll
 
 Summaries:
 {summaries}
+
+Research Topic:
+{research_topic}
 """
+)
 
-answer_instructions = """Generate a high-quality answer to the user's question based on the provided summaries.
+answer_instructions = PromptTemplate(
+    """Generate a high-quality answer to the user's question based on the provided summaries.
 
 Instructions:
 - The current date is {current_date}.
@@ -89,8 +198,19 @@ Instructions:
 - Generate a high-quality answer to the user's question based on the provided summaries and the user's question.
 - Include the sources you used from the Summaries in the answer correctly, use markdown format (e.g. [apnews](https://vertexaisearch.cloud.google.com/id/1-0)). THIS IS A MUST.
 
+Summaries:
+{summaries}
+
 User Context:
-- {research_topic}
+- {research_topic}"""
+)
 
-Summaries:
-{summaries}"""
+batched_query_writer_instructions = PromptTemplate(
+    """You are given {count} independent query generation tasks, each between <task> tags. Complete every task on its own, following its instructions exactly and ignoring the other tasks.
+
+Format:
+- Format your response as a JSON object with one key:
+   - "results": A list with exactly {count} entries, one per task, each being the JSON object its task asks for with an added "task" key holding the index of its task
+
+{tasks}"""
+)
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass, field
-from typing import TypedDict
+from typing import Optional, TypedDict
 
 from langgraph.graph import add_messages
 from typing_extensions import Annotated
@@ -9,24 +10,64 @@ from typing_extensions import Annotated
 
 import operator
 
+# Optional cap on the number of distinct sources kept in the graph state
+MAX_SOURCES_GATHERED = int(os.getenv("MAX_SOURCES_GATHERED", "0")) or None
+
+
+def merge_sources(left: list, right: list) -> list:
+    """Reducer that appends sources, keeping one entry per short url.
+
+    A web research result cites the same source once per supported segment,
+    so plain list concatenation stores each source many times. The first
+    entry for a short url, and its label, is kept. Sources past
+    MAX_SOURCES_GATHERED are dropped.
+    """
+    seen = {source["short_url"] for source in left}
+    merged = list(left)
+    for source in right:
+        if source["short_url"] not in seen:
+            seen.add(source["short_url"])
+            merged.append(source)
+    if MAX_SOURCES_GATHERED is not None:
+        del merged[MAX_SOURCES_GATHERED:]
+    return merged
+
+
+# Input fields besides the messages that change what a research run produces
+RUN_INPUT_FIELDS = ("initial_search_query_count", "max_research_loops", "reasoning_model")
+
 
 class OverallState(TypedDict):
     messages: Annotated[list, add_messages]
     search_query: Annotated[list, operator.add]
     web_research_result: Annotated[list, operator.add]
-    sources_gathered: Annotated[list, operator.add]
+    sources_gathered: Annotated[list, merge_sources]
     initial_search_query_count: int
     max_research_loops: int
     research_loop_count: int
     reasoning_model: str
+    # Groups the fan-outs and the context caches of one research run
+    research_run_id: Optional[str]
+    # Answer drafted alongside reflection, used by finalize_answer when set
+    speculative_answer: Optional[dict]
+    # Query count and loop budget chosen for this run when depth is adaptive
+    research_plan: Optional[dict]
+    # Last reflection verdict, recorded with the research plan's outcome
+    is_sufficient: bool
+    # Whether reflection ended the research, decided once for it and the router
+    research_complete: bool
 
 
 class ReflectionState(TypedDict):
     is_sufficient: bool
     knowledge_gap: str
-    follow_up_queries: Annotated[list, operator.add]
+    # Replaced every loop so earlier follow-ups are not sent to web_research again
+    follow_up_queries: list
     research_loop_count: int
     number_of_ran_queries: int
+    research_run_id: Optional[str]
+    speculative_answer: Optional[dict]
+    research_complete: bool
 
 
 class Query(TypedDict):
@@ -36,11 +77,15 @@ class Query(TypedDict):
 
 class QueryGenerationState(TypedDict):
     search_query: list[Query]
+    research_run_id: Optional[str]
+    research_plan: Optional[dict]
 
 
 class WebSearchState(TypedDict):
     search_query: str
     id: str
+    # Batch the branch belongs to, only sent when branches run under deadlines
+    fanout: Optional[dict]
 
 
 @dataclass(kw_only=True)
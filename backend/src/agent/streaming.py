@@ -0,0 +1,301 @@
+"""Streaming helpers for the final research answer."""
+
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManager,
+    AsyncCallbackManagerForLLMRun,
+    CallbackManager,
+)
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableConfig
+from langgraph.constants import TAG_NOSTREAM
+from pydantic import ConfigDict
+
+from agent.metrics import metrics
+
+SHORT_URL_PREFIX = "https://vertexaisearch.cloud.google.com/id/"
+SHORT_URL_PATTERN = re.compile(re.escape(SHORT_URL_PREFIX) + r"\d+-\d+")
+# Text that may still grow into a short url once the next chunk arrives.
+_PARTIAL_SHORT_URL = re.compile(re.escape(SHORT_URL_PREFIX) + r"\d*(?:-\d*)?")
+_MAX_HOLDBACK = len(SHORT_URL_PREFIX) + 24
+# Words with their trailing whitespace, and leading whitespace on its own
+_REPLAY_PIECES = re.compile(r"\S+\s*|\s+")
+
+
+class ShortUrlRewriter:
+    """Replace short urls with their original urls in text that arrives in chunks.
+
+    Text is emitted as soon as it cannot be part of a short url, so only a
+    possible url prefix at the end of a chunk is held back until the next
+    chunk (or `flush`) decides it.
+    """
+
+    def __init__(self, sources: List[Dict[str, Any]]) -> None:
+        """Rewrite the short urls of `sources` to their original urls."""
+        self._lookup: Dict[str, Dict[str, Any]] = {}
+        for source in sources:
+            self._lookup.setdefault(source["short_url"], source)
+        self._pending = ""
+        self._used: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def unique_sources(self) -> List[Dict[str, Any]]:
+        """Sources whose short url appeared in the text, in order of first use."""
+        return list(self._used.values())
+
+    def _substitute(self, match: "re.Match[str]") -> str:
+        short_url = match.group(0)
+        source = self._lookup.get(short_url)
+        if source is None:
+            return short_url
+        self._used.setdefault(short_url, source)
+        return source["value"]
+
+    def _holdback_start(self, text: str) -> int:
+        position = text.find("h", max(0, len(text) - _MAX_HOLDBACK))
+        while position != -1:
+            tail = text[position:]
+            if len(tail) <= len(SHORT_URL_PREFIX):
+                if SHORT_URL_PREFIX.startswith(tail):
+                    return position
+            elif tail.startswith(SHORT_URL_PREFIX) and _PARTIAL_SHORT_URL.fullmatch(tail):
+                return position
+            position = text.find("h", position + 1)
+        return len(text)
+
+    def rewrite(self, text: str) -> str:
+        """Rewrite a complete text in one pass over it."""
+        return SHORT_URL_PATTERN.sub(self._substitute, text)
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of text and return the rewritten text that is safe to emit."""
+        text = self._pending + chunk
+        cut = self._holdback_start(text)
+        self._pending = text[cut:]
+        return self.rewrite(text[:cut])
+
+    def flush(self) -> str:
+        """Return the rewritten remainder once the text is complete."""
+        text, self._pending = self._pending, ""
+        return self.rewrite(text)
+
+
+def replace_short_urls(
+    text: str, sources: List[Dict[str, Any]]
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Replace every known short url in `text` with its original url in one pass.
+
+    Returns the rewritten text and the sources that were used, in order of
+    first use. Cost is linear in the text length plus the number of sources,
+    independent of how many sources were gathered.
+    """
+    rewriter = ShortUrlRewriter(sources)
+    return rewriter.rewrite(text), rewriter.unique_sources
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+
+class ShortUrlRewritingChatModel(BaseChatModel):
+    """Chat model wrapper that rewrites short urls while the answer streams.
+
+    Tokens of the wrapped model pass through a `ShortUrlRewriter` before they
+    reach callbacks, so the chunks LangGraph forwards on its messages stream
+    already carry the original urls. The wrapped model runs as a child that
+    is kept off that stream, so its own tokens are not forwarded as well.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # A chat model, or one bound to call arguments such as a cached content
+    model: Runnable[LanguageModelInput, BaseMessage]
+    rewriter: ShortUrlRewriter
+
+    @property
+    def _llm_type(self) -> str:
+        return f"short-url-rewriting-{getattr(self.model, '_llm_type', 'model')}"
+
+    @staticmethod
+    def _child_config(run_manager: Any) -> RunnableConfig:
+        # Like `ParentRunManager.get_child`, which LLM run managers lack
+        if run_manager is None:
+            # Streaming calls leave this run's callbacks to langchain, so the
+            # wrapped model inherits the caller's and only needs the tag
+            return {"tags": [TAG_NOSTREAM]}
+        if isinstance(run_manager, AsyncCallbackManagerForLLMRun):
+            manager = AsyncCallbackManager([], parent_run_id=run_manager.run_id)
+        else:
+            manager = CallbackManager([], parent_run_id=run_manager.run_id)
+        manager.set_handlers(run_manager.inheritable_handlers)
+        manager.add_tags(run_manager.inheritable_tags)
+        manager.add_tags([TAG_NOSTREAM], False)
+        manager.add_metadata(run_manager.inheritable_metadata)
+        return {"callbacks": manager}
+
+    def _rewrite_chunk(self, chunk: BaseMessage, text: str) -> ChatGenerationChunk:
+        # The id is left to this run, so the chunks and the result share it
+        message = AIMessageChunk(
+            content=text,
+            response_metadata=chunk.response_metadata,
+            usage_metadata=getattr(chunk, "usage_metadata", None),
+        )
+        return ChatGenerationChunk(message=message)
+
+    def _rewrite_result(self, message: BaseMessage) -> ChatResult:
+        content = self.rewriter.rewrite(_content_text(message.content))
+        message = message.model_copy(update={"content": content, "id": None})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _tail_chunk(
+        self, last: Optional[ChatGenerationChunk]
+    ) -> Optional[ChatGenerationChunk]:
+        tail = self.rewriter.flush()
+        if not tail or last is None:
+            return None
+        # Only the text is carried over, metadata was already emitted with `last`.
+        return ChatGenerationChunk(message=AIMessageChunk(content=tail))
+
+    def _record_first_token(self, started: float) -> None:
+        metrics.observe(
+            "finalize_answer.time_to_first_token_seconds", time.perf_counter() - started
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self.model.invoke(
+            messages, self._child_config(run_manager), stop=stop, **kwargs
+        )
+        return self._rewrite_result(message)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = await self.model.ainvoke(
+            messages, self._child_config(run_manager), stop=stop, **kwargs
+        )
+        return self._rewrite_result(message)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        started, first, last = time.perf_counter(), True, None
+        config = self._child_config(run_manager)
+        for chunk in self.model.stream(messages, config, stop=stop, **kwargs):
+            text = self.rewriter.feed(_content_text(chunk.content))
+            if text and first:
+                self._record_first_token(started)
+                first = False
+            last = self._rewrite_chunk(chunk, text)
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=last)
+            yield last
+        tail = self._tail_chunk(last)
+        if tail is not None:
+            if run_manager:
+                run_manager.on_llm_new_token(tail.text, chunk=tail)
+            yield tail
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        started, first, last = time.perf_counter(), True, None
+        config = self._child_config(run_manager)
+        async for chunk in self.model.astream(messages, config, stop=stop, **kwargs):
+            text = self.rewriter.feed(_content_text(chunk.content))
+            if text and first:
+                self._record_first_token(started)
+                first = False
+            last = self._rewrite_chunk(chunk, text)
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=last)
+            yield last
+        tail = self._tail_chunk(last)
+        if tail is not None:
+            if run_manager:
+                await run_manager.on_llm_new_token(tail.text, chunk=tail)
+            yield tail
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that streams an answer generated earlier, word by word.
+
+    Hands an answer drafted outside a node's callbacks to the clients of
+    LangGraph's messages stream as if the node had generated it. Like other
+    models, the answer takes the id of the run that streams it.
+    """
+
+    message: AIMessage
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _chunks(self) -> List[ChatGenerationChunk]:
+        return [
+            ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            for piece in _REPLAY_PIECES.findall(_content_text(self.message.content))
+        ]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self.message.model_copy(update={"id": None})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for chunk in self._chunks():
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self._chunks():
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -21,3 +21,13 @@ class Reflection(BaseModel):
     follow_up_queries: List[str] = Field(
         description="A list of follow-up queries to address the knowledge gap."
     )
+
+
+class TaskSearchQueryList(SearchQueryList):
+    task: int = Field(description="The index of the task these search queries are for.")
+
+
+class SearchQueryBatch(BaseModel):
+    results: List[TaskSearchQueryList] = Field(
+        description="The search queries generated for each task, one entry per task."
+    )
@@ -1,22 +1,281 @@
-from typing import Any, Dict, List
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
 
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_MARKDOWN_LINK_TARGET = re.compile(r"\]\([^)]*\)")
+_WORD = re.compile(r"\w{3,}")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
 
-def get_research_topic(messages: List[AnyMessage]) -> str:
+# Summaries are only truncated into a budget remainder at least this large
+MIN_TRUNCATED_SUMMARY_TOKENS = 64
+
+# Number of rendered conversation transcripts kept for get_research_topic
+TRANSCRIPT_CACHE_SIZE = 256
+
+
+# Identity of a message in the transcript cache: its id, type and content
+_MessageKey = Tuple[str, str, str]
+
+
+class _Transcript(NamedTuple):
+    keys: Tuple[_MessageKey, ...]
+    lines: Tuple[str, ...]
+    text: str
+
+
+# Transcripts of recently seen message lists, keyed by their last message
+_transcripts: "OrderedDict[_MessageKey, _Transcript]" = OrderedDict()
+_transcripts_lock = threading.Lock()
+
+
+def _render_turn(message: AnyMessage) -> Optional[str]:
+    if isinstance(message, HumanMessage):
+        return f"User: {message.content}\n"
+    if isinstance(message, AIMessage):
+        return f"Assistant: {message.content}\n"
+    return None
+
+
+def _render_turns(messages: Iterable[AnyMessage]) -> Tuple[str, ...]:
+    return tuple(line for line in map(_render_turn, messages) if line is not None)
+
+
+def _message_key(message: AnyMessage) -> Optional[_MessageKey]:
+    if message.id is None:
+        return None
+    content = message.content
+    return message.id, message.type, content if isinstance(content, str) else str(content)
+
+
+def _transcript(messages: List[AnyMessage]) -> _Transcript:
+    """
+    Render the transcript of `messages`, reusing the longest cached prefix.
+
+    Graph state messages keep their ids across nodes and research loops, so a
+    conversation that grew by one turn only renders the new turn. Messages
+    are matched on their content as well as their id, since ids are only
+    unique within one conversation. Comparing the same content strings is
+    cheap, as their hashes are cached and equal objects compare by identity.
+    """
+    keys = tuple(map(_message_key, messages))
+    if None in keys:
+        lines = _render_turns(messages)
+        return _Transcript(keys, lines, "".join(lines))
+
+    prefix, end = None, 0
+    with _transcripts_lock:
+        for i in range(len(keys), 0, -1):
+            cached = _transcripts.get(keys[i - 1])
+            if cached is not None and cached.keys == keys[:i]:
+                prefix, end = cached, i
+                break
+    if prefix is not None and end == len(keys):
+        return prefix
+
+    new_lines = _render_turns(messages[end:])
+    if prefix is None:
+        transcript = _Transcript(keys, new_lines, "".join(new_lines))
+    else:
+        transcript = _Transcript(
+            keys, prefix.lines + new_lines, prefix.text + "".join(new_lines)
+        )
+    with _transcripts_lock:
+        _transcripts[keys[-1]] = transcript
+        _transcripts.move_to_end(keys[-1])
+        while len(_transcripts) > TRANSCRIPT_CACHE_SIZE:
+            _transcripts.popitem(last=False)
+    return transcript
+
+
+def get_research_topic(
+    messages: List[AnyMessage], max_turns: Optional[int] = None
+) -> str:
     """
     Get the research topic from the messages.
+
+    Conversations are rendered as a "User:"/"Assistant:" transcript that is
+    cached per message list and extended incrementally as turns are added.
+
+    Args:
+        messages (List[AnyMessage]): The conversation, oldest message first.
+        max_turns (Optional[int]): Keep only the first turn and this many of
+                                   the latest turns, replacing the turns in
+                                   between with a note. None keeps them all.
+
+    Returns:
+        str: The research topic.
     """
-    # check if request has a history and combine the messages into a single string
+    # a single message is the research topic itself
     if len(messages) == 1:
-        research_topic = messages[-1].content
-    else:
-        research_topic = ""
-        for message in messages:
-            if isinstance(message, HumanMessage):
-                research_topic += f"User: {message.content}\n"
-            elif isinstance(message, AIMessage):
-                research_topic += f"Assistant: {message.content}\n"
-    return research_topic
+        return messages[-1].content
+
+    transcript = _transcript(messages)
+    lines = transcript.lines
+    if max_turns is None or len(lines) <= max_turns + 1:
+        return transcript.text
+    omitted = len(lines) - max_turns - 1
+    return "".join(
+        (
+            lines[0],
+            f"[{omitted} earlier turns omitted]\n",
+            *lines[len(lines) - max_turns :],
+        )
+    )
+
+
+def fold_case_and_whitespace(text: str) -> str:
+    """
+    Fold only case and runs of whitespace, for keys that must match exact text.
+    """
+    return _WHITESPACE.sub(" ", text.casefold()).strip()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query so trivially different spellings compare equal.
+
+    Only Unicode form, case and whitespace are folded. Symbols are kept, as
+    they change what a query means: "C++" and "C#", or "2+2" and "2-2".
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def _trigram_vector(query: str) -> Counter:
+    # Similarity, unlike equality, may ignore punctuation
+    text = _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", normalize_query(query))).strip()
+    padded = f" {text} "
+    return Counter(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    norm = math.sqrt(sum(c * c for c in a.values()) * sum(c * c for c in b.values()))
+    return dot / norm
+
+
+def deduplicate_queries(
+    queries: Iterable[str], already_run: Iterable[str], threshold: float
+) -> List[str]:
+    """
+    Drop queries that are near-paraphrases of an earlier or already run query.
+
+    Queries are compared by the cosine similarity of their character trigram
+    counts after normalization, which catches reordered words, plurals and
+    punctuation changes without a model call.
+
+    Args:
+        queries (Iterable[str]): Candidate queries, in priority order.
+        already_run (Iterable[str]): Queries that have already been searched.
+        threshold (float): Similarity at or above which a query is dropped.
+                           Values above 1.0 disable deduplication.
+
+    Returns:
+        List[str]: The kept queries, in their original order.
+    """
+    seen = [_trigram_vector(query) for query in already_run]
+    kept = []
+    for query in queries:
+        vector = _trigram_vector(query)
+        if any(_cosine(vector, other) >= threshold for other in seen):
+            continue
+        seen.append(vector)
+        kept.append(query)
+    return kept
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in `text` without calling a tokenizer.
+
+    Uses the common approximation of four characters per token, which is
+    close enough for budgeting English prompts.
+    """
+    return -(-len(text) // 4)
+
+
+def _word_vector(text: str) -> Counter:
+    return Counter(_WORD.findall(_MARKDOWN_LINK_TARGET.sub("]", text).casefold()))
+
+
+def topic_vector(text: str) -> Counter:
+    """
+    Return the word counts used to compare texts by topic.
+
+    Words shorter than three characters and markdown link targets are
+    ignored, so citations and stop words barely affect the comparison.
+    """
+    return _word_vector(text)
+
+
+def topic_similarity(a: Counter, b: Counter) -> float:
+    """
+    Return the cosine similarity (0-1) of two `topic_vector` results.
+    """
+    return _cosine(a, b)
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    limit = budget * 4
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # Prefer ending on a sentence boundary so citations stay attached
+    boundaries = [m.start() for m in _SENTENCE_END.finditer(cut)]
+    if boundaries:
+        cut = cut[: boundaries[-1]]
+    return cut.rstrip() + " ..."
+
+
+def pack_summaries(summaries: List[str], topic: str, budget: int) -> List[str]:
+    """
+    Fit web research summaries into an estimated token budget.
+
+    When the summaries fit they are returned unchanged. Otherwise they are
+    ranked by word overlap with the research topic and taken in that order:
+    a summary that fits the remaining budget is kept whole, one that does not
+    is truncated into it if at least MIN_TRUNCATED_SUMMARY_TOKENS remain, and
+    is skipped otherwise. A skipped summary does not end the packing, so a
+    shorter, less relevant one can still use the budget it left. Kept
+    summaries stay in their original order.
+
+    Args:
+        summaries (List[str]): Web research summaries, in gathering order.
+        topic (str): The research topic the summaries should answer.
+        budget (int): Maximum estimated tokens for all kept summaries.
+
+    Returns:
+        List[str]: The packed summaries.
+    """
+    sizes = [estimate_tokens(summary) for summary in summaries]
+    if sum(sizes) <= budget:
+        return list(summaries)
+
+    topic_vector = _word_vector(topic)
+    ranked = sorted(
+        range(len(summaries)),
+        key=lambda i: _cosine(topic_vector, _word_vector(summaries[i])),
+        reverse=True,
+    )
+    packed = {}
+    remaining = budget
+    for i in ranked:
+        if sizes[i] <= remaining:
+            packed[i] = summaries[i]
+        elif remaining >= MIN_TRUNCATED_SUMMARY_TOKENS:
+            packed[i] = _truncate_to_tokens(summaries[i], remaining)
+        else:
+            continue
+        remaining -= estimate_tokens(packed[i])
+    return [packed[i] for i in sorted(packed)]
 
 
 def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
@@ -36,43 +295,75 @@ def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
     return resolved_map
 
 
-def insert_citation_markers(text, citations_list):
+def _byte_to_char_offsets(text: str, byte_offsets: List[int]) -> Dict[int, int]:
+    """
+    Map UTF-8 byte offsets into `text` to character offsets in a single pass.
+
+    Offsets that fall inside a multi-byte character are moved forward to the
+    end of that character, so a marker never splits it.
+    """
+    encoded = text.encode("utf-8")
+    mapping = {}
+    byte_pos = char_pos = 0
+    for offset in sorted(set(byte_offsets)):
+        boundary = min(max(offset, 0), len(encoded))
+        while boundary < len(encoded) and (encoded[boundary] & 0xC0) == 0x80:
+            boundary += 1
+        char_pos += len(encoded[byte_pos:boundary].decode("utf-8"))
+        byte_pos = boundary
+        mapping[offset] = char_pos
+    return mapping
+
+
+def insert_citation_markers(text, citations_list, byte_offsets=False):
     """
     Inserts citation markers into a text string based on start and end indices.
 
+    The output is assembled from chunks in one join, so the cost is linear in
+    the length of the text plus the number of citations.
+
     Args:
         text (str): The original text string.
         citations_list (list): A list of dictionaries, where each dictionary
                                contains 'start_index', 'end_index', and
-                               'segment_string' (the marker to insert).
+                               'segments' (the links that make up the marker).
                                Indices are assumed to be for the original text.
+        byte_offsets (bool): Whether the indices are UTF-8 byte offsets, as in
+                             Gemini grounding metadata, rather than character
+                             offsets.
 
     Returns:
         str: The text with citation markers inserted.
     """
-    # Sort citations by end_index in descending order.
-    # If end_index is the same, secondary sort by start_index descending.
-    # This ensures that insertions at the end of the string don't affect
-    # the indices of earlier parts of the string that still need to be processed.
-    sorted_citations = sorted(
-        citations_list, key=lambda c: (c["end_index"], c["start_index"]), reverse=True
+    if not citations_list:
+        return text
+
+    # Markers sharing an end index are ordered by start index, and by reverse
+    # input order for identical spans.
+    ordered = sorted(
+        enumerate(citations_list),
+        key=lambda item: (item[1]["end_index"], item[1]["start_index"], -item[0]),
     )
+    if byte_offsets and not text.isascii():
+        char_offsets = _byte_to_char_offsets(
+            text, [citation["end_index"] for _, citation in ordered]
+        )
+    else:
+        char_offsets = None
 
-    modified_text = text
-    for citation_info in sorted_citations:
-        # These indices refer to positions in the *original* text,
-        # but since we iterate from the end, they remain valid for insertion
-        # relative to the parts of the string already processed.
+    chunks = []
+    position = 0
+    for _, citation_info in ordered:
         end_idx = citation_info["end_index"]
-        marker_to_insert = ""
+        if char_offsets is not None:
+            end_idx = char_offsets[end_idx]
+        end_idx = min(max(end_idx, position), len(text))
+        chunks.append(text[position:end_idx])
         for segment in citation_info["segments"]:
-            marker_to_insert += f" [{segment['label']}]({segment['short_url']})"
-        # Insert the citation marker at the original end_idx position
-        modified_text = (
-            modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
-        )
-
-    return modified_text
+            chunks.append(f" [{segment['label']}]({segment['short_url']})")
+        position = end_idx
+    chunks.append(text[position:])
+    return "".join(chunks)
 
 
 def get_citations(response, resolved_urls_map):
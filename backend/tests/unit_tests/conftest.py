@@ -0,0 +1,23 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# agent.graph refuses to import without a key; no test talks to Gemini
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+# The in-process Gemini stand-in shared with the benchmarks
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "benchmarks"))
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """Return `install` of the Gemini stand-in, undone after the test."""
+    import fake_gemini
+
+    graph_module = importlib.import_module("agent.graph")
+    for name in ("get_chat_model", "get_structured_model", "get_genai_client"):
+        monkeypatch.setattr(graph_module, name, getattr(graph_module, name))
+    return lambda **kwargs: fake_gemini.install(graph_module, **kwargs)
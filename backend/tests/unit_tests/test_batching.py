@@ -0,0 +1,91 @@
+import asyncio
+import re
+
+from agent.batching import QueryBatcher
+from agent.tools_and_schemas import (
+    SearchQueryBatch,
+    SearchQueryList,
+    TaskSearchQueryList,
+)
+
+TASK = re.compile(r'<task index="(\d+)">\n(.*?)\n</task>', re.S)
+
+
+class FakeModel:
+    """Answers every prompt with its text as the query."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt, config=None, **kwargs):
+        self.prompts.append(prompt)
+        return SearchQueryList(query=[prompt], rationale="single")
+
+
+class FakeBatchModel:
+    """Answers the tasks of a batch, then lets `edit` tamper with the results."""
+
+    def __init__(self, edit=lambda results: results):
+        self.edit = edit
+        self.prompts = []
+
+    def invoke(self, prompt, config=None, **kwargs):
+        self.prompts.append(prompt)
+        results = [
+            TaskSearchQueryList(task=int(index), query=[task], rationale="batched")
+            for index, task in TASK.findall(prompt)
+        ]
+        return SearchQueryBatch(results=self.edit(results))
+
+
+def run(batch_llm, llm, prompts, max_size=3):
+    batcher = QueryBatcher()
+
+    async def main():
+        return await asyncio.gather(
+            *(
+                batcher.arun("model", prompt, batch_llm, llm, 0.2, max_size)
+                for prompt in prompts
+            )
+        )
+
+    return asyncio.run(main())
+
+
+CALLS = ["topic a", "topic b", "topic c"]
+
+
+def test_results_are_matched_by_task_not_position():
+    batch_llm, llm = FakeBatchModel(lambda results: results[::-1]), FakeModel()
+    results = run(batch_llm, llm, CALLS)
+    assert [result.query for result in results] == [["topic a"], ["topic b"], ["topic c"]]
+    assert len(batch_llm.prompts) == 1
+    assert llm.prompts == []
+
+
+def test_missing_result_sends_every_prompt_on_its_own():
+    batch_llm, llm = FakeBatchModel(lambda results: results[1:]), FakeModel()
+    results = run(batch_llm, llm, CALLS)
+    assert [result.rationale for result in results] == ["single"] * 3
+    assert [result.query for result in results] == [["topic a"], ["topic b"], ["topic c"]]
+
+
+def test_duplicated_task_sends_every_prompt_on_its_own():
+    def duplicate(results):
+        results[2] = results[2].copy(update={"task": 1})
+        return results
+
+    llm = FakeModel()
+    results = run(FakeBatchModel(duplicate), llm, CALLS)
+    assert [result.query for result in results] == [["topic a"], ["topic b"], ["topic c"]]
+    assert sorted(llm.prompts) == ["topic a", "topic b", "topic c"]
+
+
+def test_batch_is_flushed_when_full():
+    batch_llm, llm = FakeBatchModel(), FakeModel()
+    results = run(batch_llm, llm, CALLS, max_size=2)
+    assert [result.query for result in results] == [["topic a"], ["topic b"], ["topic c"]]
+    # The first two filled a batch, the third was sent alone once its window closed
+    assert len(batch_llm.prompts) == 1
+    assert "topic c" not in batch_llm.prompts[0]
+    assert llm.prompts == ["topic c"]
@@ -0,0 +1,89 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent import cache as cache_module
+from agent.cache import AnswerCache, WebResearchCache
+from agent.utils import deduplicate_queries, normalize_query
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("What is 2+2?", "What is 2-2?"),
+        ("C++ memory model tutorial", "C# memory model tutorial"),
+        ("$AAPL earnings", "AAPL earnings"),
+    ],
+)
+def test_web_research_key_keeps_symbols(a, b):
+    assert WebResearchCache.key(a, "model", "2026-01-01") != WebResearchCache.key(
+        b, "model", "2026-01-01"
+    )
+
+
+def test_web_research_key_folds_case_width_and_whitespace():
+    assert WebResearchCache.key(
+        "  Ｃ++  Memory\tmodel ", "model", "2026-01-01"
+    ) == WebResearchCache.key("c++ memory model", "model", "2026-01-01")
+
+
+def test_normalize_query_keeps_symbols():
+    assert normalize_query("What is 2+2?") == "what is 2+2?"
+
+
+def test_deduplication_still_ignores_punctuation():
+    assert deduplicate_queries(["solar panels, cost"], ["solar panels cost"], 0.9) == []
+
+
+def _run(question):
+    return {"messages": [HumanMessage(content=question)]}
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [("What is 2+2?", "What is 2-2?"), ("C++ tutorial", "C# tutorial"), ("$AAPL", "AAPL")],
+)
+def test_answer_key_keeps_exact_topic(a, b):
+    assert AnswerCache.key(_run(a), None) != AnswerCache.key(_run(b), None)
+
+
+def test_answer_cache_hits_across_case_and_whitespace():
+    cache = AnswerCache()
+    result = {"messages": [AIMessage(content="4")], "sources_gathered": []}
+    cache.store(AnswerCache.key(_run("What is 2+2?"), None), result, None)
+
+    assert cache.get(AnswerCache.key(_run("what is  2+2? "), None))["answer"].content == "4"
+    assert cache.get(AnswerCache.key(_run("What is 2-2?"), None)) is None
+    assert cache.invalidate("WHAT IS 2+2?") == 1
+
+
+class Clock:
+    """Stand-in for the time module, for both the wall and monotonic clocks."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+def test_disk_hit_keeps_the_remaining_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    path = str(tmp_path / "cache.sqlite")
+    key = WebResearchCache.key("world cup final", "model", "2026-01-01")
+    update = {"web_research_result": ["Argentina won."], "sources_gathered": []}
+    # Sports results stay fresh for ten minutes
+    WebResearchCache(path=path).store(key, 0, update, "sports")
+
+    # Another worker reads the result from disk halfway through its TTL
+    clock.now += 5 * 60
+    worker = WebResearchCache(path=path)
+    assert worker.lookup(key, 0) == update
+    assert len(worker.memory) == 1
+
+    # The copy in memory expires with the one on disk
+    clock.now += 5 * 60
+    assert worker.lookup(key, 0) is None
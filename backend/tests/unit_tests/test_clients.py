@@ -0,0 +1,50 @@
+import pytest
+
+from agent import clients
+from agent.clients import ClientRegistry, get_chat_model, get_structured_model
+from agent.tools_and_schemas import Reflection
+
+
+def test_registry_builds_each_key_once():
+    registry = ClientRegistry(max_size=4)
+    built = []
+
+    def factory():
+        built.append(object())
+        return built[-1]
+
+    first = registry.get(("chat", "model", 0.0), factory)
+    second = registry.get(("chat", "model", 0.0), factory)
+
+    assert first is second
+    assert len(built) == 1
+
+
+def test_registry_evicts_least_recently_used():
+    registry = ClientRegistry(max_size=2)
+    a = registry.get("a", object)
+    registry.get("b", object)
+    registry.get("a", object)  # refresh a, so b is the oldest
+    registry.get("c", object)
+
+    assert registry.get("a", object) is a
+    assert registry.stats()["size"] == 2
+    assert registry.get("b", lambda: "rebuilt") == "rebuilt"
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ClientRegistry(max_size=4)
+    monkeypatch.setattr(clients, "registry", registry)
+    return registry
+
+
+def test_cached_contents_share_one_client(registry):
+    first = get_chat_model("gemini-2.5-flash", 0, "cachedContents/a")
+    second = get_chat_model("gemini-2.5-flash", 0, "cachedContents/b")
+    assert first.bound is second.bound is get_chat_model("gemini-2.5-flash", 0)
+    assert first.kwargs == {"cached_content": "cachedContents/a"}
+    for name in ("cachedContents/a", "cachedContents/b", "cachedContents/c"):
+        get_structured_model("gemini-2.5-flash", 1.0, Reflection, name)
+    # A chat model per temperature, and one structured wrapper for every cached content
+    assert registry.stats()["size"] == 3
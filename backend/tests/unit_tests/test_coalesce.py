@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+from langchain_core.messages import HumanMessage
+
+from agent.coalesce import CoalescingGraph
+
+
+class SlowGraph:
+    def __init__(self):
+        self.runs = []
+
+    def invoke(self, input, config=None, **kwargs):
+        self.runs.append(input["messages"][-1].content)
+        time.sleep(0.1)
+        return {"answer": input["messages"][-1].content}
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.runs.append(input["messages"][-1].content)
+        await asyncio.sleep(0.1)
+        return {"answer": input["messages"][-1].content}
+
+
+def _input(question):
+    return {"messages": [HumanMessage(content=question)]}
+
+
+def test_key_separates_questions_that_differ_in_symbols():
+    assert CoalescingGraph.key(_input("What is 2+2?"), None) != CoalescingGraph.key(
+        _input("What is 2-2?"), None
+    )
+    assert CoalescingGraph.key(_input("C++ tutorial"), None) != CoalescingGraph.key(
+        _input("C# tutorial"), None
+    )
+
+
+def test_key_folds_case_and_whitespace():
+    assert CoalescingGraph.key(_input("What  is 2+2?"), None) == CoalescingGraph.key(
+        _input(" what is 2+2? "), None
+    )
+
+
+def test_identical_concurrent_runs_share_one_execution():
+    graph = SlowGraph()
+    coalesced = CoalescingGraph(graph)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(coalesced.invoke(_input("q"))))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert graph.runs == ["q"]
+    assert results == [{"answer": "q"}] * 3
+
+
+def test_different_concurrent_questions_run_separately():
+    graph = SlowGraph()
+    coalesced = CoalescingGraph(graph)
+
+    async def main():
+        return await asyncio.gather(
+            coalesced.ainvoke(_input("What is 2+2?")),
+            coalesced.ainvoke(_input("What is 2-2?")),
+        )
+
+    results = asyncio.run(main())
+    assert [r["answer"] for r in results] == ["What is 2+2?", "What is 2-2?"]
+    assert len(graph.runs) == 2
@@ -0,0 +1,23 @@
+from agent.configuration import Configuration, _freeze, _thaw
+
+
+def test_freeze_accepts_mixed_key_types():
+    value = {1: "a", "b": [2, {None: 3}]}
+    frozen = _freeze(value)
+    hash(frozen)
+    assert _thaw(frozen) == value
+
+
+def test_freeze_ignores_dict_order():
+    assert _freeze({"a": 1, "b": 2}) == _freeze({"b": 2, "a": 1})
+
+
+def test_from_runnable_config_reuses_resolved_configuration():
+    config = {"configurable": {"summary_token_budgets": {"sports": 100}, "max_research_loops": 3}}
+    first = Configuration.from_runnable_config(config)
+    second = Configuration.from_runnable_config(
+        {"configurable": {"max_research_loops": 3, "summary_token_budgets": {"sports": 100}}}
+    )
+    assert first is second
+    assert first.summary_token_budgets == {"sports": 100}
+    assert first.max_research_loops == 3
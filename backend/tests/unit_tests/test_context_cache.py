@@ -0,0 +1,164 @@
+import importlib
+
+import pytest
+
+from agent.context_cache import (
+    CONTEXT_CACHE_MIN_TOKENS,
+    ContextCache,
+    LocalContextCacheBackend,
+)
+from agent.prompts import answer_instructions, reflection_instructions
+
+# `agent` re-exports the compiled graph under the same name as the module
+graph_module = importlib.import_module("agent.graph")
+
+SEPARATOR = "\n\n---\n\n"
+# About 500 tokens each, the size of a web research summary
+SUMMARIES = [f"Summary {i} [source](https://vertexaisearch.cloud.google.com/id/0-{i}). " * 25 for i in range(4)]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ContextCache(LocalContextCacheBackend())
+    monkeypatch.setattr(graph_module, "context_cache", cache)
+    return cache
+
+
+def render(template, summaries, topic="What is quantum entanglement?", separator=SEPARATOR, run_id="run"):
+    return graph_module._render_prompt(
+        True, template, "gemini-2.5-flash", summaries=summaries, separator=separator,
+        run_id=run_id, current_date="January 01, 2026", research_topic=topic,
+    )
+
+
+def full_prompt(template, summaries, topic="What is quantum entanglement?", separator=SEPARATOR):
+    return template.format(
+        current_date="January 01, 2026", research_topic=topic,
+        summaries=separator.join(summaries),
+    )
+
+
+def test_instructions_alone_are_below_the_cache_minimum():
+    prefix = reflection_instructions.static_prefix(current_date="January 01, 2026")
+    assert len(prefix) // 4 < CONTEXT_CACHE_MIN_TOKENS
+
+
+@pytest.mark.parametrize(
+    "template, separator",
+    [(reflection_instructions, SEPARATOR), (answer_instructions, "\n---\n\n")],
+)
+def test_summaries_are_cached_once_seen_twice(cache, template, separator):
+    # A prefix sent once is not worth a billed cache
+    prompt, cached_content = render(template, SUMMARIES[:3], separator=separator)
+    cache.flush()
+    assert cached_content is None
+    assert prompt == full_prompt(template, SUMMARIES[:3], separator=separator)
+    assert cache.stats()["entries"] == 0
+
+    # The reflection of the next loop resends the same summaries
+    prompt, cached_content = render(
+        template, SUMMARIES[:3], topic="And how is it measured?", separator=separator
+    )
+    cache.flush()
+    assert cached_content is None
+    assert cache.stats()["entries"] == 1
+
+    prompt, cached_content = render(
+        template, SUMMARIES[:3], topic="And how is it measured?", separator=separator
+    )
+    assert cached_content is not None
+    cached = cache.backend.get(cached_content)
+    assert SUMMARIES[2] in cached
+    assert cached + prompt == full_prompt(
+        template, SUMMARIES[:3], topic="And how is it measured?", separator=separator
+    )
+
+
+def test_growing_summaries_cache_what_they_share(cache):
+    render(reflection_instructions, SUMMARIES[:2])
+    # The next research loop adds a summary, the shared prefix is seen again
+    prompt, cached_content = render(reflection_instructions, SUMMARIES[:3])
+    cache.flush()
+    assert cached_content is None
+    assert cache.stats()["entries"] == 1
+
+    prompt, cached_content = render(reflection_instructions, SUMMARIES)
+    assert cached_content is not None
+    assert prompt.startswith(SEPARATOR + SUMMARIES[2])
+    assert cache.backend.get(cached_content) + prompt == full_prompt(
+        reflection_instructions, SUMMARIES
+    )
+    # The prefix of the previous loop was seen twice by now
+    cache.flush()
+    assert cache.stats()["entries"] == 2
+    _, longer = render(reflection_instructions, SUMMARIES)
+    assert cache.backend.get(longer).endswith(SUMMARIES[2])
+
+
+def test_finished_runs_delete_their_caches(cache):
+    for _ in range(2):
+        render(reflection_instructions, SUMMARIES[:3], run_id="first")
+    cache.flush()
+    # Another run with the same research uses the cache as well
+    _, cached_content = render(reflection_instructions, SUMMARIES[:3], run_id="second")
+    assert cached_content is not None
+
+    cache.release("first")
+    cache.flush()
+    assert cache.backend.get(cached_content)
+    cache.release("second")
+    cache.flush()
+    assert cache.stats()["entries"] == 0
+    with pytest.raises(KeyError):
+        cache.backend.get(cached_content)
+
+
+def test_sightings_of_other_runs_do_not_create_caches(cache):
+    # Each run's caches would be deleted before another run could use them
+    for run_id in ("first", "second"):
+        render(reflection_instructions, SUMMARIES[:3], run_id=run_id)
+    cache.flush()
+    assert cache.stats()["entries"] == 0
+
+
+def test_release_waits_for_pending_creations(cache):
+    before = cache.stats()
+    for _ in range(2):
+        render(reflection_instructions, SUMMARIES[:3], run_id="run")
+    # Released before the creation queued by the second sighting ran
+    cache.release("run")
+    cache.flush()
+    after = cache.stats()
+    assert after["entries"] == 0
+    assert after["creates"] - before["creates"] == 1
+    assert after["deletes"] - before["deletes"] == 1
+
+
+def test_small_prompts_are_not_cached(cache):
+    prompt, cached_content = render(reflection_instructions, ["A short summary."])
+    cache.flush()
+    assert cached_content is None
+    assert prompt == full_prompt(reflection_instructions, ["A short summary."])
+    assert cache.stats()["entries"] == 0
+
+
+def test_caching_disabled_sends_the_whole_prompt(cache):
+    prompt, cached_content = graph_module._render_prompt(
+        False, reflection_instructions, "gemini-2.5-flash", summaries=SUMMARIES,
+        separator=SEPARATOR, current_date="January 01, 2026", research_topic="topic",
+    )
+    cache.flush()
+    assert cached_content is None
+    assert prompt == full_prompt(reflection_instructions, SUMMARIES, topic="topic")
+    assert cache.stats()["entries"] == 0
+
+
+def test_lookup_keys_on_model():
+    cache = ContextCache(LocalContextCacheBackend(), min_tokens=0)
+    for _ in range(2):
+        cache.lookup(reflection_instructions, "model-a", ["prefix"])
+    cache.flush()
+    assert cache.lookup(reflection_instructions, "model-b", ["prefix"]) is None
+    name, prefix = cache.lookup(reflection_instructions, "model-a", ["prefix"])
+    assert prefix == "prefix"
+    assert cache.backend.get(name) == "prefix"
@@ -0,0 +1,295 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agent import database, mock_database
+from agent.api_routes import router
+from agent.auth import get_current_active_user
+from agent.database import ConversationInDB, ConversationMessage, UserResponse
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def new_conversation(user_id, title="Notes", messages=()):
+    return ConversationInDB(
+        user_id=user_id,
+        title=title,
+        messages=[
+            ConversationMessage(id=str(i + 1), role="human", content=content)
+            for i, content in enumerate(messages)
+        ],
+    )
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(database, "conversations_collection", client.db.conversations)
+    return database
+
+
+def test_mock_append_of_no_messages_changes_nothing():
+    user_id = str(uuid.uuid4())
+    conversation_id = run(mock_database.save_conversation(new_conversation(user_id, messages=["hi"])))
+    updated_at = mock_database.mock_conversations[conversation_id].updated_at
+    assert run(mock_database.append_messages(conversation_id, user_id, [])) == []
+    assert run(mock_database.append_messages(conversation_id, "someone else", [])) is None
+    conversation = mock_database.mock_conversations[conversation_id]
+    assert len(conversation.messages) == 1
+    assert conversation.updated_at == updated_at
+
+
+def test_mongo_append_of_no_messages_changes_nothing(mongo):
+    user_id = str(uuid.uuid4())
+    conversation_id = run(mongo.save_conversation(new_conversation(user_id, messages=["hi"])))
+    assert run(mongo.append_messages(conversation_id, user_id, [])) == []
+    assert run(mongo.append_messages(conversation_id, "someone else", [])) is None
+
+
+def test_batch_route_rejects_no_messages():
+    response = authorized_client().post("/api/conversations/000000000000000000000000/messages/batch", json=[])
+    assert response.status_code == 422
+
+
+def seed_conversations(db, user_id, count):
+    # Pairs of conversations share an update time, so pages break ties on the id
+    ids = []
+    for i in range(count):
+        conversation = new_conversation(user_id, title=f"Conversation {i}")
+        conversation.updated_at = datetime(2026, 1, 1 + i // 2)
+        ids.append(run(db.save_conversation(conversation)))
+    return ids
+
+
+def all_pages(fetch, limit):
+    seen, cursor = [], None
+    while True:
+        page = run(fetch(limit, cursor))
+        assert len(page.conversations) <= limit
+        seen += [summary.id for summary in page.conversations]
+        if page.next_cursor is None:
+            return seen
+        cursor = page.next_cursor
+
+
+def test_cursor_pages_list_every_conversation_once():
+    user_id = str(uuid.uuid4())
+    ids = seed_conversations(mock_database, user_id, 7)
+    expected = run(mock_database.get_user_conversation_summaries(user_id, limit=100)).conversations
+    assert sorted(summary.id for summary in expected) == sorted(ids)
+    assert [summary.updated_at for summary in expected] == sorted(
+        (summary.updated_at for summary in expected), reverse=True
+    )
+    for limit in (1, 3, 7):
+        pages = all_pages(
+            lambda limit, cursor: mock_database.get_user_conversation_summaries(
+                user_id, limit=limit, cursor=cursor
+            ),
+            limit,
+        )
+        assert pages == [summary.id for summary in expected]
+
+
+def authorized_client():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_active_user] = lambda: UserResponse(
+        id="user", email="user@example.com", username="user", full_name="User",
+        is_active=True, created_at=datetime.utcnow(), last_login=None, preferences={},
+    )
+    return TestClient(app)
+
+
+def test_users_cannot_clear_the_shared_answer_cache():
+    # Cached answers are shared by every user and expire with their TTL
+    assert authorized_client().delete("/api/research/cache").status_code == 404
+
+
+@pytest.mark.parametrize(
+    "params", [{"limit": 0}, {"limit": -1}, {"limit": 101}, {"skip": -1}]
+)
+def test_list_rejects_out_of_range_paging(params):
+    assert authorized_client().get("/api/conversations", params=params).status_code == 422
+
+
+@pytest.mark.parametrize("limit", [0, -1, 101])
+def test_search_rejects_out_of_range_limit(limit):
+    response = authorized_client().post(
+        "/api/conversations/search", json={"query": "notes", "limit": limit}
+    )
+    assert response.status_code == 422
+
+
+def search(user_id, query, **kwargs):
+    page = run(mock_database.search_conversations(user_id, query, **kwargs))
+    return [summary.title for summary in page.conversations]
+
+
+@pytest.fixture
+def searchable():
+    user_id = str(uuid.uuid4())
+    for title, content in [
+        ("Quantum notes", "Explain quantum entanglement"),
+        ("Cooking", "The best pasta recipes"),
+        ("Physics homework", "Entangled photons and notes on optics"),
+    ]:
+        run(mock_database.save_conversation(new_conversation(user_id, title, [content])))
+    return user_id
+
+
+@pytest.mark.parametrize(
+    "query, titles",
+    [
+        # Any word matches, as with $text, and stop words are left out
+        ("what is quantum entanglement", {"Quantum notes", "Physics homework"}),
+        ("quantum physics", {"Quantum notes", "Physics homework"}),
+        ("the quantum", {"Quantum notes"}),
+        # Words match up to their stem
+        ("note", {"Quantum notes", "Physics homework"}),
+        ("recipe", {"Cooking"}),
+        # Phrases must be present, negated words absent
+        ('"quantum entanglement"', {"Quantum notes"}),
+        ("notes -quantum", {"Physics homework"}),
+    ],
+)
+def test_mock_search_matches_like_mongo_text_search(searchable, query, titles):
+    assert set(search(searchable, query)) == titles
+
+
+def test_mock_search_ranks_by_occurrences(searchable):
+    assert search(searchable, "quantum")[0] == "Quantum notes"
+
+
+def test_mock_search_falls_back_to_title_and_tag_prefixes(searchable):
+    assert search(searchable, "quant") == ["Quantum notes"]
+    assert search(searchable, "phys home") == ["Physics homework"]
+    # Messages are left to the text index, and words must start with the query
+    assert search(searchable, "entang") == []
+    assert search(searchable, "ntum") == []
+
+
+class TextSearchCollection:
+    """A mongomock collection answering $text pipelines with scripted documents.
+
+    mongomock has no text index, so the text stage is checked and answered
+    here. Finds reach the real collection without their projection, which
+    mongomock cannot evaluate; saved documents carry its fields already.
+    """
+
+    def __init__(self, collection, text_results):
+        self.collection = collection
+        self.text_results = text_results
+        self.pipelines = []
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def find(self, query_filter, projection=None):
+        return self.collection.find(query_filter)
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        results = list(self.text_results)
+
+        async def documents():
+            for doc in results:
+                yield doc
+
+        return documents()
+
+
+@pytest.fixture
+def text_search(mongo, monkeypatch):
+    def install(text_results=()):
+        collection = TextSearchCollection(mongo.conversations_collection, text_results)
+        monkeypatch.setattr(mongo, "conversations_collection", collection)
+        return collection
+
+    return install
+
+
+def test_mongo_search_ranks_text_matches(text_search):
+    user_id = str(uuid.uuid4())
+    hits = [
+        {
+            "_id": ObjectId(), "title": title, "created_at": datetime(2026, 1, 1),
+            "updated_at": datetime(2026, 1, 1), "score": score,
+        }
+        for title, score in [("Quantum notes", 2.0), ("Physics homework", 1.0)]
+    ]
+    collection = text_search(hits)
+    page = run(database.search_conversations(user_id, "quantum", category="science", limit=1))
+    assert [summary.title for summary in page.conversations] == ["Quantum notes"]
+    assert database.decode_cursor(page.next_cursor)[0] == 2.0
+    match = collection.pipelines[0][0]["$match"]
+    assert match == {
+        "user_id": user_id, "is_archived": False, "category": "science",
+        "$text": {"$search": "quantum"},
+    }
+
+
+def test_mongo_search_falls_back_to_title_and_tag_prefixes(text_search):
+    user_id = str(uuid.uuid4())
+    for title, tags, content in [
+        ("Quantum notes", [], "Explain entanglement"),
+        ("Homework", ["Physics", "Quantum"], "Optics"),
+    ]:
+        conversation = new_conversation(user_id, title, [content])
+        conversation.tags = tags
+        run(database.save_conversation(conversation))
+    collection = text_search()
+
+    def titles(query):
+        page = run(database.search_conversations(user_id, query))
+        return [summary.title for summary in page.conversations]
+
+    assert titles("QUANT") == ["Homework", "Quantum notes"]
+    assert titles("phys hom") == ["Homework"]
+    assert titles("entang") == []
+    assert titles("uantum") == []
+    assert titles("!!") == []
+    # Each search tried the text index before its fallback
+    assert len(collection.pipelines) == 5
+    # Pages of the fallback keep its word filters next to the cursor
+    pages = all_pages(
+        lambda limit, cursor: database.search_conversations(
+            user_id, "quant", limit=limit, cursor=cursor
+        ),
+        1,
+    )
+    assert len(pages) == 2
+
+
+def test_mongo_keywords_follow_title_and_tag_updates(mongo):
+    user_id = str(uuid.uuid4())
+    conversation_id = run(mongo.save_conversation(new_conversation(user_id, "Draft")))
+    run(mongo.update_conversation(conversation_id, {"tags": ["Quantum"]}))
+    doc = run(mongo.conversations_collection.find_one({"_id": ObjectId(conversation_id)}))
+    assert doc["keywords"] == ["draft", "quantum"]
+
+
+def test_mock_search_pages_with_cursors():
+    user_id = str(uuid.uuid4())
+    for i in range(5):
+        content = " ".join(["quantum"] * (i + 1))
+        run(mock_database.save_conversation(new_conversation(user_id, f"Conversation {i}", [content])))
+    expected = search(user_id, "quantum", limit=100)
+    assert expected == [f"Conversation {i}" for i in range(4, -1, -1)]
+    pages = all_pages(
+        lambda limit, cursor: mock_database.search_conversations(
+            user_id, "quantum", limit=limit, cursor=cursor
+        ),
+        2,
+    )
+    assert pages == [
+        summary.id
+        for summary in run(mock_database.search_conversations(user_id, "quantum", limit=100)).conversations
+    ]
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+
+from agent import fanout as fanout_module
+from agent.fanout import FanoutCoordinator
+
+
+def _batch(coordinator, size, quorum, timeout=None):
+    spec = coordinator.new_batch(coordinator.new_run_id(), size)
+    return coordinator.batch(spec, quorum, timeout, merge_late=False)
+
+
+def _fail():
+    raise RuntimeError("search failed")
+
+
+def test_failed_search_does_not_count_towards_quorum():
+    batch = _batch(FanoutCoordinator(), size=2, quorum=0.5)
+
+    def slow():
+        time.sleep(0.2)
+        return "slow result"
+
+    with pytest.raises(RuntimeError):
+        batch.run(_fail)
+    # Had the failure met the quorum, the slow branch would be abandoned at once
+    assert batch.run(slow) == "slow result"
+
+
+def test_quorum_only_batch_waits_a_bounded_time(monkeypatch):
+    monkeypatch.setattr(fanout_module, "FANOUT_MAX_WAIT", 0.1)
+    batch = _batch(FanoutCoordinator(), size=2, quorum=0.5)
+
+    start = time.monotonic()
+    assert batch.run(lambda: time.sleep(1)) is None
+    assert time.monotonic() - start < 0.5
+
+
+def test_quorum_releases_slow_branch_after_success():
+    batch = _batch(FanoutCoordinator(), size=2, quorum=0.5, timeout=5)
+    assert batch.run(lambda: "fast") == "fast"
+    start = time.monotonic()
+    assert batch.run(lambda: time.sleep(1)) is None
+    assert time.monotonic() - start < 0.5
+
+
+def test_async_failed_search_does_not_count_towards_quorum():
+    batch = _batch(FanoutCoordinator(), size=2, quorum=0.5)
+
+    async def failing():
+        raise RuntimeError("search failed")
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return "slow result"
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await batch.arun(failing)
+        return await batch.arun(slow)
+
+    assert asyncio.run(main()) == "slow result"
@@ -0,0 +1,132 @@
+import asyncio
+import importlib
+import threading
+
+from langchain_core.messages import AIMessageChunk, HumanMessage
+
+from agent.metrics import metrics
+
+# `agent` re-exports the compiled graph under the same name as the module
+graph_module = importlib.import_module("agent.graph")
+
+
+def run(question, max_research_loops=3, configurable=None):
+    state = {
+        "messages": [HumanMessage(content=question)],
+        "initial_search_query_count": 1,
+        "max_research_loops": max_research_loops,
+    }
+    config = {"configurable": {"web_research_cache": False, **(configurable or {})}}
+    return graph_module.graph.invoke(state, config)
+
+
+def test_adaptive_plan_caps_research_loops(fake_gemini):
+    fake_gemini(latency=0, sufficient=False)
+    result = run(
+        "Who won the match last night?",
+        configurable={
+            "adaptive_depth": True,
+            "research_category": "sports",
+            "max_research_loops": 3,
+        },
+    )
+    assert result["research_plan"]["max_research_loops"] == 2
+    assert result["research_loop_count"] == 2
+
+
+def test_requested_loop_budget_overrides_the_configured_one(fake_gemini):
+    fake_gemini(latency=0, sufficient=False)
+    result = run("Who won the match last night?", max_research_loops=3)
+    assert result["research_loop_count"] == 3
+    result = run("Who won the match last night?", max_research_loops=1)
+    assert result["research_loop_count"] == 1
+
+
+def speculation_counters():
+    counters = metrics.snapshot("speculative_finalize.")["counters"]
+    return {name.rsplit(".", 1)[1]: counters.get(name, 0) for name in counters}
+
+
+def sufficient_after(loops):
+    # The reflection prompt holds one summary per search run so far
+    return lambda prompt: prompt.count("Findings about") >= loops
+
+
+def streamed_answer(question, max_research_loops, configurable):
+    state = {
+        "messages": [HumanMessage(content=question)],
+        "initial_search_query_count": 1,
+        "max_research_loops": max_research_loops,
+    }
+    config = {"configurable": {"web_research_cache": False, **configurable}}
+    tokens, final = [], None
+    for mode, event in graph_module.graph.stream(
+        state, config, stream_mode=["messages", "values"]
+    ):
+        if mode == "values":
+            final = event
+        elif event[1]["langgraph_node"] == "finalize_answer":
+            tokens.append(event[0])
+    return tokens, final
+
+
+def test_kept_draft_is_streamed_by_finalize_answer(fake_gemini):
+    fake_gemini(latency=0, sufficient=sufficient_after(2))
+    metrics.reset()
+    tokens, final = streamed_answer("What is quantum entanglement?", 3, {"speculative_finalize": True})
+    assert final["research_loop_count"] == 2
+    # The first loop's draft was discarded, the second's kept
+    counters = speculation_counters()
+    assert (counters["attempts"], counters["losses"], counters["wins"]) == (2, 1, 1)
+    answer = final["messages"][-1]
+    assert len(tokens) > 1
+    assert {token.id for token in tokens} == {answer.id}
+    assert "".join(token.content for token in tokens) == answer.content
+    assert final["speculative_answer"] is None
+
+
+def test_draft_is_discarded_when_research_continues(fake_gemini):
+    fake_gemini(latency=0, sufficient=False)
+    metrics.reset()
+    result = run(
+        "What is quantum entanglement?",
+        max_research_loops=2,
+        configurable={"speculative_finalize": True},
+    )
+    assert result["research_loop_count"] == 2
+    counters = speculation_counters()
+    # The draft of the last loop is kept, since the loop budget ends the research
+    assert (counters["attempts"], counters["losses"], counters["wins"]) == (2, 1, 1)
+    assert result["messages"][-1].content.startswith("Here is the researched answer.")
+
+
+def test_async_run_keeps_the_same_draft_decision(fake_gemini):
+    fake_gemini(latency=0, sufficient=sufficient_after(2))
+    metrics.reset()
+    state = {
+        "messages": [HumanMessage(content="What is quantum entanglement?")],
+        "initial_search_query_count": 1,
+        "max_research_loops": 3,
+    }
+    config = {"configurable": {"web_research_cache": False, "speculative_finalize": True}}
+    result = asyncio.run(graph_module.graph.ainvoke(state, config))
+    assert result["research_loop_count"] == 2
+    counters = speculation_counters()
+    assert (counters["losses"], counters["wins"]) == (1, 1)
+
+
+def test_discarded_sync_draft_stops_streaming():
+    stop = threading.Event()
+    pulled = []
+
+    class EndlessModel:
+        def stream(self, prompt, config=None):
+            for i in range(1000):
+                pulled.append(i)
+                if i == 3:
+                    stop.set()
+                yield AIMessageChunk(content=f"word{i} ", id="draft")
+
+    answer = graph_module._draft_answer(EndlessModel(), "prompt", stop)
+    assert answer.content == "word0 word1 word2 "
+    assert len(pulled) == 4
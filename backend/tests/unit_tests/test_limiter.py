@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from agent import limiter as limiter_module
+from agent.limiter import ModelLimiter, RateLimiter, _Ticket
+
+
+class Throttled(Exception):
+    code = 429
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+def failing(error, failures):
+    attempts = []
+
+    def func():
+        attempts.append(1)
+        if len(attempts) <= failures:
+            raise error()
+        return "ok"
+
+    return func, attempts
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Jitter at its upper bound, so each delay is the full backoff
+    monkeypatch.setattr(limiter_module.random, "uniform", lambda low, high: high)
+    recorded = []
+    monkeypatch.setattr(limiter_module.time, "sleep", recorded.append)
+
+    async def asleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr(limiter_module.asyncio, "sleep", asleep)
+    return recorded
+
+
+def test_429_halves_rate_and_success_recovers_it():
+    limiter = ModelLimiter("model", rps=100, tpm=1_000_000, max_in_flight=4)
+    limiter.acquire("user", 10)
+    limiter.release(10, error=Throttled())
+    assert limiter.rate_factor == 0.5
+
+    limiter.acquire("user", 10)
+    limiter.release(10)
+    assert limiter.rate_factor == pytest.approx(0.55)
+
+
+def test_queued_calls_are_admitted_round_robin_across_callers():
+    limiter = ModelLimiter("model", rps=1_000, tpm=1_000_000, max_in_flight=1)
+    limiter.acquire("holder", 1)
+    admitted = []
+    tickets = []
+    for caller in ("a", "a", "a", "b"):
+        ticket = _Ticket(caller, 1, lambda c=caller: admitted.append(c))
+        tickets.append(ticket)
+        limiter._enqueue(ticket)
+    for _ in tickets:
+        limiter.release(1)
+    # b does not wait behind every call a queued first
+    assert admitted[:2] == ["a", "b"]
+
+
+def test_call_retries_throttled_calls(sleeps):
+    limiter = RateLimiter(limits={"model": {"rps": 1_000, "tpm": 1_000_000}}, retries=2)
+    flaky, attempts = failing(Throttled, 2)
+    assert limiter.call("model", "user", 1, flaky) == "ok"
+    assert len(attempts) == 3
+    # The drained request bucket spaces throttled retries already
+    assert sleeps == [0.0, 0.0]
+
+
+def test_call_backs_off_exponentially_on_server_errors(monkeypatch, sleeps):
+    monkeypatch.setattr(limiter_module, "LLM_RETRY_BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(limiter_module, "LLM_RETRY_BACKOFF_MAX", 3.0)
+    limiter = RateLimiter(limits={"model": {"rps": 1_000, "tpm": 1_000_000}}, retries=3)
+    flaky, attempts = failing(Unavailable, 3)
+    assert limiter.call("model", "user", 1, flaky) == "ok"
+    assert sleeps == [1.0, 2.0, 3.0]
+
+    # The async path backs off the same way, and gives up after its retries
+    sleeps.clear()
+    flaky, attempts = failing(Unavailable, 4)
+
+    async def afunc():
+        return flaky()
+
+    with pytest.raises(Unavailable):
+        asyncio.run(limiter.acall("model", "user", 1, afunc))
+    assert len(attempts) == 4
+    assert sleeps == [1.0, 2.0, 3.0]
+    # The slot of every failed attempt was handed back
+    assert limiter.model("model").in_flight == 0
+
+
+def test_async_acquire_waits_for_free_slot():
+    limiter = ModelLimiter("model", rps=1_000, tpm=1_000_000, max_in_flight=1)
+
+    async def main():
+        await limiter.aacquire("a", 1)
+        waiter = asyncio.ensure_future(limiter.aacquire("b", 1))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        limiter.release(1)
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(main())
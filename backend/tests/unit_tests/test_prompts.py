@@ -0,0 +1,47 @@
+import pytest
+
+from agent import prompts
+from agent.prompts import PromptTemplate
+
+TEMPLATES = [
+    prompts.query_writer_instructions,
+    prompts.web_searcher_instructions,
+    prompts.reflection_instructions,
+    prompts.answer_instructions,
+    prompts.batched_query_writer_instructions,
+]
+VALUES = {
+    "current_date": "January 01, 2026",
+    "number_queries": 3,
+    "research_topic": "What is {braced} 2+2?",
+    "summaries": "a summary with {braces}",
+    "tasks": "<task 0>topic</task>",
+    "count": 1,
+}
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_format_matches_str_format(template):
+    assert template.format(**VALUES) == template.template.format(**VALUES)
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_format_is_static_prefix_plus_tail(template):
+    assert template.format(**VALUES) == (
+        template.static_prefix(**VALUES) + template.render_tail(**VALUES)
+    )
+
+
+def test_static_prefix_is_rendered_once_per_static_values():
+    template = PromptTemplate("Date {current_date}. {{literal}} Topic: {topic}")
+    first = template.format(current_date="d1", topic="a")
+    assert template.format(current_date="d1", topic="b") == "Date d1. {literal} Topic: b"
+    assert first == "Date d1. {literal} Topic: a"
+    assert template.static_prefix(current_date="d1") is template.static_prefix(
+        current_date="d1"
+    )
+
+
+def test_format_defaults_current_date():
+    template = PromptTemplate("Today is {current_date}. {topic}")
+    assert template.format(topic="x") == f"Today is {prompts.get_current_date()}. x"
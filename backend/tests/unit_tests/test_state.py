@@ -0,0 +1,41 @@
+from agent import state
+from agent.state import merge_sources
+
+
+def source(n, label=None):
+    return {
+        "short_url": f"https://vertexaisearch.cloud.google.com/id/0-{n}",
+        "value": f"https://example.com/{n}",
+        "label": label or f"source {n}",
+    }
+
+
+def urls(sources):
+    return [s["short_url"].rsplit("-", 1)[1] for s in sources]
+
+
+def test_merge_keeps_the_first_entry_per_short_url():
+    left = [source(1, "first label")]
+    merged = merge_sources(left, [source(1, "later label"), source(2), source(2)])
+    assert urls(merged) == ["1", "2"]
+    assert merged[0]["label"] == "first label"
+    # The existing state is not modified in place
+    assert urls(left) == ["1"]
+
+
+def test_merge_preserves_order_of_first_appearance():
+    merged = merge_sources([source(3), source(1)], [source(2), source(1), source(4), source(3)])
+    assert urls(merged) == ["3", "1", "2", "4"]
+
+
+def test_merge_is_uncapped_by_default(monkeypatch):
+    monkeypatch.setattr(state, "MAX_SOURCES_GATHERED", None)
+    assert len(merge_sources([], [source(n) for n in range(100)])) == 100
+
+
+def test_merge_drops_sources_past_the_cap(monkeypatch):
+    monkeypatch.setattr(state, "MAX_SOURCES_GATHERED", 3)
+    merged = merge_sources([source(1), source(2)], [source(2), source(3), source(4)])
+    assert urls(merged) == ["1", "2", "3"]
+    # Once full, new sources are dropped and the earliest ones kept
+    assert urls(merge_sources(merged, [source(5)])) == ["1", "2", "3"]
@@ -0,0 +1,101 @@
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, StateGraph
+
+from agent.streaming import (
+    SHORT_URL_PREFIX,
+    ShortUrlRewriter,
+    ShortUrlRewritingChatModel,
+)
+
+SHORT_URL = SHORT_URL_PREFIX + "12-3"
+SOURCES = [{"short_url": SHORT_URL, "value": "https://example.com/article"}]
+TEXT = f"Entanglement was measured [source]({SHORT_URL}) in 2022."
+REWRITTEN = "Entanglement was measured [source](https://example.com/article) in 2022."
+
+
+@pytest.mark.parametrize("split", range(len(TEXT) + 1))
+def test_short_url_split_across_chunks_is_rewritten(split):
+    rewriter = ShortUrlRewriter(SOURCES)
+    emitted = rewriter.feed(TEXT[:split])
+    # Nothing that could still be part of the url leaves before it is complete
+    assert REWRITTEN.startswith(emitted)
+    emitted += rewriter.feed(TEXT[split:]) + rewriter.flush()
+    assert emitted == REWRITTEN
+    assert rewriter.unique_sources == SOURCES
+
+
+@pytest.mark.parametrize("split", range(len(SHORT_URL) + 1))
+def test_unknown_short_url_split_across_chunks_is_kept(split):
+    rewriter = ShortUrlRewriter([])
+    text = rewriter.feed(SHORT_URL[:split]) + rewriter.feed(SHORT_URL[split:])
+    assert text + rewriter.flush() == SHORT_URL
+    assert rewriter.unique_sources == []
+
+
+class State(TypedDict):
+    messages: Annotated[list, operator.add]
+
+
+def answer_graph(asynchronous=False):
+    def wrapper():
+        # A binding has no private generation methods, only the public ones
+        model = GenericFakeChatModel(messages=iter([AIMessage(content=TEXT)])).bind(
+            stop=None
+        )
+        return ShortUrlRewritingChatModel(model=model, rewriter=ShortUrlRewriter(SOURCES))
+
+    def answer(state):
+        return {"messages": [wrapper().invoke(state["messages"])]}
+
+    async def aanswer(state):
+        return {"messages": [await wrapper().ainvoke(state["messages"])]}
+
+    builder = StateGraph(State)
+    builder.add_node("answer", aanswer if asynchronous else answer)
+    builder.add_edge(START, "answer")
+    builder.add_edge("answer", END)
+    return builder.compile()
+
+
+def streamed(parts):
+    tokens, final = [], None
+    for mode, payload in parts:
+        if mode == "messages":
+            tokens.append(payload[0])
+        else:
+            final = payload["messages"][-1]
+    return tokens, final
+
+
+def check_stream(tokens, final):
+    # Only the rewritten tokens reach the stream, each of them once
+    assert "".join(token.content for token in tokens) == REWRITTEN
+    assert {token.id for token in tokens} == {final.id}
+    assert final.content == REWRITTEN
+
+
+def test_wrapper_streams_rewritten_tokens_once():
+    graph = answer_graph()
+    check_stream(
+        *streamed(graph.stream({"messages": ["question"]}, stream_mode=["messages", "values"]))
+    )
+
+
+def test_async_wrapper_streams_rewritten_tokens_once():
+    graph = answer_graph(asynchronous=True)
+
+    async def main():
+        return [
+            part
+            async for part in graph.astream(
+                {"messages": ["question"]}, stream_mode=["messages", "values"]
+            )
+        ]
+
+    check_stream(*streamed(asyncio.run(main())))
@@ -0,0 +1,115 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.utils import (
+    _byte_to_char_offsets,
+    estimate_tokens,
+    get_research_topic,
+    insert_citation_markers,
+    pack_summaries,
+)
+
+TOPIC = "solar panel efficiency"
+
+
+def test_pack_summaries_returns_fitting_summaries_unchanged():
+    summaries = ["solar panels convert light.", "efficiency is about 20%."]
+    assert pack_summaries(summaries, TOPIC, budget=1_000) == summaries
+
+
+def test_pack_summaries_truncates_into_large_remainder():
+    relevant = "Solar panel efficiency rose this year. " * 100
+    packed = pack_summaries([relevant, "Unrelated note. " * 100], TOPIC, budget=200)
+    assert len(packed) == 1
+    assert packed[0].startswith("Solar panel efficiency")
+    assert estimate_tokens(packed[0]) <= 200
+
+
+def test_pack_summaries_skips_oversized_summary_and_keeps_later_ones():
+    oversized = "Solar panel efficiency depends on many factors. " * 20
+    short = "Panel prices fell."
+    # Too little budget to truncate into, but the short summary fits
+    packed = pack_summaries([oversized, short], TOPIC, budget=30)
+    assert packed == [short]
+
+
+def _conversation(*contents):
+    return [
+        (HumanMessage if i % 2 == 0 else AIMessage)(content=content, id=str(i + 1))
+        for i, content in enumerate(contents)
+    ]
+
+
+def test_research_topic_is_not_shared_by_conversations_with_equal_ids():
+    rust = _conversation("Tell me about Rust", "Rust is a language.", "And its borrow checker?")
+    go = _conversation("Tell me about Go", "Go is a language.", "And its garbage collector?")
+
+    assert "Rust" in get_research_topic(rust)
+    topic = get_research_topic(go)
+    assert "Rust" not in topic
+    assert "garbage collector" in topic
+
+
+def test_research_topic_extends_cached_prefix():
+    messages = _conversation("first question", "first answer")
+    get_research_topic(messages)
+    messages += _conversation("x", "y", "follow-up")[2:]
+
+    assert get_research_topic(messages) == (
+        "User: first question\nAssistant: first answer\nUser: follow-up\n"
+    )
+
+
+def test_research_topic_windows_long_conversations():
+    messages = _conversation(*(f"turn {i}" for i in range(6)))
+    assert get_research_topic(messages, max_turns=2) == (
+        "User: turn 0\n[3 earlier turns omitted]\nUser: turn 4\nAssistant: turn 5\n"
+    )
+
+
+def _citation(end, *labels, start=0):
+    return {
+        "start_index": start,
+        "end_index": end,
+        "segments": [{"label": label, "short_url": f"https://s/{label}"} for label in labels],
+    }
+
+
+def _bytes(text):
+    return len(text.encode("utf-8"))
+
+
+def test_byte_offsets_after_multibyte_text_land_after_the_sentence():
+    first = "量子纠缠 is real 🚀."
+    text = first + " More follows."
+    marked = insert_citation_markers(text, [_citation(_bytes(first), "a")], byte_offsets=True)
+    assert marked == first + " [a](https://s/a) More follows."
+
+
+def test_byte_offset_inside_a_character_moves_to_its_end():
+    text = "ab🚀cd"
+    # Every offset inside the four bytes of the emoji lands after it
+    assert _byte_to_char_offsets(text, [2, 3, 4, 5, 6]) == {2: 2, 3: 3, 4: 3, 5: 3, 6: 3}
+
+
+def test_citations_sharing_an_end_are_ordered_by_start_then_reverse_input():
+    text = "Café prices rose. Then fell."
+    end = _bytes("Café prices rose.")
+    citations = [
+        _citation(end, "late", start=5),
+        _citation(end, "first"),
+        _citation(end, "second"),
+    ]
+    marked = insert_citation_markers(text, citations, byte_offsets=True)
+    assert marked == (
+        "Café prices rose. [second](https://s/second) [first](https://s/first)"
+        " [late](https://s/late) Then fell."
+    )
+
+
+def test_citation_at_the_end_of_the_text_is_appended():
+    text = "Ends with ünïcödé"
+    citations = [_citation(_bytes(text), "a"), _citation(_bytes(text) + 10, "b")]
+    marked = insert_citation_markers(text, citations, byte_offsets=True)
+    assert marked == text + " [a](https://s/a) [b](https://s/b)"
+    # Character offsets of ascii text behave the same
+    assert insert_citation_markers("done", [_citation(4, "a")]) == "done [a](https://s/a)"
@@ -183,12 +183,15 @@ export default function App() {
         },
       ];
 
-      thread.submit({
-        messages: newMessages,
-        initial_search_query_count: initial_search_query_count,
-        max_research_loops: max_research_loops,
-        reasoning_model: model,
-      });
+      thread.submit(
+        {
+          messages: newMessages,
+          initial_search_query_count: initial_search_query_count,
+          max_research_loops: max_research_loops,
+          reasoning_model: model,
+        },
+        { config: { configurable: { research_category: category || "general" } } }
+      );
     },
     [thread, createConversation, addMessageToConversation, currentConversationId]
   );
@@ -25,7 +25,15 @@ export const ChatHistoryPanel: React.FC<ChatHistoryPanelProps> = ({
   conversations,
   onConversationSelect,
 }) => {
-  const { searchConversations, searchQuery, setSearchQuery, selectedCategory, setSelectedCategory } = useConversationStore();
+  const {
+    searchConversations,
+    searchQuery,
+    setSearchQuery,
+    selectedCategory,
+    setSelectedCategory,
+    nextCursor,
+    fetchMoreConversations,
+  } = useConversationStore();
   const [localSearchQuery, setLocalSearchQuery] = useState('');
 
   const handleSearch = async (query: string) => {
@@ -36,6 +44,14 @@ export const ChatHistoryPanel: React.FC<ChatHistoryPanelProps> = ({
     }
   };
 
+  const handleListScroll = (e: React.UIEvent<HTMLDivElement>) => {
+    const list = e.currentTarget;
+    // Load the next page before the end of the list comes into view
+    if (nextCursor && list.scrollHeight - list.scrollTop - list.clientHeight < 100) {
+      fetchMoreConversations();
+    }
+  };
+
   const categoryColors = {
     trending: 'bg-pink-500/20 text-pink-400 border-pink-500/30',
     sports: 'bg-green-500/20 text-green-400 border-green-500/30',
@@ -62,7 +78,7 @@ export const ChatHistoryPanel: React.FC<ChatHistoryPanelProps> = ({
           Chat History
         </h3>
         <Badge variant="outline" className="text-neutral-400 border-neutral-600">
-          {conversations.length} conversations
+          {conversations.length}{nextCursor ? '+' : ''} conversations
         </Badge>
       </div>
 
@@ -78,7 +94,7 @@ export const ChatHistoryPanel: React.FC<ChatHistoryPanelProps> = ({
       </div>
 
       {/* Conversations List */}
-      <div className="space-y-3 max-h-64 overflow-y-auto">
+      <div className="space-y-3 max-h-64 overflow-y-auto" onScroll={handleListScroll}>
         {conversations.length === 0 ? (
           <motion.div
             initial={{ opacity: 0 }}
@@ -55,7 +55,10 @@ export const ConversationHistorySidebar: React.FC<ConversationHistorySidebarProp
     setSearchQuery,
     selectedCategory,
     setSelectedCategory,
-    isLoading
+    isLoading,
+    isLoadingMore,
+    nextCursor,
+    fetchMoreConversations
   } = useConversationStore();
 
   const [localSearchQuery, setLocalSearchQuery] = useState('');
@@ -68,6 +71,14 @@ export const ConversationHistorySidebar: React.FC<ConversationHistorySidebarProp
     }
   }, [isOpen, fetchConversations]);
 
+  const handleListScroll = (e: React.UIEvent<HTMLDivElement>) => {
+    const list = e.currentTarget;
+    // Load the next page before the end of the list comes into view
+    if (nextCursor && list.scrollHeight - list.scrollTop - list.clientHeight < 200) {
+      fetchMoreConversations();
+    }
+  };
+
   const handleSearch = async (query: string) => {
     setLocalSearchQuery(query);
     setSearchQuery(query);
@@ -234,7 +245,7 @@ export const ConversationHistorySidebar: React.FC<ConversationHistorySidebarProp
         </div>
 
         {/* Conversations List */}
-        <div className="flex-1 overflow-y-auto">
+        <div className="flex-1 overflow-y-auto" onScroll={handleListScroll}>
           {isLoading ? (
             <div className="flex items-center justify-center h-32">
               <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-blue-500"></div>
@@ -329,6 +340,11 @@ export const ConversationHistorySidebar: React.FC<ConversationHistorySidebarProp
                   </div>
                 </div>
               ))}
+              {isLoadingMore && (
+                <div className="flex items-center justify-center py-4">
+                  <div className="animate-spin rounded-full h-5 w-5 border-b-2 border-blue-500"></div>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -337,6 +353,17 @@ export const ConversationHistorySidebar: React.FC<ConversationHistorySidebarProp
         <div className="p-4 border-t border-neutral-700">
           <div className="flex items-center justify-between text-xs text-neutral-500">
             <span>Research History</span>
+            {nextCursor && (
+              <Button
+                variant="ghost"
+                size="sm"
+                onClick={() => fetchMoreConversations()}
+                disabled={isLoadingMore}
+                className="text-xs"
+              >
+                Load more
+              </Button>
+            )}
             <Button
               variant="ghost"
               size="sm"
@@ -12,16 +12,27 @@ interface Conversation {
   last_message_preview: string | null;
 }
 
+// The search a page of results came from, or null for the plain listing
+interface PageSource {
+  query: string;
+  category: string | null;
+}
+
 interface ConversationState {
   conversations: Conversation[];
   currentConversation: any | null;
   isLoading: boolean;
+  isLoadingMore: boolean;
   error: string | null;
   searchQuery: string;
   selectedCategory: string | null;
+  // Cursor of the page after the loaded conversations, from the X-Next-Cursor header
+  nextCursor: string | null;
+  pageSource: PageSource | null;
   
   // Actions
   fetchConversations: () => Promise<void>;
+  fetchMoreConversations: () => Promise<void>;
   searchConversations: (query: string, category?: string) => Promise<void>;
   createConversation: (data: { title: string; category?: string; tags?: string[] }) => Promise<string>;
   getConversation: (id: string) => Promise<void>;
@@ -31,23 +42,38 @@ interface ConversationState {
   clearError: () => void;
 }
 
+const fetchPage = async (source: PageSource | null, cursor?: string) => {
+  const response = source
+    ? await makeAuthenticatedRequest('/api/conversations/search', {
+        method: 'POST',
+        body: JSON.stringify({ query: source.query, category: source.category, cursor }),
+      })
+    : await makeAuthenticatedRequest(
+        cursor ? `/api/conversations?cursor=${encodeURIComponent(cursor)}` : '/api/conversations'
+      );
+  if (!response.ok) {
+    throw new Error(source ? 'Failed to search conversations' : 'Failed to fetch conversations');
+  }
+  const conversations: Conversation[] = await response.json();
+  return { conversations, nextCursor: response.headers.get('X-Next-Cursor') };
+};
+
 export const useConversationStore = create<ConversationState>((set, get) => ({
   conversations: [],
   currentConversation: null,
   isLoading: false,
+  isLoadingMore: false,
   error: null,
   searchQuery: '',
   selectedCategory: null,
+  nextCursor: null,
+  pageSource: null,
 
   fetchConversations: async () => {
     set({ isLoading: true, error: null });
     try {
-      const response = await makeAuthenticatedRequest('/api/conversations');
-      if (!response.ok) {
-        throw new Error('Failed to fetch conversations');
-      }
-      const conversations = await response.json();
-      set({ conversations, isLoading: false });
+      const { conversations, nextCursor } = await fetchPage(null);
+      set({ conversations, nextCursor, pageSource: null, isLoading: false });
     } catch (error) {
       set({ 
         error: error instanceof Error ? error.message : 'Failed to fetch conversations',
@@ -56,20 +82,45 @@ export const useConversationStore = create<ConversationState>((set, get) => ({
     }
   },
 
+  fetchMoreConversations: async () => {
+    const { nextCursor, pageSource, isLoading, isLoadingMore } = get();
+    if (!nextCursor || isLoading || isLoadingMore) {
+      return;
+    }
+    set({ isLoadingMore: true, error: null });
+    try {
+      const page = await fetchPage(pageSource, nextCursor);
+      // A new listing or search replaced the one this page continues
+      if (get().nextCursor !== nextCursor || get().pageSource !== pageSource) {
+        set({ isLoadingMore: false });
+        return;
+      }
+      set(state => ({
+        conversations: [...state.conversations, ...page.conversations],
+        nextCursor: page.nextCursor,
+        isLoadingMore: false,
+      }));
+    } catch (error) {
+      set({
+        error: error instanceof Error ? error.message : 'Failed to fetch conversations',
+        isLoadingMore: false
+      });
+    }
+  },
+
   searchConversations: async (query: string, category?: string) => {
     set({ isLoading: true, error: null });
     try {
-      const response = await makeAuthenticatedRequest('/api/conversations/search', {
-        method: 'POST',
-        body: JSON.stringify({ query, category }),
+      const pageSource = { query, category: category || null };
+      const { conversations, nextCursor } = await fetchPage(pageSource);
+      set({
+        conversations,
+        nextCursor,
+        pageSource,
+        searchQuery: query,
+        selectedCategory: category || null,
+        isLoading: false
       });
-      
-      if (!response.ok) {
-        throw new Error('Failed to search conversations');
-      }
-      
-      const conversations = await response.json();
-      set({ conversations, searchQuery: query, selectedCategory: category || null, isLoading: false });
     } catch (error) {
       set({ 
         error: error instanceof Error ? error.message : 'Failed to search conversations',